@@ -0,0 +1,201 @@
+import os
+import sys
+import bpy
+
+from time import perf_counter
+
+from bpy.props import BoolProperty, IntProperty, StringProperty
+from bpy.types import Operator
+
+bl_info = {
+	"name": "CC2 ANM Exporter",
+	"author": "Dei, TheLeonX, SutandoTsukai",
+	"version": (9, 7, 1),
+	"blender": (3, 0, 0),
+	"location": "File > Export > CyberConnect2 Animation (.anm)",
+	"description": "Export actions of XFBIN clumps to .anm",
+	"category": "Import-Export",
+}
+
+# Registering the add-on only adds the operator. The exporter and everything it imports (numpy, br, common)
+# is loaded the first time the operator runs.
+
+# Operator properties that are passed as the export settings of the same name
+EXPORT_SETTINGS = [
+	'is_looped',
+	'export_materials',
+	'do_optimize',
+	'use_entry_cache',
+	'session_cache_size',
+	'profile_export',
+	'compact_page_json',
+	'write_size_report',
+	'anm_chunk_path',
+	'batch_action_pattern',
+	'output_threads',
+	'frame_step',
+	'sample_pose',
+	'window_size',
+	'sampling_workers',
+	'incremental_export',
+]
+
+TIME_SLICE = 0.1  # Seconds of export work done between two UI updates
+
+
+def parse_frame_step_overrides(text: str) -> dict:
+	"""
+	Return the steps of "name=step, ..." by entry kind or armature name. Raises ValueError naming the bad override.
+	"""
+	overrides = dict()
+	for override in filter(None, map(str.strip, text.split(','))):
+		name, separator, step = override.rpartition('=')
+		name = name.strip()
+
+		if not separator or not name:
+			raise ValueError(f'Step override "{override}" must be name=step')
+
+		try:
+			overrides[name] = int(step)
+		except ValueError:
+			raise ValueError(f'Step of "{name}" must be a whole number, not "{step.strip()}"') from None
+
+		if overrides[name] < 1:
+			raise ValueError(f'Step of "{name}" must be at least 1')
+
+	return overrides
+
+
+class ExportAnm(Operator):
+	"""Export the actions of the selected clumps to .anm. Press Esc to cancel"""
+	bl_idname = "export_anim.cc2_anm"
+	bl_label = "Export CC2 Animation"
+	bl_options = {'REGISTER'}
+
+	directory: StringProperty(subtype='DIR_PATH', description='Folder to write "Exported Animations" into')
+
+	is_looped: BoolProperty(name="Looped", description="Animation should be looped", default=False)
+	export_materials: BoolProperty(name="Export Materials", description="Export material animations", default=False)
+	do_optimize: BoolProperty(name="Optimize", description="Optimize the animation data", default=True)
+	use_entry_cache: BoolProperty(name="Use Entry Cache", description="Reuse entries that didn't change since the last export", default=True)
+	session_cache_size: IntProperty(name="Session Cache (MB)", description="Keep bone / material lists and rest matrices between exports until the scene changes, 0 = off", default=64, min=0, max=4096)
+	profile_export: BoolProperty(name="Profile", description="Write a _profile.json with the time spent in each export stage", default=False)
+	compact_page_json: BoolProperty(name="Compact Page Json", description="Write _page.json without indentation", default=False)
+	write_size_report: BoolProperty(name="Size Report", description="Write a _size.json with the bytes of every entry, curve and format of the .anm", default=False)
+	anm_chunk_path: StringProperty(name="Anm Chunk Path", description="Path of anm chunk file, the clump path of the first armature if empty", default="")
+	batch_action_pattern: StringProperty(name="Batch Actions", description='Export every action matching this pattern too, e.g. "1sik*"', default="")
+	incremental_export: BoolProperty(name="Incremental", description="Only sample and encode the bones, materials, camera and lights that changed since the last export", default=False)
+	output_threads: IntProperty(name="Output Threads", description="Number of threads writing the exported files", default=4, min=1, max=16)
+
+	use_frame_range: BoolProperty(name="Frame Range", description="Export only the frames from Start to End", default=False)
+	frame_start: IntProperty(name="Start", default=0, min=0)
+	frame_end: IntProperty(name="End", default=250, min=0)
+	frame_step: IntProperty(name="Frame Step", description="Sample every Nth frame", default=1, min=1)
+	sample_pose: BoolProperty(name="Sample Pose", description="Read bones from their evaluated pose every Frame Step frames, so constraints and IK are exported without baking", default=False)
+	window_size: IntProperty(name="Window Size", description="Sample and encode in windows of this many frames to limit memory use on long animations, 0 = off", default=0, min=0)
+	sampling_workers: IntProperty(name="Sampling Workers", description="Sample the frames in this many background Blender processes at once, 0 = off", default=0, min=0, max=32)
+	frame_step_overrides: StringProperty(name="Step Overrides", description='Frame step by entry kind or armature, e.g. "camera=1, 1bgm01 [C]=2"', default="")
+
+	@classmethod
+	def poll(cls, context):
+		return any(obj.type == 'ARMATURE' and obj.animation_data for obj in context.selected_objects)
+
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+
+	def execute(self, context):
+		directory = os.path.dirname(os.path.abspath(__file__))
+		if directory not in sys.path:
+			sys.path.append(directory)  # br / common are imported as top level modules
+
+		from . import exporter
+
+		try:
+			frame_step_overrides = parse_frame_step_overrides(self.frame_step_overrides)
+		except ValueError as e:
+			self.report({'ERROR'}, str(e))
+			return {'CANCELLED'}
+
+		# Settings that aren't operator properties (batch_actions, entry_cache_size, ...) come from exporter.py
+		settings = exporter.get_export_settings(**{name: getattr(self, name) for name in EXPORT_SETTINGS},
+			frame_range=(self.frame_start, self.frame_end) if self.use_frame_range else None,
+			frame_step_overrides=frame_step_overrides)
+
+		for warning in settings.get_ignored_settings():
+			self.report({'WARNING'}, warning)
+
+		# The export runs in time slices from a timer, so the UI stays responsive and it can be cancelled
+		self._steps = exporter.export_steps(os.path.normpath(bpy.path.abspath(self.directory)), settings)
+		self._start = perf_counter()
+
+		wm = context.window_manager
+		self._timer = wm.event_timer_add(0.01, window=context.window)
+		wm.progress_begin(0, 1000)
+		wm.modal_handler_add(self)
+
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			self._steps.close()  # Actions that weren't written completely leave no files
+			self.finish(context)
+			self.report({'WARNING'}, "Export cancelled")
+			return {'CANCELLED'}
+
+		if event.type != 'TIMER':
+			return {'PASS_THROUGH'}
+
+		progress = None
+		slice_end = perf_counter() + TIME_SLICE
+
+		try:
+			while perf_counter() < slice_end:
+				progress = next(self._steps)
+		except StopIteration:
+			self.finish(context)
+			self.report({'INFO'}, f"Animation exported in {perf_counter() - self._start:.1f} seconds")
+			return {'FINISHED'}
+		except Exception as e:
+			self.finish(context)
+			self.report({'ERROR'}, f"Export failed: {e}")
+			return {'CANCELLED'}
+
+		if progress is not None:
+			self.show_progress(context, progress)
+
+		return {'RUNNING_MODAL'}
+
+	def show_progress(self, context, progress):
+		elapsed = perf_counter() - self._start
+		fraction = progress.fraction
+		eta = elapsed * (1 - fraction) / fraction if fraction > 0 else 0
+
+		context.window_manager.progress_update(int(fraction * 1000))
+		context.workspace.status_text_set(
+			f"Exporting {progress.action} ({progress.action_index + 1}/{progress.action_count}, {progress.frame_count} frames): "
+			f"{progress.samples_done}/{progress.sample_count} sampled, {progress.entries_done}/{progress.entry_count} entries, "
+			f"ETA {eta:.0f}s. Esc to cancel")
+
+	def finish(self, context):
+		wm = context.window_manager
+		wm.event_timer_remove(self._timer)
+		wm.progress_end()
+		context.workspace.status_text_set(None)
+
+
+def menu_func_export(self, context):
+	self.layout.operator(ExportAnm.bl_idname, text="CyberConnect2 Animation (.anm)")
+
+
+def register():
+	bpy.utils.register_class(ExportAnm)
+	bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
+
+
+def unregister():
+	if 'common.session_cache' in sys.modules:
+		sys.modules['common.session_cache'].remove_handlers()
+
+	bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
+	bpy.utils.unregister_class(ExportAnm)
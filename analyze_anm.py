@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+import argparse
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(directory)
+
+from common.size_report import GROUPS, analyze_anm, format_table, get_page_names, write_report
+
+# Show which entries, curves and formats take the bytes of an .anm file.
+# Usage: python analyze_anm.py "Exported Animations/[000] my_action (nuccChunkAnm)/my_action.anm" --by name --top 30
+# Names are read from the _page.json next to the .anm if there is one.
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Break the size of an .anm file down by entry, curve and format.')
+	parser.add_argument('anm', help='.anm file to analyze')
+	parser.add_argument('--page', help='_page.json with the chunk names, default is the one next to the .anm')
+	parser.add_argument('--by', choices=GROUPS, default='name', help='what to sum the bytes by')
+	parser.add_argument('--top', type=int, default=20, help='number of rows to show')
+	parser.add_argument('--json', help='also write the whole report to this .json file')
+	args = parser.parse_args()
+
+	with open(args.anm, 'rb') as f:
+		data = f.read()
+
+	page_path = args.page or os.path.join(os.path.dirname(os.path.abspath(args.anm)), '_page.json')
+	reference_names = other_names = None
+
+	if os.path.exists(page_path):
+		with open(page_path, encoding='cp932') as f:
+			reference_names, other_names = get_page_names(json.load(f))
+
+	report = analyze_anm(data, reference_names, other_names)
+	print(format_table(report, args.by, args.top))
+
+	if args.json:
+		write_report(report, args.json)
+
+
+if __name__ == '__main__':
+	main()
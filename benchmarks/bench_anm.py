@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tracemalloc
+
+from dataclasses import asdict, replace
+from time import perf_counter
+
+directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(directory)
+
+from benchmarks.synthetic import SyntheticScene, make_scene
+from common.encoder import EncoderSettings, make_anm
+from common.profiler import Profiler, profiling
+
+# Encoder benchmarks on synthetic scenes, no Blender needed.
+# Runs Clump / Entry / Curve construction, clean_entry and serialization of br/br_anm.py and binary_reader,
+# and compares the results with benchmarks/baseline.json so regressions are caught before a release.
+#
+# Usage: python benchmarks/bench_anm.py                  run all cases and compare with the baseline
+#        python benchmarks/bench_anm.py --save-baseline  store the results as the new baseline
+#        python benchmarks/bench_anm.py --bones 200 --frames 600 --noise 0.1  run a single custom case
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+CASES = {
+	'small': SyntheticScene(armatures=1, bones=20, frames=60, materials=1),
+	'medium': SyntheticScene(),
+	'large': SyntheticScene(armatures=4, bones=120, frames=300, materials=4),
+	'long': SyntheticScene(armatures=1, bones=50, frames=2400, materials=0, lights=False),
+	'static': SyntheticScene(noise=0.0),  # clean_entry collapses almost every curve
+	'noisy': SyntheticScene(noise=1.0),  # Nothing can be collapsed
+}
+
+SETTINGS = EncoderSettings(is_looped=False, export_materials=True, do_optimize=True)
+
+
+def stage_time(stages: dict, *path: str) -> float:
+	for name in path[:-1]:
+		stages = stages.get(name, dict()).get('stages', dict())
+
+	return stages.get(path[-1], dict()).get('time', 0.0)
+
+
+def run_case(scene: SyntheticScene, repeat: int) -> dict:
+	"""
+	Encode the synthetic scene repeat times and return the best timings, peak memory and output size.
+	"""
+	snapshot = make_scene(scene)
+	entry_count = sum(len(armature.anm_bones) + len(armature.anm_materials) for armature in snapshot.armatures)
+	entry_count += int(snapshot.camera is not None) + len(snapshot.lights)
+
+	total = construction = optimization = serialization = float('inf')
+
+	for _ in range(repeat):
+		t0 = perf_counter()
+		with profiling(Profiler()) as profiler:
+			buffer = make_anm(snapshot, SETTINGS)
+		total = min(total, perf_counter() - t0)
+
+		stages = profiler.report()['stages']
+		conversion = stage_time(stages, 'encoding', 'conversion')
+		optimize = stage_time(stages, 'encoding', 'conversion', 'optimization')
+
+		construction = min(construction, conversion - optimize)
+		optimization = min(optimization, optimize)
+		serialization = min(serialization, stage_time(stages, 'encoding', 'serialization'))
+
+	# Measured in a separate run, tracemalloc slows everything down
+	tracemalloc.start()
+	make_anm(snapshot, SETTINGS)
+	_, peak_memory = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	return {
+		'scene': asdict(scene),
+		'entries': entry_count,
+		'output_size': len(buffer),
+		'output_hash': hashlib.sha1(buffer).hexdigest(),
+		'time': round(total, 6),
+		'construction': round(construction, 6),
+		'optimization': round(optimization, 6),
+		'serialization': round(serialization, 6),
+		'entries_per_second': round(entry_count / total, 1),
+		'mb_per_second': round(len(buffer) / total / 1e6, 3),
+		'peak_memory_mb': round(peak_memory / 1e6, 3),
+	}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+	"""
+	Return the regressions of results against the baseline: slower, more memory or a different output.
+	"""
+	regressions = list()
+
+	for name, result in results.items():
+		if name not in baseline:
+			continue
+
+		base = baseline[name]
+
+		if result['scene'] != base['scene']:
+			regressions.append(f'{name}: scene parameters changed, save a new baseline')
+			continue
+
+		for metric in ['time', 'peak_memory_mb']:
+			if result[metric] > base[metric] * (1 + tolerance):
+				regressions.append(f'{name}: {metric} {base[metric]} -> {result[metric]} (+{(result[metric] / base[metric] - 1) * 100:.0f}%)')
+
+		if result['output_hash'] != base['output_hash']:
+			regressions.append(f'{name}: output changed ({base["output_size"]} -> {result["output_size"]} bytes)')
+
+	return regressions
+
+
+def print_results(results: dict, baseline: dict) -> None:
+	print(f'{"case":<10}{"entries":>9}{"size KB":>10}{"time ms":>10}{"build":>9}{"clean":>9}{"write":>9}{"entries/s":>12}{"MB/s":>8}{"peak MB":>9}{"vs base":>9}')
+
+	for name, r in results.items():
+		change = ''
+		if name in baseline:
+			change = f'{(r["time"] / baseline[name]["time"] - 1) * 100:+.0f}%'
+
+		print(f'{name:<10}{r["entries"]:>9}{r["output_size"] / 1024:>10.1f}{r["time"] * 1000:>10.1f}'
+			f'{r["construction"] * 1000:>9.1f}{r["optimization"] * 1000:>9.1f}{r["serialization"] * 1000:>9.1f}'
+			f'{r["entries_per_second"]:>12.0f}{r["mb_per_second"]:>8.2f}{r["peak_memory_mb"]:>9.1f}{change:>9}')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the .anm encoder on synthetic scenes.')
+	parser.add_argument('--case', action='append', choices=list(CASES), help='case to run, can be repeated (default: all)')
+	parser.add_argument('--repeat', type=int, default=5, help='runs per case, the best one is reported')
+	parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline json to compare with')
+	parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+	parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown / memory growth (0.2 = 20%%)')
+	parser.add_argument('--json', help='also write the results to this json file')
+
+	custom = parser.add_argument_group('custom case')
+	for name, value in asdict(SyntheticScene()).items():
+		if isinstance(value, bool):
+			custom.add_argument(f'--no-{name}', dest=name, action='store_false', default=None)
+		else:
+			custom.add_argument(f'--{name}', type=type(value))
+
+	args = parser.parse_args()
+
+	overrides = {name: getattr(args, name) for name in asdict(SyntheticScene()) if getattr(args, name) is not None}
+
+	if overrides:
+		cases = {'custom': replace(SyntheticScene(), **overrides)}
+	else:
+		cases = {name: CASES[name] for name in (args.case or CASES)}
+
+	results = {name: run_case(scene, args.repeat) for name, scene in cases.items()}
+
+	baseline = dict()
+	if os.path.exists(args.baseline):
+		with open(args.baseline, 'r', encoding='utf-8') as file:
+			baseline = json.load(file)
+
+	print_results(results, baseline)
+
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as file:
+			json.dump(results, file, indent=4)
+
+	if args.save_baseline:
+		with open(args.baseline, 'w', encoding='utf-8') as file:
+			json.dump({**baseline, **results}, file, indent=4)
+		print(f'Baseline saved to {args.baseline}')
+		return
+
+	regressions = compare(results, baseline, args.tolerance)
+	for regression in regressions:
+		print('REGRESSION', regression)
+
+	if regressions:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
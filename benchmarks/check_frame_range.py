@@ -0,0 +1,68 @@
+import os
+import sys
+import numpy as np
+
+directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(directory)
+
+from br.br_anm import AnmCurveFormat
+from common.encoder import make_keyed_curve
+from common.sampling_settings import FrameRange
+
+# Checks the frames FrameRange.select picks from the keyframes of a channel, no Blender needed.
+# Channels are linear between their keys here, standing in for fcurve.evaluate.
+#
+# Usage: python benchmarks/check_frame_range.py
+
+# (frame range, keyframes, expected frames)
+CASES = {
+	'range between two keys': (FrameRange(10, 20, clip=True), [0, 30], [10, 20]),
+	'keys inside the range': (FrameRange(10, 20, clip=True), [0, 12, 15, 30], [10, 12, 15, 20]),
+	'keys on the range ends': (FrameRange(10, 20, clip=True), [10, 15, 20], [10, 15, 20]),
+	'single frame': (FrameRange(10, 10, clip=True), [0, 30], [10]),
+	'not clipped': (FrameRange(10, 20), [0, 30], [0, 30]),
+	'stepped': (FrameRange(10, 20, step=4, clip=True), [0, 30], [10, 14, 18, 20]),
+}
+
+
+def evaluate(keyframes: list, frames: np.ndarray) -> np.ndarray:
+	return np.interp(frames, keyframes, np.asarray(keyframes, dtype=np.float64) * 2)
+
+
+def check_case(frame_range: FrameRange, keyframes: list, expected: list) -> bool:
+	frames = frame_range.select(np.array(keyframes, dtype=np.int32))
+	if frames.tolist() != expected:
+		return False
+
+	values = evaluate(keyframes, frames)
+	if not np.allclose(values, frames * 2):
+		return False
+
+	curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT1, frames, values)
+	return curve.frames.tolist() == [frame * 100 for frame in expected]
+
+
+def main():
+	failures = list()
+
+	for name, (frame_range, keyframes, expected) in CASES.items():
+		try:
+			same = check_case(frame_range, keyframes, expected)
+		except Exception as e:
+			print(f'{name}: raised {e!r}')
+			same = False
+
+		print(f'{name:<26}{"ok" if same else "DIFFERENT":>11}')
+
+		if not same:
+			failures.append(name)
+
+	for failure in failures:
+		print('MISMATCH', failure)
+
+	if failures:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
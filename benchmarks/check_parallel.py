@@ -0,0 +1,110 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(directory)
+
+from benchmarks.synthetic import SyntheticScene, make_scene
+from common.encoder import EncoderSettings, make_anm
+from common.parallel_sampler import WorkerPool, WorkerTask, make_tasks, split_frames
+from common.snapshot import save_snapshot
+from common.window_encoder import encode_windows, merge_windows
+
+# Checks that sampling in parallel workers gives the same .anm as encoding the whole scene, no Blender needed.
+# The workers are sample_worker.py stand-ins cutting their windows out of a saved synthetic snapshot, so this
+# runs the scheduling, window files, visibility filling and merging / window encoding of sampling_workers.
+#
+# Usage: python benchmarks/check_parallel.py
+
+WORKER_PATH = os.path.join(directory, 'sample_worker.py')
+
+SCENES = {
+	'single frame': SyntheticScene(armatures=1, bones=10, frames=1, materials=1),
+	'short': SyntheticScene(armatures=1, bones=20, frames=5, materials=1),
+	'medium': SyntheticScene(),
+}
+
+# (workers, window_size), 0 merges the windows of the workers into one snapshot before encoding
+POOLS = [(1, 0), (3, 0), (8, 0), (4, 7), (8, 1)]
+
+SETTINGS = EncoderSettings(is_looped=False, export_materials=True, do_optimize=True)
+
+
+def run_pool(snapshot_path: str, output: str, frame_start: int, frame_end: int, workers: int, window_size: int) -> WorkerPool:
+	"""
+	Sample the [frame_start, frame_end) frames with stand-in workers like make_anm_parallel_steps and return the pool.
+	"""
+	if window_size:
+		windows = [(start, min(start + window_size, frame_end)) for start in range(frame_start, frame_end, window_size)]
+	else:
+		windows = split_frames(frame_start, frame_end, workers)
+
+	tasks = make_tasks(windows, workers, output, armatures=list(), export_materials=SETTINGS.export_materials,
+		sampling=dict(), window_size=window_size)
+
+	def make_command(task: WorkerTask):
+		return [sys.executable, WORKER_PATH, task.path, '--snapshot', snapshot_path]
+
+	pool = WorkerPool(tasks, make_command)
+	for _ in pool.run_steps():
+		pass
+
+	return pool
+
+
+def check_scene(name: str, scene: SyntheticScene) -> list:
+	"""
+	Return the pools whose .anm isn't the one of make_anm.
+	"""
+	snapshot = make_scene(scene)
+	expected = make_anm(snapshot, SETTINGS)
+	failures = list()
+
+	for workers, window_size in POOLS:
+		output = tempfile.mkdtemp(prefix='anm_check_')
+
+		try:
+			snapshot_path = os.path.join(output, 'scene.npz')
+			save_snapshot(snapshot, snapshot_path)
+
+			pool = run_pool(snapshot_path, output, snapshot.frame_start, snapshot.frame_end + 1, workers, window_size)
+
+			if window_size:
+				result = encode_windows(pool.iter_windows(), SETTINGS)
+			else:
+				result = make_anm(merge_windows(pool.iter_windows()), SETTINGS)
+		finally:
+			shutil.rmtree(output, ignore_errors=True)
+
+		same = bytes(result) == bytes(expected)
+		print(f'{name:<14}{workers:>8}{window_size:>8}{len(pool.tasks):>7}{"ok" if same else "DIFFERENT":>11}')
+
+		if not same:
+			failures.append(f'{name}: {workers} workers, window size {window_size}')
+
+	return failures
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Check that parallel sampling gives the same .anm as encoding the whole scene.')
+	parser.add_argument('--scene', action='append', choices=list(SCENES), help='scene to check, can be repeated (default: all)')
+	args = parser.parse_args()
+
+	print(f'{"scene":<14}{"workers":>8}{"window":>8}{"tasks":>7}{"result":>11}')
+
+	failures = list()
+	for name in args.scene or SCENES:
+		failures.extend(check_scene(name, SCENES[name]))
+
+	for failure in failures:
+		print('MISMATCH', failure)
+
+	if failures:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
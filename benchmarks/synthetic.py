@@ -0,0 +1,112 @@
+import numpy as np
+
+from dataclasses import dataclass
+
+from common.encoder import make_mapping_reference
+from common.snapshot import *
+
+# Synthetic scene snapshots for the benchmarks. Everything is plain numpy data, no Blender needed.
+
+
+@dataclass
+class SyntheticScene:
+	armatures: int = 2
+	bones: int = 50  # Bones per armature
+	frames: int = 120
+	materials: int = 2  # Materials per armature
+	camera: bool = True
+	lights: bool = True
+	noise: float = 0.5  # 0 makes every channel constant (clean_entry collapses it), 1 moves every channel every frame
+	seed: int = 0
+
+
+def random_quats(rng: np.random.Generator, count: int) -> np.ndarray:
+	q = rng.normal(size=(count, 4))
+	return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def noisy(rng: np.random.Generator, base: np.ndarray, frames: int, noise: float) -> np.ndarray:
+	"""
+	Repeat base for every frame and move each channel with probability noise.
+	"""
+	values = np.tile(base, (frames, 1))
+	moving = rng.random(values.shape[1]) < noise
+	values[:, moving] += rng.normal(scale=noise, size=(frames, int(moving.sum())))
+	return values
+
+
+def make_bone(rng: np.random.Generator, name: str, is_root: bool, settings: SyntheticScene) -> BoneSnapshot:
+	frames = np.arange(settings.frames, dtype=np.int32)
+
+	rest_matrix = np.eye(4)
+	rest_matrix[:3, 3] = rng.normal(size=3)
+
+	rot_values = noisy(rng, random_quats(rng, 1)[0], settings.frames, settings.noise)
+	rot_values /= np.linalg.norm(rot_values, axis=1, keepdims=True)
+
+	bone = BoneSnapshot(
+		name,
+		is_root,
+		['location', 'rotation_quaternion', 'scale'],
+		rest_matrix,
+		frames, noisy(rng, rng.normal(size=3), settings.frames, settings.noise),
+		frames, rot_values,
+		frames, noisy(rng, np.ones(3), settings.frames, settings.noise * 0.1),
+		np.ones(settings.frames + 1, dtype=np.int8))
+
+	if is_root:
+		bone.world_loc = noisy(rng, np.zeros(3), settings.frames, settings.noise)
+		bone.world_rot = np.tile([1.0, 0.0, 0.0, 0.0], (settings.frames, 1))
+
+	return bone
+
+
+def make_armature(rng: np.random.Generator, index: int, settings: SyntheticScene) -> ArmatureSnapshot:
+	bones = [f'{index}bone{i}' for i in range(settings.bones)]
+	materials = [f'{index}mat{i}' for i in range(settings.materials)]
+
+	armature = ArmatureSnapshot(f'{index}body', f'{index}body [C]', f'c/{index}body/{index}body.max', 'benchmark', bones, materials, [f'{index}body'])
+
+	# Simple chain of bones, the first one is the root
+	armature.parents = [(bones[i - 1], bones[i]) for i in range(1, len(bones))]
+	armature.anm_bones = [make_bone(rng, name, i == 0, settings) for i, name in enumerate(bones)]
+
+	for name in materials:
+		values = noisy(rng, np.array([0, 0, 1, 1, 0, 0, 1, 1, 0, 0.12, 205], dtype=np.float64), settings.frames, settings.noise)
+		armature.anm_materials.append(MaterialSnapshot(name, values))
+
+	return armature
+
+
+def make_light(rng: np.random.Generator, light_type: str, settings: SyntheticScene) -> LightSnapshot:
+	frames = settings.frames + 1
+	size = rng.random(frames) if light_type == 'POINT' else np.zeros(0)
+
+	return LightSnapshot(
+		light_type.lower(),
+		light_type,
+		np.round(np.clip(noisy(rng, rng.random(3), frames, settings.noise), 0, 1), 2),  # Rounded like get_lights
+		noisy(rng, rng.random(1), frames, settings.noise)[:, 0],
+		noisy(rng, rng.normal(size=3), frames, settings.noise),
+		random_quats(rng, frames),
+		size,
+		size)
+
+
+def make_scene(settings: SyntheticScene) -> SceneSnapshot:
+	rng = np.random.default_rng(settings.seed)
+
+	snapshot = SceneSnapshot(0, settings.frames)
+	snapshot.armatures = [make_armature(rng, index, settings) for index in range(settings.armatures)]
+	snapshot.mapping_reference = make_mapping_reference(snapshot.armatures)
+	snapshot.mapping_reference_types = make_mapping_reference(snapshot.armatures, types=True)
+
+	if settings.camera:
+		frames = settings.frames + 1
+		snapshot.camera = CameraSnapshot('camera', noisy(rng, rng.normal(size=3), frames, settings.noise),
+			random_quats(rng, frames), noisy(rng, np.array([40.0]), frames, settings.noise)[:, 0])
+
+	if settings.lights:
+		snapshot.lights = [make_light(rng, light_type, settings) for light_type in ['SUN', 'POINT', 'AREA']]
+
+	return snapshot
@@ -4,8 +4,10 @@ __license__ = "MIT"
 __version__ = "1.4.3"
 
 import struct
+import numpy as np
 from contextlib import contextmanager
 from enum import Flag, IntEnum
+from functools import lru_cache
 from typing import Tuple, Union
 
 FMT = dict()
@@ -30,11 +32,19 @@ class Whence(IntEnum):
     END = 2
 
 
+@lru_cache(maxsize=1024)
+def get_struct(endianness: Endian, format: str, count: int) -> struct.Struct:
+    """Returns a compiled `struct.Struct` for count values of format, cached by (endianness, format, count)."""
+    return struct.Struct((">" if endianness else "<") + str(count) + format)
+
+
 class BrStruct:
     """Base class for objects passed to BinaryReader's `read_struct` and `write_struct` methods.\n
     Any type passed to `read_struct` and any object passed to `write_struct` must inherit from this class.\n
     Override `__br_read__` and `__br_write__` methods from this class to set up BinaryReader to read your classes.\n"""
 
+    __slots__ = ()
+
     def __init__(self) -> None:
         """If this class will be used with BinaryReader's `read_struct` method, then this method MUST receive zero arguments after `self`.\n
         """
@@ -83,7 +93,7 @@ class BinaryReader:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.__buf.clear()
+        self.__buf = bytearray()  # Arrays returned by read_array keep the old buffer alive
 
     def pos(self) -> int:
         """Returns the current position in the buffer."""
@@ -148,7 +158,11 @@ class BinaryReader:
         """Extends the BinaryReader's buffer with the given buffer.\n
         Does not advance buffer position.
         """
-        self.__buf.extend(buffer)
+        try:
+            self.__buf.extend(buffer)
+        except BufferError:
+            # Arrays returned by read_array are views of the buffer, which can't be resized while they exist
+            self.__buf = self.__buf + bytearray(buffer)
 
     def trim(self, size: int) -> int:
         """Trims the buffer to the given size.\n
@@ -222,22 +236,49 @@ class BinaryReader:
     def is_iterable(x) -> bool:
         return hasattr(x, '__iter__') and not isinstance(x, (str, bytes))
 
-    def __read_type(self, format: str, count=1):
+    def __advance(self, size: int) -> int:
         i = self.__idx
-        new_offset = self.__idx + (FMT[format] * count)
-
-        end = ">" if self.__endianness else "<"
+        new_offset = i + size
 
         if self.__past_eof(new_offset):
             raise Exception(
                 'BinaryReader Error: cannot read farther than buffer length.')
 
         self.__idx = new_offset
-        return struct.unpack_from(end + str(count) + format, self.__buf, i)
+        return i
+
+    def __read_type(self, format: str, count=1):
+        i = self.__advance(FMT[format] * count)
+        return get_struct(self.__endianness, format, count).unpack_from(self.__buf, i)
 
     def read_bytes(self, size=1) -> bytes:
         """Reads a bytes object with the given size from the current position."""
-        return self.__read_type("s", size)[0]
+        if size < 0:
+            raise ValueError('size cannot be negative')
+
+        i = self.__advance(size)
+        return bytes(self.__buf[i:i + size])
+
+    def read_array(self, dtype, count: int) -> np.ndarray:
+        """Reads count values of the given numpy dtype (or structured record dtype) as an array.\n
+        The byte order of dtype is set to the endianness of the BinaryReader.\n
+        The array is a read-only view of the buffer, no data is copied.
+        """
+        dtype = np.dtype(dtype).newbyteorder(">" if self.__endianness else "<")
+        i = self.__advance(dtype.itemsize * count)
+
+        array = np.frombuffer(self.__buf, dtype, count, i)
+        array.flags.writeable = False
+        return array
+
+    def read_struct_array(self, format: str, count: int) -> Tuple[Tuple]:
+        """Reads count fixed-size records of the given struct format (without byte order, e.g. `"hhHH"`).\n
+        Returns a tuple with a tuple of values for each record.
+        """
+        record = get_struct(self.__endianness, format, 1)
+        i = self.__advance(record.size * count)
+
+        return tuple(record.iter_unpack(self.__buf[i:i + record.size * count]))
 
     def read_str(self, size=None, encoding=None) -> str:
         """Reads a string with the given size from the current position.\n
@@ -389,8 +430,6 @@ class BinaryReader:
     def __write_type(self, format: str, value, is_iterable: bool) -> None:
         i = self.__idx
 
-        end = ">" if self.__endianness else "<"
-
         count = 1
         if is_iterable or type(value) is bytes:
             count = len(value)
@@ -401,9 +440,9 @@ class BinaryReader:
             self.__idx += FMT[format] * count
 
         if is_iterable:
-            struct.pack_into(end + str(count) + format, self.__buf, i, *value)
+            get_struct(self.__endianness, format, count).pack_into(self.__buf, i, *value)
         else:
-            struct.pack_into(end + str(count) + format, self.__buf, i, value)
+            get_struct(self.__endianness, format, count).pack_into(self.__buf, i, value)
 
     def write_bytes(self, value: bytes) -> None:
         """Writes a bytes object to the buffer."""
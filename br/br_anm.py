@@ -1,14 +1,12 @@
-from dataclasses import dataclass
+import struct
+import numpy as np
+
+from dataclasses import dataclass, field
 from binary_reader.binary_reader import *
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Optional, Union
 from enum import IntEnum
 
 
-
-
-anm_writer = BinaryReader(endianness=Endian.BIG, encoding='utf-8')  # Create a new BinaryReader (bytearray buffer is initialized automatically)
-
-
 """class AnmDataPath(IntEnum):
 	UNKNOWN = -1
 
@@ -49,6 +47,8 @@ class AnmCurveFormat(IntEnum):
 
 @dataclass
 class Clump(BrStruct):
+	__slots__ = ('clump_index', 'bone_material_count', 'model_count', 'bone_material_indices', 'model_indices')
+
 	clump_index: int
 	bone_material_count: int
 	model_count: int
@@ -66,8 +66,19 @@ class Clump(BrStruct):
 		for index in self.model_indices:
 			anm_writer.write_uint32(index)
 
+	@classmethod
+	def read(cls, anm_reader: 'BinaryReader') -> 'Clump':
+		clump_index = anm_reader.read_uint32()
+		bone_material_count = anm_reader.read_uint16()
+		model_count = anm_reader.read_uint16()
+
+		return cls(clump_index, bone_material_count, model_count,
+				list(anm_reader.read_uint32(bone_material_count)), list(anm_reader.read_uint32(model_count)))
+
 @dataclass
 class AnmCoord(BrStruct):
+	__slots__ = ('clump_index', 'coord_index')
+
 	clump_index: int
 	coord_index: int
 
@@ -76,55 +87,172 @@ class AnmCoord(BrStruct):
 		anm_writer.write_uint16(self.coord_index)
 
 
+# Big-endian AnmCoord, [clump index, coord index]
+COORD_DTYPE = np.dtype([('clump_index', '>i2'), ('coord_index', '>u2')])
+
+
 @dataclass
 class CoordParent(BrStruct):
 	"""
-	Coord Parent stores a list of short values of [clump index, parent node, clump index, child node...]
+	Coord Parent stores [clump index, parent node, clump index, child node...] as an (N, 2) array
+	of COORD_DTYPE, one (parent, child) row per link.
 	"""
-	anm_coords: List[AnmCoord]
+	links: np.ndarray = field(default_factory=lambda: np.zeros((0, 2), COORD_DTYPE))
+
+	@classmethod
+	def from_indices(cls, clump_indices: np.ndarray, coord_indices: np.ndarray) -> 'CoordParent':
+		"""
+		Make coord parents from (N, 2) arrays of the parent and child clump and coord indices.
+		"""
+		links = np.empty((len(coord_indices), 2), COORD_DTYPE)
+		links['clump_index'] = np.reshape(clump_indices, (-1, 2))
+		links['coord_index'] = np.reshape(coord_indices, (-1, 2))
+
+		return cls(links)
+
+	@property
+	def count(self) -> int:
+		return len(self.links)
+
+	def __br_read__(self, anm_reader: 'BinaryReader', count: int):
+		self.links = anm_reader.read_array(COORD_DTYPE, count * 2).reshape(count, 2)
 
 	def __br_write__(self, anm_writer: 'BinaryReader'):
-		for c in self.anm_coords:
-			anm_writer.write_struct(c)
+		anm_writer.write_bytes(self.links.astype(COORD_DTYPE, copy=False).tobytes())
+
+ENTRY_HEADER = struct.Struct('>hhHH')  # clump index, coord index, entry format, curve count
+CURVE_HEADER = struct.Struct('>4H')  # curve index, curve format, frame count, curve flags
+
 
 @dataclass
 class CurveHeader(BrStruct):
+	__slots__ = ('curve_index', 'curve_format', 'frame_count', 'curve_flags')
+
 	curve_index:  int
 	curve_format: int
 	frame_count:  int
 	curve_flags:  int
 
 	def __br_write__(self, anm_writer: 'BinaryReader'):
-		anm_writer.write_uint16(self.curve_index)
-		anm_writer.write_uint16(self.curve_format)
-		anm_writer.write_uint16(self.frame_count)
-		anm_writer.write_uint16(self.curve_flags)
+		anm_writer.write_bytes(self.pack())
+
+	def pack(self) -> bytes:
+		return CURVE_HEADER.pack(self.curve_index, self.curve_format, self.frame_count, self.curve_flags)
+
+	@classmethod
+	def read(cls, anm_reader: 'BinaryReader') -> 'CurveHeader':
+		return cls(*anm_reader.read_uint16(4))
+
+
+KEYED_FORMATS = (AnmCurveFormat.INT1_FLOAT3, AnmCurveFormat.INT1_FLOAT1, AnmCurveFormat.INT1_FLOAT4)
+
+# Big-endian type of the values of each written curve format
+CURVE_DTYPES = {
+	AnmCurveFormat.INT1_FLOAT3: '>f4',
+	AnmCurveFormat.INT1_FLOAT1: '>f4',
+	AnmCurveFormat.INT1_FLOAT4: '>f4',
+	AnmCurveFormat.SHORT4: '>i2',
+	AnmCurveFormat.SHORT3: '>i2',
+	AnmCurveFormat.SHORT1: '>i2',
+	AnmCurveFormat.FLOAT3: '>f4',
+	AnmCurveFormat.FLOAT3ALT: '>f4',
+	AnmCurveFormat.FLOAT1: '>f4',
+	AnmCurveFormat.FLOAT1ALT: '>f4',
+	AnmCurveFormat.BYTE3: '>u1',
+	AnmCurveFormat.FLOAT3ALT2: '>f4',
+	AnmCurveFormat.FLOAT1ALT2: '>f4',
+	AnmCurveFormat.SHORT1ALT: '>i2',
+}
+
+# Values per key of each curve format
+CURVE_COMPONENTS = {
+	AnmCurveFormat.FLOAT3: 3,
+	AnmCurveFormat.INT1_FLOAT3: 3,
+	AnmCurveFormat.FLOAT3ALT: 3,
+	AnmCurveFormat.INT1_FLOAT4: 4,
+	AnmCurveFormat.FLOAT1: 1,
+	AnmCurveFormat.INT1_FLOAT1: 1,
+	AnmCurveFormat.SHORT1: 1,
+	AnmCurveFormat.SHORT3: 3,
+	AnmCurveFormat.SHORT4: 4,
+	AnmCurveFormat.BYTE3: 3,
+	AnmCurveFormat.FLOAT3ALT2: 3,
+	AnmCurveFormat.FLOAT1ALT: 1,
+	AnmCurveFormat.FLOAT1ALT2: 1,
+	AnmCurveFormat.SHORT1ALT: 1,
+}
+
 
 @dataclass
 class Curve(BrStruct):
+	"""
+	Keys of a curve as arrays. Keyed formats (INT1_FLOAT*) have frames (frame * 100) and values,
+	null_key ends them with a (-1, last value) key. The other formats only have values.
+	"""
+	__slots__ = ('curve_format', 'frames', 'values', 'null_key')
+
 	curve_format: AnmCurveFormat
-	keyframes: Union[Tuple[int], Tuple[float], Dict[int, float]]
-	
+	frames: Optional[np.ndarray]  # (N,) int32, None for unkeyed formats
+	values: np.ndarray  # (N, C) float32, int16 for SHORT and uint8 for BYTE formats
+	null_key: bool
+
+	@property
+	def key_count(self) -> int:
+		return len(self.values) + int(self.null_key)
+
+	def to_bytes(self) -> bytes:
+		dtype = CURVE_DTYPES.get(self.curve_format)
+		if dtype is None:
+			return b''
+
+		values = self.values.reshape(len(self.values), -1)
+
+		if self.curve_format not in KEYED_FORMATS:
+			return values.astype(dtype).tobytes()
+
+		keys = np.empty(self.key_count, dtype=[('frame', '>i4'), ('value', dtype, (values.shape[1],))])
+		keys['frame'][:len(values)] = self.frames
+		keys['value'][:len(values)] = values
+
+		if self.null_key:
+			keys['frame'][-1] = -1
+			keys['value'][-1] = values[-1]
+
+		return keys.tobytes()
+
 	def __br_write__(self, anm_writer: 'BinaryReader'):
-		if self.curve_format == AnmCurveFormat.INT1_FLOAT3 or self.curve_format == AnmCurveFormat.INT1_FLOAT1 or self.curve_format == AnmCurveFormat.INT1_FLOAT4:
-			for frame, value in self.keyframes.items():
-				anm_writer.write_int32(frame)
-				anm_writer.write_float(value)
-		
-		if self.curve_format == AnmCurveFormat.SHORT4 or self.curve_format == AnmCurveFormat.SHORT3 or self.curve_format == AnmCurveFormat.SHORT1:
-			for value in self.keyframes:
-				anm_writer.write_int16(value)
-		
-		if self.curve_format == AnmCurveFormat.FLOAT3 or self.curve_format == AnmCurveFormat.FLOAT3ALT or self.curve_format == AnmCurveFormat.FLOAT1 or self.curve_format == AnmCurveFormat.FLOAT1ALT:
-			for value in self.keyframes:
-				anm_writer.write_float(value)
-				
-		if self.curve_format == AnmCurveFormat.BYTE3:
-			for value in self.keyframes:
-				anm_writer.write_uint8(int(value))
-		
+		anm_writer.write_bytes(self.to_bytes())
+
+	@classmethod
+	def read(cls, anm_reader: 'BinaryReader', header: CurveHeader) -> 'Curve':
+		"""
+		Read the keys of a curve as read-only arrays, followed by the padding to 4 bytes.
+		"""
+		curve_format = AnmCurveFormat(header.curve_format)
+		components = CURVE_COMPONENTS[curve_format]
+		count = header.frame_count
+
+		if curve_format not in KEYED_FORMATS:
+			values = anm_reader.read_array(CURVE_DTYPES[curve_format], count * components).reshape(count, components)
+			anm_reader.align_pos(4)
+			return cls(curve_format, None, values, False)
+
+		keys = anm_reader.read_array([('frame', 'i4'), ('value', 'f4', (components,))], count)
+		anm_reader.align_pos(4)
+		frames, values = keys['frame'], keys['value']
+
+		# A null key that repeats the last value is written again by to_bytes, any other is kept as a key
+		null_key = count > 1 and frames[-1] == -1 and (values[-1] == values[-2]).all()
+		if null_key:
+			frames, values = frames[:-1], values[:-1]
+
+		return cls(curve_format, frames, values, bool(null_key))
+
+
 @dataclass
 class Entry(BrStruct):
+	__slots__ = ('clump_index', 'coord_index', 'entry_format', 'curve_count', 'curve_headers', 'curves')
+
 	clump_index: int
 	coord_index: int
 	entry_format: int
@@ -134,33 +262,62 @@ class Entry(BrStruct):
 	curves: List[Curve]
 
 	def __br_write__(self, anm_writer: 'BinaryReader'):
-		anm_writer.write_int16(self.clump_index)
-		anm_writer.write_int16(self.coord_index)
-
-		anm_writer.write_uint16(self.entry_format)
 		self.curve_count = len(self.curve_headers)
-		anm_writer.write_uint16(self.curve_count)
 
-		for curve_header in self.curve_headers:
-			anm_writer.write_struct(curve_header)
-		
-		for curve in self.curves:
-			anm_writer.write_struct(curve)
-			
+		data = [ENTRY_HEADER.pack(self.clump_index, self.coord_index, self.entry_format, self.curve_count)]
+		data.extend(curve_header.pack() for curve_header in self.curve_headers)
+		data.extend(curve.to_bytes() for curve in self.curves)
+
+		anm_writer.write_bytes(b''.join(data))
+
+	@classmethod
+	def read(cls, anm_reader: 'BinaryReader') -> 'Entry':
+		clump_index, coord_index, entry_format, curve_count = ENTRY_HEADER.unpack(anm_reader.read_bytes(ENTRY_HEADER.size))
+
+		curve_headers = [CurveHeader.read(anm_reader) for _ in range(curve_count)]
+		curves = [Curve.read(anm_reader, header) for header in curve_headers]
+
+		return cls(clump_index, coord_index, entry_format, curve_count, curve_headers, curves)
+
+
+@dataclass
+class EncodedEntry(BrStruct):
+	"""
+	Entry that was already written to bytes (e.g. loaded from the entry cache).
+	"""
+	data: bytes
+
+	def __br_write__(self, anm_writer: 'BinaryReader'):
+		anm_writer.write_bytes(bytes(self.data))
+
 
 @dataclass
 class Anm(BrStruct):
-	anm_length: int
-	frame_size: int
-	entry_count: int
-	loop: bool
-	clump_count: int
-	other_entry_count: int
-	coord_count: int
-
-	clumps: List[Clump]
-	coord_parents: CoordParent
-	entries: List[Entry]
+	anm_length: int = 0
+	frame_size: int = 0
+	entry_count: int = 0
+	loop: bool = False
+	clump_count: int = 0
+	other_entry_count: int = 0
+	coord_count: int = 0
+
+	clumps: List[Clump] = field(default_factory=list)
+	coord_parents: CoordParent = field(default_factory=CoordParent)
+	entries: List[Entry] = field(default_factory=list)
+
+	def __br_read__(self, anm_reader: 'BinaryReader'):
+		self.anm_length = anm_reader.read_uint32() // 100
+		self.frame_size = anm_reader.read_uint32() // 100
+		self.entry_count = anm_reader.read_uint16()
+		self.loop = bool(anm_reader.read_uint16())
+		self.clump_count = anm_reader.read_uint16()
+		self.other_entry_count = anm_reader.read_uint16()
+		self.coord_count = anm_reader.read_uint32()
+
+		self.clumps = [Clump.read(anm_reader) for _ in range(self.clump_count)]
+		anm_reader.read_uint32(self.other_entry_count)
+		self.coord_parents = anm_reader.read_struct(CoordParent, None, self.coord_count)
+		self.entries = [Entry.read(anm_reader) for _ in range(self.entry_count)]
 
 	def __br_write__(self, anm_writer: 'BinaryReader'):
 		anm_writer.write_uint32(self.anm_length * 100)
@@ -2,9 +2,6 @@ from dataclasses import dataclass
 from binary_reader.binary_reader import *
 
 
-cam_writer = BinaryReader(endianness=Endian.BIG, encoding='utf-8')  # Create a new BinaryReader (bytearray buffer is initialized automatically)
-
-
 @dataclass
 class Camera(BrStruct):
     unk: int
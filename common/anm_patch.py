@@ -0,0 +1,119 @@
+import struct
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from br.br_anm import *
+
+# Replaces entries of an existing .anm without decoding its curves. Entries are found by reading their
+# entry and curve headers only, everything that isn't replaced is copied as it is in one join.
+
+ANM_HEADER = struct.Struct('>IIHHHHI')  # anm length * 100, frame size * 100, entry count, loop, clump count, other entry count, coord count
+
+EntryId = Tuple[int, int, int]  # Clump index, coord index and entry format
+
+
+@dataclass
+class EntryRange:
+	id: EntryId
+	start: int  # Byte range of the entry in the .anm, curve padding included
+	end: int
+
+
+def get_key_size(curve_format: int) -> int:
+	"""
+	Return the bytes a key of a curve format takes, frame included for keyed formats.
+	"""
+	curve_format = AnmCurveFormat(curve_format)
+	dtype = CURVE_DTYPES.get(curve_format)
+
+	if dtype is None:
+		raise ValueError(f'Curve format {curve_format.name} can\'t be indexed')
+
+	size = np.dtype(dtype).itemsize * CURVE_COMPONENTS[curve_format]
+	return size + 4 if curve_format in KEYED_FORMATS else size
+
+
+def get_entries_start(data: bytes) -> int:
+	"""
+	Return the offset of the first entry: after the header, clumps, other entry indices and coord parents.
+	"""
+	_, _, _, _, clump_count, other_entry_count, coord_count = ANM_HEADER.unpack_from(data)
+	pos = ANM_HEADER.size
+
+	for _ in range(clump_count):
+		_, bone_material_count, model_count = struct.unpack_from('>IHH', data, pos)
+		pos += 8 + 4 * (bone_material_count + model_count)
+
+	return pos + 4 * other_entry_count + 2 * COORD_DTYPE.itemsize * coord_count  # A coord parent links a parent and a child
+
+
+def index_entries(data: bytes) -> List[EntryRange]:
+	"""
+	Return the byte range of every entry of an .anm, in file order.
+	"""
+	entry_count = ANM_HEADER.unpack_from(data)[2]
+	pos = get_entries_start(data)
+	entries: List[EntryRange] = list()
+
+	for _ in range(entry_count):
+		start = pos
+		clump_index, coord_index, entry_format, curve_count = ENTRY_HEADER.unpack_from(data, pos)
+		pos += ENTRY_HEADER.size
+
+		headers = [CURVE_HEADER.unpack_from(data, pos + i * CURVE_HEADER.size) for i in range(curve_count)]
+		pos += CURVE_HEADER.size * curve_count
+
+		for _, curve_format, frame_count, _ in headers:
+			pos += get_key_size(curve_format) * frame_count
+			pos += -pos % 4  # Curves are padded to 4 bytes
+
+		entries.append(EntryRange((clump_index, coord_index, entry_format), start, pos))
+
+	if pos != len(data):
+		raise ValueError(f'Entries end at {pos}, the .anm has {len(data)} bytes')
+
+	return entries
+
+
+def get_entry_id(entry_data: bytes) -> EntryId:
+	return ENTRY_HEADER.unpack_from(entry_data)[:3]
+
+
+def patch_anm(data: bytes, entries: Dict[EntryId, bytes], index: Optional[List[EntryRange]] = None,
+			anm_length: Optional[int] = None, frame_size: Optional[int] = None, loop: Optional[bool] = None) -> bytearray:
+	"""
+	Return the .anm with the encoded entries replacing the ones with the same id, and the frame length, frame size
+	and loop flag changed if given. The header only has counts, which stay the same, so entries may change size.
+	index is index_entries(data), if it is already known.
+	"""
+	if index is None:
+		index = index_entries(data)
+
+	ids = [entry.id for entry in index]
+	for entry_id in entries:
+		if ids.count(entry_id) != 1:
+			raise KeyError(f'Entry {entry_id} is in the .anm {ids.count(entry_id)} times')
+
+	header = list(ANM_HEADER.unpack_from(data))
+	if anm_length is not None:
+		header[0] = anm_length * 100
+	if frame_size is not None:
+		header[1] = frame_size * 100
+	if loop is not None:
+		header[3] = int(loop)
+
+	view = memoryview(data)
+	parts = [ANM_HEADER.pack(*header)]
+	copy_start = ANM_HEADER.size
+
+	for entry in index:
+		if entry.id in entries:
+			parts.append(view[copy_start:entry.start])
+			parts.append(entries[entry.id])
+			copy_start = entry.end
+
+	parts.append(view[copy_start:])
+
+	return bytearray(b''.join(parts))
@@ -2,6 +2,8 @@ import bpy
 from bpy.types import Armature, Bone, Action
 from typing import List, Set
 
+from common.session_cache import cached, get_pointer
+
 
 class AnmArmature:
 	armature: Armature
@@ -26,9 +28,10 @@ class AnmArmature:
 	
 	@property
 	def bones(self) -> List[str]:
-		bones = self.armature.data.bones
+		data = self.armature.data
 
-		return [bone.name for bone in bones  if not 'lod' in bone.name]
+		return cached(('bones', get_pointer(data)), lambda: [bone.name for bone in data.bones  if not 'lod' in bone.name],
+					lambda: [data])
 	
 	@property
 	def anm_bones(self) -> List[Bone]:
@@ -48,6 +51,9 @@ class AnmArmature:
 
 	@property
 	def materials(self) -> List[str]:
+		return cached(('materials', get_pointer(self.armature)), self.get_materials, self.get_material_sources)
+
+	def get_materials(self) -> List[str]:
 		material_list = list()
 		for obj in bpy.data.objects:
 			for model in self.armature.xfbin_clump_data.models:
@@ -58,12 +64,29 @@ class AnmArmature:
 								material_list.append(bpy.data.materials[material.name])
 
 		return sorted([mat.name for mat in material_list if not 'lod' in mat.name])
+
+	def get_material_sources(self) -> list:
+		"""
+		Return the datablocks the material list is made from: the armature, its models and their children.
+		"""
+		sources = [self.armature]
+		for model in self.armature.xfbin_clump_data.models:
+			model_obj = bpy.data.objects.get(model.name)
+			if model_obj:
+				sources.append(model_obj)
+				for children in model_obj.children:
+					sources.append(children)
+					if children.data:
+						sources.append(children.data)
+
+		return sources
 		
 	@property
 	def models(self) -> List[str]:
 		models = self.armature.xfbin_clump_data.models
 		
-		return [model.name for model in models if not 'lod' in model.name]
+		return cached(('models', get_pointer(self.armature)), lambda: [model.name for model in models if not 'lod' in model.name],
+					lambda: [self.armature])
 	
 	
 	@property
@@ -0,0 +1,231 @@
+import numpy as np
+
+from typing import Optional
+
+# Array counterparts of coordinate_converter.py that work without mathutils.
+# Quaternions are stored as (..., 4) arrays in Blender's (w, x, y, z) order.
+
+
+def quat_mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+	"""
+	Hamilton product a @ b, same as mathutils' Quaternion @ Quaternion.
+	"""
+	aw, ax, ay, az = np.moveaxis(np.asarray(a, dtype=np.float64), -1, 0)
+	bw, bx, by, bz = np.moveaxis(np.asarray(b, dtype=np.float64), -1, 0)
+
+	return np.stack((
+		aw * bw - ax * bx - ay * by - az * bz,
+		aw * bx + ax * bw + ay * bz - az * by,
+		aw * by - ax * bz + ay * bw + az * bx,
+		aw * bz + ax * by - ay * bx + az * bw), axis=-1)
+
+
+def quat_invert(q: np.ndarray) -> np.ndarray:
+	q = np.asarray(q, dtype=np.float64)
+	conj = q * np.array((1.0, -1.0, -1.0, -1.0))
+	return conj / np.sum(q * q, axis=-1, keepdims=True)
+
+
+def quat_normalize(q: np.ndarray) -> np.ndarray:
+	q = np.asarray(q, dtype=np.float64)
+	return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quat_rotate(q: np.ndarray, v: np.ndarray) -> np.ndarray:
+	"""
+	Rotate vectors by a quaternion, same as mathutils' Vector.rotate(Quaternion).
+	"""
+	q = quat_normalize(q)
+	w = q[..., :1]
+	u = q[..., 1:]
+	v = np.asarray(v, dtype=np.float64)
+
+	t = 2.0 * np.cross(u, v)
+	return v + w * t + np.cross(u, t)
+
+
+def euler_to_quat(euler: np.ndarray) -> np.ndarray:
+	"""
+	Convert XYZ eulers (radians) to quaternions, same as mathutils' Euler.to_quaternion().
+	"""
+	half = np.asarray(euler, dtype=np.float64) * 0.5
+	ci, cj, ch = np.moveaxis(np.cos(half), -1, 0)
+	si, sj, sh = np.moveaxis(np.sin(half), -1, 0)
+
+	cc = ci * ch
+	cs = ci * sh
+	sc = si * ch
+	ss = si * sh
+
+	return np.stack((
+		cj * cc + sj * ss,
+		cj * sc - sj * cs,
+		cj * ss + sj * cc,
+		cj * cs - sj * sc), axis=-1)
+
+
+def quat_to_euler_zyx(q: np.ndarray) -> np.ndarray:
+	"""
+	Convert quaternions to ZYX eulers (radians), same as mathutils' Quaternion.to_euler('ZYX').
+	"""
+	w, x, y, z = np.moveaxis(quat_normalize(q), -1, 0)
+
+	m01 = 2.0 * (x * y - w * z)
+	m00 = 1.0 - 2.0 * (y * y + z * z)
+	m02 = 2.0 * (x * z + w * y)
+	m12 = 2.0 * (y * z - w * x)
+	m22 = 1.0 - 2.0 * (x * x + y * y)
+
+	return np.stack((
+		np.arctan2(-m12, m22),
+		np.arcsin(np.clip(m02, -1.0, 1.0)),
+		np.arctan2(-m01, m00)), axis=-1)
+
+
+def matrix_decompose(matrix: np.ndarray):
+	"""
+	Split a 4x4 matrix into location, rotation quaternion and scale, same as mathutils' Matrix.decompose().
+	"""
+	matrix = np.asarray(matrix, dtype=np.float64)
+	loc = matrix[:3, 3].copy()
+	basis = matrix[:3, :3]
+
+	sca = np.linalg.norm(basis, axis=0)
+	if np.linalg.det(basis) < 0:
+		sca = -sca
+
+	rot_mat = basis / np.where(sca == 0, 1.0, sca)
+	rot = matrix_to_quat(rot_mat)
+
+	return loc, rot, sca
+
+
+def matrix_to_quat(m: np.ndarray) -> np.ndarray:
+	trace = m[0, 0] + m[1, 1] + m[2, 2]
+
+	if trace > 0:
+		s = 2.0 * np.sqrt(trace + 1.0)
+		q = (0.25 * s, (m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s)
+	elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+		s = 2.0 * np.sqrt(1.0 + m[0, 0] - m[1, 1] - m[2, 2])
+		q = ((m[2, 1] - m[1, 2]) / s, 0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s)
+	elif m[1, 1] > m[2, 2]:
+		s = 2.0 * np.sqrt(1.0 + m[1, 1] - m[0, 0] - m[2, 2])
+		q = ((m[0, 2] - m[2, 0]) / s, (m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s)
+	else:
+		s = 2.0 * np.sqrt(1.0 + m[2, 2] - m[0, 0] - m[1, 1])
+		q = ((m[1, 0] - m[0, 1]) / s, (m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s)
+
+	q = np.array(q, dtype=np.float64)
+	return q if q[0] >= 0 else -q
+
+
+def matrices_to_quats(m: np.ndarray) -> np.ndarray:
+	"""
+	matrix_to_quat for (..., 3, 3) arrays of rotation matrices.
+	"""
+	m = np.asarray(m, dtype=np.float64)
+	m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+	m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+	m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+	trace = m00 + m11 + m22
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		s = 2.0 * np.sqrt(np.maximum(trace + 1.0, 0))
+		q0 = np.stack((0.25 * s, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s), axis=-1)
+		s = 2.0 * np.sqrt(np.maximum(1.0 + m00 - m11 - m22, 0))
+		q1 = np.stack(((m21 - m12) / s, 0.25 * s, (m01 + m10) / s, (m02 + m20) / s), axis=-1)
+		s = 2.0 * np.sqrt(np.maximum(1.0 + m11 - m00 - m22, 0))
+		q2 = np.stack(((m02 - m20) / s, (m01 + m10) / s, 0.25 * s, (m12 + m21) / s), axis=-1)
+		s = 2.0 * np.sqrt(np.maximum(1.0 + m22 - m00 - m11, 0))
+		q3 = np.stack(((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, 0.25 * s), axis=-1)
+
+	case0 = trace > 0
+	case1 = ~case0 & (m00 > m11) & (m00 > m22)
+	case2 = ~case0 & ~case1 & (m11 > m22)
+
+	q = np.select([case0[..., None], case1[..., None], case2[..., None]], [q0, q1, q2], q3)
+	return np.where(q[..., :1] < 0, -q, q)
+
+
+def matrices_decompose(matrices: np.ndarray):
+	"""
+	matrix_decompose for (..., 4, 4) arrays. Returns (..., 3) locations, (..., 4) quaternions and (..., 3) scales.
+	"""
+	matrices = np.asarray(matrices, dtype=np.float64)
+	loc = matrices[..., :3, 3].copy()
+	basis = matrices[..., :3, :3]
+
+	sca = np.linalg.norm(basis, axis=-2)
+	sca = np.where(np.linalg.det(basis)[..., None] < 0, -sca, sca)
+
+	rot = matrices_to_quats(basis / np.where(sca == 0, 1.0, sca)[..., None, :])
+
+	return loc, rot, sca
+
+
+def make_quats_compatible(q: np.ndarray, previous: Optional[np.ndarray] = None) -> np.ndarray:
+	"""
+	Negate (F, ..., 4) quaternions so each one is in the same hemisphere as the one of the frame before, like
+	Quaternion.make_compatible keeps baked keys. previous is the (..., 4) quaternion before the first frame, if any.
+	"""
+	q = np.asarray(q)
+	if not len(q):
+		return q
+
+	first = np.einsum('...i,...i->...', q[0], previous) if previous is not None else np.ones(q.shape[1:-1])
+	dots = np.concatenate((np.asarray(first)[None], np.einsum('...i,...i->...', q[1:], q[:-1])))
+
+	return q * np.cumprod(np.where(dots < 0, -1.0, 1.0), axis=0)[..., None]
+
+
+def pose_to_local(pose: np.ndarray, rest: np.ndarray, parents: np.ndarray, bones: np.ndarray) -> np.ndarray:
+	"""
+	Convert armature space pose matrices to the local (channel) matrices of bones that inherit the rotation and scale of
+	their parent, same as Object.convert_space(from_space='POSE', to_space='LOCAL').
+	pose is (F, B, 4, 4) for every bone, rest the (B, 4, 4) matrix_local, parents the index of each parent or -1.
+	Returns (F, len(bones), 4, 4) for the bone indices in bones.
+	"""
+	pose = np.asarray(pose, dtype=np.float64)
+	rest = np.asarray(rest, dtype=np.float64)
+	parents = np.asarray(parents)[bones]
+	has_parent = parents >= 0
+
+	# local = rest^-1 @ parent_rest @ parent_pose^-1 @ pose, or rest^-1 @ pose without a parent
+	offset = np.linalg.inv(rest[bones])
+	offset[has_parent] = offset[has_parent] @ rest[parents[has_parent]]
+
+	parent_inv = np.broadcast_to(np.eye(4), (len(pose), len(bones), 4, 4)).copy()
+	if has_parent.any():
+		parent_inv[:, has_parent] = np.linalg.inv(pose[:, parents[has_parent]])
+
+	return offset @ parent_inv @ pose[:, bones]
+
+
+def quantize(values: np.ndarray, scale: int) -> np.ndarray:
+	"""
+	Scale and truncate towards zero, same as int(value * scale).
+	"""
+	return np.trunc(np.asarray(values, dtype=np.float64) * scale).astype(np.int64)
+
+
+def to_cm(values: np.ndarray) -> np.ndarray:
+	"""
+	Convert meters to centimeters in double precision, like the mathutils values were converted.
+	"""
+	return np.asarray(values, dtype=np.float64) * 100
+
+
+def to_anm_short_rotation(q: np.ndarray) -> np.ndarray:
+	"""
+	Convert (w, x, y, z) quaternions to the SHORT4 (-x, -y, -z, w) * 0x4000 layout.
+	"""
+	q = np.asarray(q, dtype=np.float64)
+	return quantize(np.stack((-q[..., 1], -q[..., 2], -q[..., 3], q[..., 0]), axis=-1), 0x4000)
+
+
+def to_anm_euler(q: np.ndarray) -> np.ndarray:
+	"""
+	Convert quaternions to inverted ZYX euler degrees, used when a rotation only has a single frame.
+	"""
+	return np.degrees(quat_to_euler_zyx(quat_invert(q)))
@@ -1,7 +1,10 @@
 import bpy
+import numpy as np
 from bpy.types import Armature
 from mathutils import Matrix, Vector
 
+from common.profiler import get_profiler, frame_set
+
 def get_edit_matrix(armature: bpy.types.Armature, bone_name: str) -> Matrix:
     """
     Get the edit / rest bone matrix.
@@ -27,21 +30,34 @@ def get_edit_matrix(armature: bpy.types.Armature, bone_name: str) -> Matrix:
     return mat
 
 
-def get_current_matrix_loc(armature: Armature, frames: list) -> list:
-	adjust_list = list()
-	if armature is not None:
-		bpy.context.view_layer.objects.active = armature
-	for frame in frames:
-		bpy.context.scene.frame_set(frame)
-		adjust_list.append(armature.matrix_world.to_translation().copy())
-	return adjust_list
-
-
-def get_current_matrix_rot(armature: Armature, frames: list):
-	adjust_list = list()
-	if armature is not None:
-		bpy.context.view_layer.objects.active = armature
-	for frame in frames:
-		bpy.context.scene.frame_set(frame)
-		adjust_list.append(armature.matrix_world.to_quaternion().copy())
-	return adjust_list
\ No newline at end of file
+def get_world_matrices(armature: Armature, frames: list):
+	"""
+	Scrub the frames once and return the (F, 3) translations and (F, 4) rotations of the armature object.
+	"""
+	loc = np.empty((len(frames), 3))
+	rot = np.empty((len(frames), 4))
+	for i, frame in enumerate(frames):
+		frame_set(bpy.context.scene, frame)
+		loc[i] = armature.matrix_world.to_translation()
+		rot[i] = armature.matrix_world.to_quaternion()
+	return loc, rot
+
+
+def get_edit_matrices(armature: Armature) -> dict:
+	"""
+	Get the edit / rest matrices of all bones relative to their parents, switching to edit mode only once.
+	"""
+	bpy.context.view_layer.objects.active = armature
+	bpy.ops.object.mode_set(mode='EDIT')
+	get_profiler().count('mode_set')
+
+	arm_mat = dict()
+	for arm_bone in armature.data.edit_bones:
+		arm_mat[arm_bone.name] = Matrix(arm_bone.get('matrix'))
+
+	matrices = dict()
+	for arm_bone in armature.data.edit_bones:
+		mat_parent = arm_mat.get(arm_bone.parent.name, Matrix.Identity(4)) if arm_bone.parent else Matrix.Identity(4)
+		matrices[arm_bone.name] = mat_parent.inverted() @ arm_mat[arm_bone.name]
+
+	return matrices
\ No newline at end of file
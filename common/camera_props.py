@@ -2,6 +2,8 @@ import bpy
 import math
 import numpy as np
 
+from common.profiler import frame_set
+
 def get_matrix_camera():
     camera = bpy.context.scene.camera
     d = dict()
@@ -10,30 +12,44 @@ def get_matrix_camera():
         d["matrix_world_rotation"] = camera.matrix_world.to_quaternion().copy()    
     return d
 
-def get_camera():
-    """Get all lights in the scene and return a list of dictionaries with the light data."""
-    
+def make_camera_samples(frame_count):
+    """Return the dictionary get_camera returns with room for frame_count frames, empty without a scene camera."""
+
     camera_dict = dict()
     if bpy.context.scene.camera is not None:
-        camera = bpy.data.cameras[bpy.context.scene.camera.data.name]
-        sce = bpy.context.scene
         camera_dict['name'] = bpy.context.scene.camera.data.name
-        camera_frame_pos = []
-        camera_frame_rot = []
-        camera_frame_FOV = []
-
-        for f in range(sce.frame_start, sce.frame_end + 1):
-            sce.frame_set(f)
-            matrix = get_matrix_camera()
-            camera_frame_pos.append(matrix['matrix_world'])
-            camera_frame_rot.append(matrix['matrix_world_rotation'])
-            camera_frame_FOV.append((2*np.arctan((0.5*camera.sensor_width)/camera.lens)*180)/math.pi)
-            
-            
-        camera_dict['FOV'] = camera_frame_FOV
-        camera_dict['matrix_world'] = camera_frame_pos
-        camera_dict['matrix_world_rotation'] = camera_frame_rot
+        camera_dict['FOV'] = np.empty(frame_count, dtype=np.float32)
+        camera_dict['matrix_world'] = np.empty((frame_count, 3), dtype=np.float32)
+        camera_dict['matrix_world_rotation'] = np.empty((frame_count, 4), dtype=np.float32)
+
+    return camera_dict
+
+def read_camera(camera_dict, i):
+    """Read the scene camera at the current frame into row i of the samples."""
+
+    sce = bpy.context.scene
+    camera = bpy.data.cameras[camera_dict['name']]
+
+    matrix = sce.camera.matrix_world
+    camera_dict['matrix_world'][i] = matrix.to_translation()
+    camera_dict['matrix_world_rotation'][i] = matrix.to_quaternion()
+    camera_dict['FOV'][i] = (2*np.arctan((0.5*camera.sensor_width)/camera.lens)*180)/math.pi
+
+def get_camera(frames=None):
+    """Get the scene camera and return a dictionary with its data.
+    frames are the frames to sample, every frame of the scene if None.
+    Sampled values are float32 arrays with a row per frame."""
+    
+    sce = bpy.context.scene
+
+    if frames is None:
+        frames = range(sce.frame_start, sce.frame_end + 1)
 
+    camera_dict = make_camera_samples(len(frames))
+    if camera_dict:
+        for i, f in enumerate(frames):
+            frame_set(sce, f)
+            read_camera(camera_dict, i)
 
     return camera_dict
 
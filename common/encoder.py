@@ -0,0 +1,606 @@
+import struct
+import numpy as np
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from br.br_anm import *
+from common.array_converter import *
+from common.entry_cache import EntryCache, make_key
+from common.profiler import get_profiler
+from common.snapshot import *
+
+# Everything from the clump structs to the .anm buffer. Works only on snapshot data,
+# so it can be run without Blender (see encode_snapshot.py).
+
+
+@dataclass
+class EncoderSettings:
+	is_looped: bool = False  # Set to True if your animation should be looped
+	export_materials: bool = False  # Set to True if you want to export material animations
+	do_optimize: bool = True  # Set to False if you don't want to optimize the animation data
+
+
+LIGHT_ENTRY_TYPES = ["SUN", "POINT", "AREA"]
+
+
+def make_mapping_reference(armatures: List[ArmatureSnapshot], types=False) -> List[str]:
+	"""
+	Create ExtraMapping Reference list of clump, coord, material, model names for all animated armatures.
+	"""
+	extra_mapping_reference: List[str] = list()
+
+	for armature in armatures:
+		clump_name = armature.models[0] if armature.models else armature.bones[0]
+
+		if types:
+			bones = list(map(lambda x: x + 'nuccChunkCoord', armature.bones))
+			materials = list(map(lambda x: x + 'nuccChunkMaterial', armature.materials))
+			models = list(map(lambda x: x + 'nuccChunkModel', armature.models))
+
+			extra_mapping_reference.extend([clump_name + 'nuccChunkClump', *bones, *materials, *models])
+		else:
+			extra_mapping_reference.extend([clump_name, *armature.bones, *armature.materials])
+
+	return extra_mapping_reference
+
+
+def make_clump(armature: ArmatureSnapshot, clump_index: int, mapping_reference_types: List[str]) -> Clump:
+	"""
+	Create clump struct based on armatures index and bone / model indices.
+	"""
+	bones = list(map(lambda x: x + 'nuccChunkCoord', armature.bones))
+	materials = list(map(lambda x: x + 'nuccChunkMaterial', armature.materials))
+	models = list(map(lambda x: x + 'nuccChunkModel', armature.models))
+
+	bone_material_indices = [mapping_reference_types.index(bone_material) for bone_material in [*bones, *materials]]
+	model_indices = [mapping_reference_types.index(model) for model in models]
+
+	return Clump(
+				clump_index,
+				len(bone_material_indices),
+				len(model_indices),
+				bone_material_indices,
+				model_indices)
+
+
+def make_clumps(snapshot: SceneSnapshot) -> List[Clump]:
+	"""
+	Create multiple clump structs based on the animated armatures present.
+	"""
+	clumps: List[Clump] = list()
+
+	for armature in snapshot.armatures:
+		clump_name = armature.models[0] if armature.models else armature.bones[0]
+		clump_index = snapshot.mapping_reference_types.index(clump_name + 'nuccChunkClump')
+
+		clumps.append(make_clump(armature, clump_index, snapshot.mapping_reference_types))
+
+	return clumps
+
+
+def get_bone_indices(armature: ArmatureSnapshot) -> Dict[str, int]:
+	return {name: index for index, name in enumerate(armature.bones)}
+
+
+def get_parent_indices(armature: ArmatureSnapshot, bone_indices: Dict[str, int]) -> np.ndarray:
+	"""
+	Return the (parent, child) bone indices of the armature as an (N, 2) array.
+	"""
+	return np.array([(bone_indices[parent], bone_indices[child]) for parent, child in armature.parents], dtype=np.uint16).reshape(-1, 2)
+
+
+def make_coord_parent(snapshot: SceneSnapshot) -> CoordParent:
+	"""
+	Create coord parents for all animated armatures.
+	"""
+	clump_indices: List[np.ndarray] = list()
+	coord_indices: List[np.ndarray] = list()
+
+	object_names = [armature.object_name for armature in snapshot.armatures]
+	bone_indices = [get_bone_indices(armature) for armature in snapshot.armatures]
+
+	for index, armature in enumerate(snapshot.armatures):
+		parent_indices = get_parent_indices(armature, bone_indices[index])
+		clump_indices.append(np.full(parent_indices.shape, index, dtype=np.int16))
+		coord_indices.append(parent_indices)
+
+		# Bones attached to other armatures with a "Copy Transforms" constraint
+		for target_name, target_bone, bone_name in armature.copy_transforms:
+			parent_clump_index = object_names.index(target_name)
+
+			clump_indices.append(np.array([[parent_clump_index, index]], dtype=np.int16))
+			coord_indices.append(np.array([[bone_indices[parent_clump_index][target_bone], bone_indices[index][bone_name]]], dtype=np.uint16))
+
+	if not coord_indices:
+		return CoordParent()
+
+	return CoordParent.from_indices(np.concatenate(clump_indices), np.concatenate(coord_indices))
+
+
+@dataclass
+class AnmLayout:
+	"""
+	Clumps and coord parents only depend on the armatures, not on their actions,
+	so they can be made once and shared by every action of a batch export.
+	"""
+	clumps: List[Clump]
+	coord_parent: CoordParent
+
+
+def make_layout(snapshot: SceneSnapshot) -> AnmLayout:
+	return AnmLayout(make_clumps(snapshot), make_coord_parent(snapshot))
+
+
+def add_curve(curve: Curve, curve_index: int, curve_size: int, curve_headers: List[CurveHeader], curves: List[Curve]):
+	"""
+	Add curve to curves list and its header to curve_headers.
+	"""
+	curves.append(curve)
+	curve_header = CurveHeader(curve_index, curve.curve_format.value, curve.key_count, curve_size)
+	curve_headers.append(curve_header)
+
+
+def make_keyed_curve(curve_format: AnmCurveFormat, frames, values) -> Curve:
+	"""
+	Create keyed curve of frame * 100 -> value, with the null key at the end.
+	A frame that appears more than once gets a single key with its last value.
+	"""
+	frames = np.asarray(frames).astype(np.int64) * 100
+	values = np.asarray(values, dtype=np.float32).reshape(len(frames), -1)
+
+	if len(frames) > 1 and len(np.unique(frames)) != len(frames):
+		unique, first = np.unique(frames, return_index=True)
+		last = len(frames) - 1 - np.unique(frames[::-1], return_index=True)[1]
+		order = np.argsort(first)
+
+		# Null key with the last value of all, not of the last kept key
+		frames = np.append(frames[first[order]], -1)
+		values = np.concatenate((values[last[order]], values[-1:]))
+		return Curve(curve_format, frames.astype(np.int32), values, False)
+
+	return Curve(curve_format, frames.astype(np.int32), values, True)
+
+
+def make_curve(curve_format: AnmCurveFormat, values, dtype=np.float32) -> Curve:
+	"""
+	Create unkeyed curve with a row of values per frame.
+	"""
+	values = np.asarray(values)
+	return Curve(curve_format, None, values.astype(dtype).reshape(len(values), -1), False)
+
+
+def get_optimize_frames(bone: BoneSnapshot) -> List[int]:
+	"""
+	Return keyframes whose first location and rotation channels don't change from the previous and next keyframe.
+	"""
+	loc = bone.loc_values
+	rot = bone.rot_values
+
+	if len(loc) < 3 or len(rot) != len(loc):
+		return list()
+
+	still = ((loc[:-2, 0] == loc[1:-1, 0]) & (loc[1:-1, 0] == loc[2:, 0]) &
+			(rot[:-2, 0] == rot[1:-1, 0]) & (rot[1:-1, 0] == rot[2:, 0]))
+
+	return bone.loc_frames[1:-1][still].tolist()
+
+
+def make_entry_bone(bone: BoneSnapshot, clump_index: int, clump: Clump, mapping_reference_types: List[str], do_optimize: bool, frame_offset: int = 0) -> Entry:
+	"""
+	Make .anm Entry struct. An entry is equivalent to an Action Group in Blender.
+	Keys are written relative to frame_offset.
+	"""
+	curve_headers: List[CurveHeader] = list()
+	curves: List[Curve] = list()
+
+	loc, rot, sca = matrix_decompose(bone.rest_matrix)
+
+	optimize_frames = list()
+	if do_optimize:
+		with get_profiler().stage('optimization', kind='bone'):
+			optimize_frames = get_optimize_frames(bone)
+
+	def keep(frames: np.ndarray) -> np.ndarray:
+		return ~np.isin(frames, optimize_frames)
+
+	for curve_index, data_path in enumerate(bone.data_paths):
+		if data_path == 'location':
+			if not bone.is_root:
+				converted_values = (quat_rotate(rot, bone.loc_values) + loc) * 100
+			else:
+				converted_values = (bone.loc_values + bone.world_loc) * 100
+
+			mask = keep(bone.loc_frames)
+			curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT3, bone.loc_frames[mask] - frame_offset, converted_values[mask])
+			add_curve(curve, curve_index, 12, curve_headers, curves)
+
+		if data_path == 'rotation_euler' or data_path == 'rotation_quaternion':
+			if data_path == 'rotation_euler':
+				values = euler_to_quat(bone.rot_values)
+			else:
+				values = bone.rot_values
+
+			if not bone.is_root:
+				converted_values = np.roll(quat_invert(quat_mul(rot, values)), -1, axis=-1)  # (x, y, z, w)
+			else:
+				converted_values = to_anm_short_rotation(quat_mul(bone.world_rot, values))
+
+			mask = keep(bone.rot_frames)
+			curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT4, bone.rot_frames[mask] - frame_offset, converted_values[mask])
+			add_curve(curve, curve_index, 12, curve_headers, curves)
+
+		if data_path == 'scale':
+			converted_values = np.abs(bone.scale_values) * sca
+
+			mask = keep(bone.scale_frames)
+			curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT3, bone.scale_frames[mask] - frame_offset, converted_values[mask])
+			add_curve(curve, curve_index, 12, curve_headers, curves)
+
+	# Add toggled visibility curve
+	visibility_frames = np.arange(len(bone.visibility)) if bone.visibility_frames is None else bone.visibility_frames - frame_offset
+	add_curve(make_keyed_curve(AnmCurveFormat.INT1_FLOAT1, visibility_frames, bone.visibility), 3, 12, curve_headers, curves)
+
+	coord_index = clump.bone_material_indices.index(mapping_reference_types.index(bone.name + 'nuccChunkCoord'))
+
+	return Entry(clump_index, coord_index, EntryFormat.BONE.value, len(curve_headers), curve_headers, curves)
+
+
+# Curve index of each MaterialEntry field
+MATERIAL_CURVE_INDICES = [0, 1, 8, 9, 2, 3, 10, 11, 12, 15, 16]
+
+
+def make_entry_material(material: MaterialSnapshot, clump_index: int, clump: Clump, mapping_reference_types: List[str], frame_offset: int = 0) -> Entry:
+	"""
+	Make .anm Entry struct for material. An entry is equivalent to an Action Group in Blender.
+	"""
+	curve_headers: List[CurveHeader] = list()
+	curves: List[Curve] = list()
+
+	values = np.array(material.values, dtype=np.float64)
+
+	# Flip the V coordinate of both UV locations
+	values[:, 1] = (-1 * values[:, 3]) + 1 - values[:, 1]
+	values[:, 5] = (-1 * values[:, 7]) + 1 - values[:, 5]
+
+	frames = np.arange(len(values)) if material.frames is None else material.frames - frame_offset
+
+	for column, curve_index in enumerate(MATERIAL_CURVE_INDICES):
+		add_curve(make_keyed_curve(AnmCurveFormat.INT1_FLOAT1, frames, values[:, column]), curve_index, 24, curve_headers, curves)
+
+	add_curve(make_curve(AnmCurveFormat.FLOAT1, [0]), 4, 12, curve_headers, curves) #celshade param setting !NEVER DELETE THAT!
+
+	coord_index = clump.bone_material_indices.index(mapping_reference_types.index(material.name + 'nuccChunkMaterial'))
+
+	return Entry(clump_index, coord_index, EntryFormat.MATERIAL.value, len(curve_headers), curve_headers, curves)
+
+
+def get_key_indices(sample_count: int, key_step: int) -> np.ndarray:
+	"""
+	Return the indices of every key_step-th sample, always including the last one.
+	"""
+	indices = np.arange(0, sample_count, key_step)
+
+	if len(indices) and indices[-1] != sample_count - 1:
+		indices = np.append(indices, sample_count - 1)
+
+	return indices
+
+
+def make_entry_camera(camera: CameraSnapshot, frame_step: int = 1) -> Entry:
+	"""
+	Make .anm Entry struct for camera object. An entry is equivalent to an Action Group in Blender.
+	Samples are frame_step frames apart.
+	"""
+	curve_headers: List[CurveHeader] = list()
+	curves: List[Curve] = list()
+
+	frame_count = len(camera.position)
+	key_indices = get_key_indices(frame_count, camera.key_step)
+
+	# Position
+	if frame_count > 1:
+		curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT3, key_indices * frame_step, to_cm(camera.position[key_indices]))
+		add_curve(curve, 0, 24, curve_headers, curves)
+
+	# Rotation
+	if frame_count < 2:
+		add_curve(make_curve(AnmCurveFormat.FLOAT3ALT, to_anm_euler(camera.rotation)), 1, 24, curve_headers, curves)
+	else:
+		add_curve(make_curve(AnmCurveFormat.SHORT4, to_anm_short_rotation(camera.rotation), np.int16), 1, 24, curve_headers, curves)
+
+	# FOV
+	if frame_count > 1:
+		curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT1, key_indices * frame_step, camera.fov[key_indices])
+		add_curve(curve, 2, 24, curve_headers, curves)
+
+	return Entry(-1, 0, EntryFormat.CAMERA.value, len(curve_headers), curve_headers, curves)
+
+
+def make_light_color_curve(light: LightSnapshot, curve_headers: List[CurveHeader], curves: List[Curve]):
+	"""
+	Add BYTE3 color curve, padded with the last color so the frame count is a multiple of 4.
+	"""
+	colors = quantize(light.color, 255)
+
+	if len(colors) % 4 != 0:
+		colors = np.concatenate((colors, np.repeat(colors[-1:], 4 - len(colors) % 4, axis=0)))
+
+	add_curve(make_curve(AnmCurveFormat.BYTE3, colors, np.uint8), 0, 24, curve_headers, curves)
+
+
+def make_entry_light(light: LightSnapshot, light_index: int, frame_step: int = 1) -> Entry:
+	"""
+	Make .anm Entry struct for lightPoint, LightDirc and Ambient object. Samples are frame_step frames apart.
+	"""
+	curve_headers: List[CurveHeader] = list()
+	curves: List[Curve] = list()
+
+	frame_count = len(light.strength)
+
+	make_light_color_curve(light, curve_headers, curves)
+
+	if light.type == "POINT":
+		add_curve(make_curve(AnmCurveFormat.FLOAT1ALT, light.strength), 1, 4, curve_headers, curves)
+
+		if len(light.position) > 1:
+			key_indices = get_key_indices(len(light.position), light.key_step)
+			curve = make_keyed_curve(AnmCurveFormat.INT1_FLOAT3, key_indices * frame_step, to_cm(light.position[key_indices]))
+			add_curve(curve, 2, 24, curve_headers, curves)
+
+		add_curve(make_curve(AnmCurveFormat.FLOAT1ALT, to_cm(light.size)), 3, 24, curve_headers, curves)
+		add_curve(make_curve(AnmCurveFormat.FLOAT1ALT, to_cm(light.size_2)), 4, 24, curve_headers, curves)
+
+		entry_format = EntryFormat.LIGHTPOINT
+
+	if light.type == "SUN":
+		add_curve(make_curve(AnmCurveFormat.FLOAT1ALT, light.strength), 1, 24, curve_headers, curves)
+
+		if len(light.rotation) < 2:
+			add_curve(make_curve(AnmCurveFormat.FLOAT3ALT, to_anm_euler(light.rotation)), 2, 24, curve_headers, curves)
+		else:
+			add_curve(make_curve(AnmCurveFormat.SHORT4, to_anm_short_rotation(light.rotation), np.int16), 2, 24, curve_headers, curves)
+
+		entry_format = EntryFormat.LIGHTDIRECTION
+
+	if light.type == "AREA":
+		add_curve(make_curve(AnmCurveFormat.FLOAT1ALT, light.strength), 1, 24, curve_headers, curves)
+
+		entry_format = EntryFormat.AMBIENT
+
+	return Entry(-1, light_index, entry_format.value, len(curve_headers), curve_headers, curves)
+
+
+def encode_entry(entry: Entry) -> bytes:
+	with BinaryReader(endianness=Endian.BIG) as entry_writer:
+		entry_writer.write_struct(entry)
+
+		return bytes(entry_writer.buffer())
+
+
+def make_cached_entry(cache: Optional[EntryCache], make_entry: Callable[[], Entry], key_parts: tuple, **tags) -> BrStruct:
+	"""
+	Return the entry from the cache when its inputs didn't change, otherwise make it and store it.
+	Tags (entry kind, armature) are passed to the profiler stages.
+	"""
+	profiler = get_profiler()
+
+	if cache is None:
+		with profiler.stage('conversion', **tags):
+			return make_entry()
+
+	with profiler.stage('entry cache', **tags):
+		key = make_key(*key_parts)
+		data = cache.get(key)
+
+	if data is None:
+		profiler.count('entry cache misses')
+
+		with profiler.stage('conversion', **tags):
+			entry = make_entry()
+
+		with profiler.stage('serialization', **tags):
+			data = encode_entry(entry)
+
+		cache.put(key, data)
+	else:
+		profiler.count('entry cache hits')
+
+	return EncodedEntry(data)
+
+
+def get_share_key(item) -> Optional[Tuple]:
+	"""
+	Return a key that is the same for bones / materials whose entries only differ in the clump and coord index.
+	The sampler shares the channel arrays of bones with the same animation (e.g. of _extra_clump copies)
+	and the snapshot of materials with the same name. Root bones are placed by their own armature object.
+	"""
+	if isinstance(item, MaterialSnapshot):
+		return ('material', id(item))
+
+	if item.is_root:
+		return None
+
+	visibility_frames = None if item.visibility_frames is None else item.visibility_frames.tobytes()
+
+	return (id(item.loc_values), id(item.rot_values), id(item.scale_values), tuple(item.data_paths),
+			item.rest_matrix.tobytes(), item.visibility.tobytes(), visibility_frames)
+
+
+def retarget_entry(data: bytes, clump_index: int, coord_index: int) -> bytes:
+	"""
+	Return an encoded entry with another clump and coord index, its curves stay the same.
+	"""
+	return struct.pack('>hh', clump_index, coord_index) + data[4:]
+
+
+def iter_entries(snapshot: SceneSnapshot, clumps: List[Clump], settings: EncoderSettings, cache: Optional[EntryCache] = None) -> Iterator[BrStruct]:
+	"""
+	Make entries for all bones and armatures, one at a time.
+	Bones and materials with the same samples are converted and optimized once, the others copy their entry.
+	"""
+	mapping_reference_types = snapshot.mapping_reference_types
+	frame_offset = snapshot.frame_offset
+	frame_step = snapshot.frame_step
+	profiler = get_profiler()
+
+	items = [item for armature in snapshot.armatures for item in armature.anm_bones + (armature.anm_materials if settings.export_materials else [])]
+	share_counts = Counter(key for key in map(get_share_key, items) if key is not None)
+	shared: Dict[Tuple, bytes] = dict()
+
+	def make_shared_entry(item, clump_index: int, coord_index: int, make: Callable[[], BrStruct]) -> BrStruct:
+		"""
+		Copy the entry of an item with the same key, or make it and keep its data if other items have that key.
+		"""
+		key = get_share_key(item)
+
+		if share_counts.get(key, 0) < 2:
+			return make()
+
+		if key in shared:
+			profiler.count('shared entries')
+			return EncodedEntry(retarget_entry(shared[key], clump_index, coord_index))
+
+		entry = make()
+		if isinstance(entry, EncodedEntry):
+			shared[key] = entry.data
+		else:
+			with profiler.stage('serialization'):
+				shared[key] = encode_entry(entry)
+
+		return EncodedEntry(shared[key])
+
+	def make_bone(bone: BoneSnapshot, armature_index: int, clump: Clump) -> Entry:
+		e: Entry = make_entry_bone(bone, armature_index, clump, mapping_reference_types, settings.do_optimize, frame_offset)
+
+		if settings.do_optimize:
+			with get_profiler().stage('optimization', kind='bone'):
+				clean_entry(e) # Remove duplicate keyframes from entry
+
+		return e
+
+	for armature_index, (armature, clump) in enumerate(zip(snapshot.armatures, clumps)):
+		for bone in armature.anm_bones:
+			coord_index = clump.bone_material_indices.index(mapping_reference_types.index(bone.name + 'nuccChunkCoord'))
+
+			yield make_shared_entry(bone, armature_index, coord_index, lambda: make_cached_entry(cache, lambda: make_bone(bone, armature_index, clump),
+				(bone, armature_index, coord_index, settings.do_optimize, frame_offset), kind='bone', armature=armature.object_name))
+
+		if settings.export_materials:
+			for material in armature.anm_materials:
+				coord_index = clump.bone_material_indices.index(mapping_reference_types.index(material.name + 'nuccChunkMaterial'))
+
+				yield make_shared_entry(material, armature_index, coord_index, lambda: make_cached_entry(cache,
+					lambda: make_entry_material(material, armature_index, clump, mapping_reference_types, frame_offset),
+					(material, armature_index, coord_index, frame_offset), kind='material', armature=armature.object_name))
+
+	# If there is a camera in the scene, create an entry for it
+	if snapshot.camera is not None:
+		yield make_cached_entry(cache, lambda: make_entry_camera(snapshot.camera, frame_step), (snapshot.camera, frame_step), kind='camera')
+
+	# If there are light objects in the scene, create entries for each of them
+	for light_index, light in enumerate(snapshot.lights):
+		if light.type in LIGHT_ENTRY_TYPES:
+			yield make_cached_entry(cache, lambda: make_entry_light(light, light_index, frame_step), (light, light_index, frame_step), kind='light')
+
+
+def make_entries(snapshot: SceneSnapshot, clumps: List[Clump], settings: EncoderSettings, cache: Optional[EntryCache] = None) -> List[BrStruct]:
+	"""
+	Make entries for all bones and armatures.
+	"""
+	return list(iter_entries(snapshot, clumps, settings, cache))
+
+
+def clean_entry(entry: Entry) -> None:
+	"""
+	Remove duplicate keyframes from entry.
+	"""
+	header: CurveHeader
+	curve: Curve
+
+	for (header, curve) in zip(entry.curve_headers, entry.curves):
+		if curve.curve_format not in KEYED_FORMATS or not len(curve.values):
+			continue
+
+		if not (curve.values == curve.values[0]).all():  # The null key repeats the last value
+			continue
+
+		if curve.curve_format == AnmCurveFormat.INT1_FLOAT3:
+			curve.curve_format = AnmCurveFormat.FLOAT3
+			curve.frames, curve.values, curve.null_key = None, curve.values[:1], False
+
+			header.frame_count = 1
+			header.curve_format = AnmCurveFormat.FLOAT3
+
+		elif curve.curve_format == AnmCurveFormat.INT1_FLOAT4:
+			curve.frames, curve.values, curve.null_key = curve.frames[:1], curve.values[:1], True # Keep first key and null key
+
+			header.frame_count = curve.key_count
+
+		elif curve.curve_format == AnmCurveFormat.INT1_FLOAT1:
+			curve.curve_format = AnmCurveFormat.FLOAT1
+			curve.frames, curve.values, curve.null_key = None, curve.values[:1], False
+
+			header.frame_count = 1
+			header.curve_format = AnmCurveFormat.FLOAT1
+
+
+def get_other_entry_count(snapshot: SceneSnapshot) -> int:
+	"""
+	Return the number of camera and light entries.
+	"""
+	other_entry_count = int(snapshot.camera is not None)
+	other_entry_count += sum(1 for light in snapshot.lights if light.type in LIGHT_ENTRY_TYPES)
+
+	return other_entry_count
+
+
+def get_entry_count(snapshot: SceneSnapshot, settings: EncoderSettings) -> int:
+	"""
+	Return the number of entries iter_entries makes.
+	"""
+	entry_count = sum(len(armature.anm_bones) for armature in snapshot.armatures)
+
+	if settings.export_materials:
+		entry_count += sum(len(armature.anm_materials) for armature in snapshot.armatures)
+
+	return entry_count + get_other_entry_count(snapshot)
+
+
+def make_anm(snapshot: SceneSnapshot, settings: EncoderSettings, cache: Optional[EntryCache] = None, layout: Optional[AnmLayout] = None) -> bytearray:
+	"""
+	Make anm buffer from a scene snapshot and return it.
+	Entries found in the cache are copied into the buffer as they are.
+	"""
+	profiler = get_profiler()
+
+	with profiler.stage('encoding'), profiler.count_calls(BinaryReader, '_BinaryReader__write_type', 'BinaryReader writes'):
+		if layout is None:
+			layout = make_layout(snapshot)
+
+		entries = make_entries(snapshot, layout.clumps, settings, cache)
+
+		return write_anm(snapshot, settings, layout, entries)
+
+
+def write_anm(snapshot: SceneSnapshot, settings: EncoderSettings, layout: AnmLayout, entries: List[BrStruct],
+			other_entry_count: Optional[int] = None) -> bytearray:
+	"""
+	Write the anm header, clumps, coord parents and the made entries into a buffer and return it.
+	other_entry_count is the number of camera and light entries, counted in the snapshot if None.
+	"""
+	clumps = layout.clumps
+	coord_parent = layout.coord_parent
+
+	# TODO: Get the frame length from the Action itself
+	frame_length = snapshot.frame_end - snapshot.frame_offset
+
+	anm = Anm(frame_length, snapshot.frame_step, len(entries), settings.is_looped,
+					len(clumps), get_other_entry_count(snapshot) if other_entry_count is None else other_entry_count, coord_parent.count,
+					clumps, coord_parent, entries)
+
+	with get_profiler().stage('serialization'), BinaryReader(endianness=Endian.BIG) as anm_writer:
+		anm_writer.write_struct(anm)
+
+		return anm_writer.buffer()
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import threading
+import numpy as np
+
+from dataclasses import fields, is_dataclass
+from typing import Optional
+
+# On-disk cache of encoded .anm entries, keyed by a hash of everything the entry is built from.
+# Files are stored as <cache folder>/<first 2 hash chars>/<hash>.entry and evicted least recently used first.
+
+CACHE_VERSION = 1  # Bump when the encoded entry layout changes
+
+
+def hash_update(h, value) -> None:
+	"""
+	Feed a snapshot value (arrays, dataclasses, lists, scalars) into a hashlib object.
+	"""
+	if isinstance(value, np.ndarray):
+		h.update(f'a{value.dtype.str}{value.shape}'.encode())
+		h.update(np.ascontiguousarray(value).tobytes())
+
+	elif is_dataclass(value):
+		h.update(f'd{type(value).__name__}'.encode())
+		for f in fields(value):
+			hash_update(h, getattr(value, f.name))
+
+	elif isinstance(value, (list, tuple)):
+		h.update(f'l{len(value)}'.encode())
+		for item in value:
+			hash_update(h, item)
+
+	else:
+		h.update(f'v{type(value).__name__}:{value!r};'.encode())
+
+
+def make_key(*parts) -> str:
+	h = hashlib.blake2b(digest_size=20)
+	hash_update(h, CACHE_VERSION)
+
+	for part in parts:
+		hash_update(h, part)
+
+	return h.hexdigest()
+
+
+class EntryCache:
+	path: str
+	max_size: int
+	size: int
+
+	def __init__(self, path: str, max_size: int = 512 * 1024 * 1024):
+		"""
+		Open (or create) the cache folder. max_size is the size limit in bytes.
+		"""
+		self.path = path
+		self.max_size = max_size
+
+		if not os.path.exists(path):
+			os.makedirs(path)
+
+		self.size = sum(entry.stat().st_size for entry in self.__files())
+
+	def __files(self):
+		for folder in os.scandir(self.path):
+			if folder.is_dir():
+				for entry in os.scandir(folder.path):
+					if entry.name.endswith('.entry'):
+						yield entry
+
+	def __file_path(self, key: str) -> str:
+		return os.path.join(self.path, key[:2], key + '.entry')
+
+	def get(self, key: str) -> Optional[bytes]:
+		"""
+		Return the cached entry bytes, or None on a miss.
+		"""
+		path = self.__file_path(key)
+
+		try:
+			with open(path, 'rb') as f:
+				data = f.read()
+
+			os.utime(path)  # Mark as recently used
+		except FileNotFoundError:  # Missing or evicted by another export
+			return None
+
+		return data
+
+	def put(self, key: str, data: bytes) -> None:
+		path = self.__file_path(key)
+		folder = os.path.dirname(path)
+
+		os.makedirs(folder, exist_ok=True)
+
+		try:
+			old_size = os.path.getsize(path)  # Another export may have put the same entry since get
+		except FileNotFoundError:
+			old_size = 0
+
+		temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'  # Other processes and exports may put the same entry
+		with open(temp_path, 'wb') as f:
+			f.write(data)
+		os.replace(temp_path, path)
+
+		self.size += len(data) - old_size
+
+		if self.size > self.max_size:
+			self.evict()
+
+	def evict(self) -> None:
+		"""
+		Remove least recently used entries until the cache is 10% under max_size, so the next puts don't evict again.
+		"""
+		entries = list()
+		for entry in self.__files():
+			try:
+				entries.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+			except FileNotFoundError:  # Evicted by another export
+				pass
+
+		entries.sort()
+		self.size = sum(size for _, size, _ in entries)
+
+		for _, size, path in entries:
+			if self.size <= self.max_size * 0.9:
+				break
+
+			self.size -= size
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
@@ -0,0 +1,98 @@
+import bpy
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from common.armature_props import AnmArmature
+from common.encoder import AnmLayout, LIGHT_ENTRY_TYPES, make_layout
+from common.entry_cache import EntryCache
+from common.light_props import get_light_objects
+from common.sampler import SamplingSettings, SceneSampler
+from common.snapshot import ArmatureSnapshot
+
+# Everything the binary and json writers need to know about the scene, collected once per export.
+
+CAMERA_NAME = 'camera01'
+
+
+@dataclass
+class LightPlan:
+	name: str
+	type: str
+	index: int  # Index among all light objects, used for the file and chunk names
+
+	@property
+	def chunk_name(self) -> str:
+		return self.name + str(self.index + 1).zfill(2)
+
+
+@dataclass
+class ExportPlan:
+	armatures: List[ArmatureSnapshot]  # Names, chunk paths, bones, materials and models of the animated armatures
+	clump_names: List[str]  # Armature data names
+	sampler: SceneSampler
+	layout: AnmLayout  # Clumps and coord parents
+
+	camera: Optional[str]  # Camera chunk name, None if there is no animated camera
+	lights: List[LightPlan]  # Lights that get an entry and a file
+
+	export_path: str  # "Exported Animations" folder
+	cache_path: str  # Entry cache folder
+	chunk_path: str  # Chunk path of the camera and light chunks
+	anm_chunk_path: str
+
+	entry_cache: Optional[EntryCache] = None  # Opened by the first action that uses it, its size is kept for the next ones
+
+	@property
+	def mapping_reference(self) -> List[str]:
+		return self.sampler.scene.mapping_reference
+
+	@property
+	def mapping_reference_types(self) -> List[str]:
+		return self.sampler.scene.mapping_reference_types
+
+	def anm_folder(self, action_name: str) -> str:
+		return f'{self.export_path}\\[000] {action_name} (nuccChunkAnm)'
+
+
+def get_anm_armatures() -> List[AnmArmature]:
+	"""
+	Return the selected armatures that contain animation data.
+	"""
+	anm_armatures: List[AnmArmature] = list()
+
+	for obj in bpy.context.selected_objects:
+		if obj.type == "ARMATURE":
+			armature_obj = bpy.data.objects[obj.name]
+
+			if armature_obj.animation_data:
+				anm_armatures.append(AnmArmature(armature_obj))
+
+	return anm_armatures
+
+
+def make_export_plan(directory: str, export_materials: bool, anm_chunk_path: str = "", sampling: Optional[SamplingSettings] = None) -> ExportPlan:
+	"""
+	Collect the animated armatures, camera and lights of the scene and make the clumps for them.
+	Files are exported to the "Exported Animations" folder in directory.
+	"""
+	anm_armatures = get_anm_armatures()
+
+	sampler = SceneSampler(anm_armatures, export_materials, sampling)
+	armatures = sampler.scene.armatures
+
+	lights = [LightPlan(light.data.name, light.data.type, index) for index, light in enumerate(get_light_objects())]
+
+	chunk_path = armatures[0].chunk_path if armatures else ""
+
+	return ExportPlan(
+		armatures,
+		[anm_armature.armature.data.name for anm_armature in anm_armatures],
+		sampler,
+		make_layout(sampler.scene),
+		CAMERA_NAME if sampler.has_camera else None,
+		[light for light in lights if light.type in LIGHT_ENTRY_TYPES],
+		f'{directory}\\Exported Animations',
+		f'{directory}\\Cache',
+		chunk_path,
+		anm_chunk_path or chunk_path)
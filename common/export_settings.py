@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from common.encoder import EncoderSettings
+from common.sampling_settings import SamplingSettings
+
+# Settings of one export, passed to every step of it instead of being read from the exporter module,
+# so exports with different settings can run at the same time in one process.
+
+
+@dataclass
+class ExportSettings:
+	is_looped: bool = False  # Set to True if your animation should be looped
+	export_materials: bool = False  # Set to True if you want to export material animations
+	do_optimize: bool = True  # Set to False if you don't want to optimize the animation data
+	write_snapshot: bool = False  # Save sampled scene data, which encode_snapshot.py can encode again without Blender
+	use_entry_cache: bool = True  # Reuse entries that didn't change since the last export
+	entry_cache_size: int = 512  # Size limit of the entry cache in MB
+	session_cache_size: int = 64  # Size limit in MB of the scene data kept between exports until it changes, 0 turns it off
+	profile_export: bool = False  # Write a _profile.json with the time spent in each export stage
+	output_threads: int = 4  # Number of threads writing the exported files
+	compact_page_json: bool = False  # Write _page.json without indentation
+	write_size_report: bool = False  # Write a _size.json with the bytes of every entry, curve and format of the .anm
+
+	anm_chunk_path: str = ""  # Path of anm chunk file
+
+	frame_range: Optional[Tuple[int, int]] = None  # (start, end) frames to export, every frame of the scene if None
+	frame_step: int = 1  # Sample every Nth frame
+	frame_step_overrides: Dict[str, int] = field(default_factory=dict)  # Frame step of keyed curves by entry kind or armature
+	sample_pose: bool = False  # Sample bones from their evaluated pose, so constraints and IK are exported without baking
+	window_size: int = 0  # Sample and encode in windows of this many frames, 0 samples everything at once
+	sampling_workers: int = 0  # Sample the frames in this many background Blender processes, 0 samples in this one
+	incremental_export: bool = False  # Only sample and encode the entries that changed since the last export of an action
+
+	batch_actions: List[str] = field(default_factory=list)  # Names of actions to export one after another
+	batch_action_pattern: str = ""  # Export every action matching this pattern too
+
+	@property
+	def encoder(self) -> EncoderSettings:
+		return EncoderSettings(self.is_looped, self.export_materials, self.do_optimize)
+
+	@property
+	def sampling(self) -> SamplingSettings:
+		return SamplingSettings(*(self.frame_range or (None, None)), self.frame_step, dict(self.frame_step_overrides), self.sample_pose)
+
+	def get_ignored_settings(self) -> List[str]:
+		"""
+		Return a warning for every setting that has no effect together with the others.
+		"""
+		ignored = list()
+
+		if self.incremental_export and (self.window_size or self.sampling_workers):
+			ignored.append('incremental_export is ignored with window_size or sampling_workers, every entry is exported again')
+
+		if self.window_size and self.use_entry_cache:
+			ignored.append('use_entry_cache is ignored with window_size, windows are encoded without the entry cache')
+
+		if self.window_size and self.write_snapshot:
+			ignored.append('write_snapshot is ignored with window_size, no snapshot of the whole scene is made')
+
+		return ignored
@@ -0,0 +1,141 @@
+import numpy as np
+
+from typing import Iterable, Optional, Set
+
+# Digests of the animation and properties an entry is sampled from, to tell which entries changed since the
+# last export without sampling them. Anything that can't be compared (drivers, NLA, F-curve modifiers,
+# parents and constraints) has no digest, its entries are always sampled again.
+
+KEYFRAME_ARRAYS = (('co', 2), ('handle_left', 2), ('handle_right', 2), ('back', 1), ('amplitude', 1), ('period', 1))
+
+OBJECT_PATHS = ('location', 'rotation_mode', 'rotation_euler', 'rotation_quaternion', 'rotation_axis_angle', 'scale',
+	'delta_location', 'delta_rotation_euler', 'delta_rotation_quaternion', 'delta_scale', 'hide_render')
+
+# Node sockets read_material_entry reads: node name, socket list and index
+MATERIAL_SOCKETS = (
+	('Mapping', 'inputs', 1), ('Mapping', 'inputs', 3),
+	('UV_0_Mapping', 'inputs', 1), ('UV_0_Mapping', 'inputs', 3),
+	('UV_1_Mapping', 'inputs', 1), ('UV_1_Mapping', 'inputs', 3),
+	('BlendRate', 'outputs', 0), ('Glare', 'outputs', 0), ('Alpha', 'outputs', 0),
+)
+
+
+def hash_fcurves(h, fcurves) -> bool:
+	"""
+	Feed keyframes, handles, interpolation and extrapolation of F-curves into a hashlib object.
+	Returns False if one of them has modifiers, which aren't compared.
+	"""
+	for fcurve in fcurves:
+		if len(fcurve.modifiers):
+			return False
+
+		keyframe_points = fcurve.keyframe_points
+		count = len(keyframe_points)
+
+		for name, size in KEYFRAME_ARRAYS:
+			values = np.empty(count * size, dtype=np.float32)
+			keyframe_points.foreach_get(name, values)
+			h.update(values.tobytes())
+
+		h.update(repr((fcurve.data_path.rpartition('.')[2], fcurve.array_index, fcurve.extrapolation,
+			[(k.interpolation, k.easing) for k in keyframe_points])).encode())
+
+	return True
+
+
+def hash_animation(h, datablock) -> Optional[Set[str]]:
+	"""
+	Feed the action of a datablock into a hashlib object and return the data paths it animates.
+	None if the datablock has drivers or NLA tracks.
+	"""
+	animation_data = datablock.animation_data
+
+	if animation_data is not None and (len(animation_data.drivers) or len(animation_data.nla_tracks)):
+		return None
+
+	if animation_data is None or animation_data.action is None:
+		h.update(b'static;')
+		return set()
+
+	fcurves = animation_data.action.fcurves
+	h.update(repr([(fcurve.data_path, fcurve.array_index) for fcurve in fcurves]).encode())
+
+	if not hash_fcurves(h, fcurves):
+		return None
+
+	return {fcurve.data_path for fcurve in fcurves}
+
+
+def hash_properties(h, datablock, paths: Iterable[str], animated: Set[str]) -> None:
+	"""
+	Feed the current value of the properties that aren't animated into a hashlib object. Animated ones
+	depend on the current frame, their F-curves are already hashed.
+	"""
+	for path in paths:
+		if path in animated:
+			continue
+
+		value = datablock.path_resolve(path)
+		if hasattr(value, '__len__') and not isinstance(value, str):
+			value = tuple(value)
+
+		h.update(f'{path}={value!r};'.encode())
+
+
+def hash_object(h, obj, data_paths: Iterable[str] = ()) -> bool:
+	"""
+	Feed the transform, visibility and animation of an object (and data_paths of its data) into a hashlib object.
+	Returns False if it can't be compared.
+	"""
+	if obj.parent is not None or len(obj.constraints):
+		return False
+
+	h.update(f'object {obj.name};'.encode())
+
+	animated = hash_animation(h, obj)
+	if animated is None:
+		return False
+
+	hash_properties(h, obj, OBJECT_PATHS, animated)
+
+	if not data_paths:
+		return True
+
+	animated = hash_animation(h, obj.data)
+	if animated is None:
+		return False
+
+	hash_properties(h, obj.data, data_paths, animated)
+	return True
+
+
+def hash_visibility(h, obj) -> bool:
+	"""
+	Feed what the hide_render of an object depends on into a hashlib object. Returns False if it can't be compared.
+	"""
+	h.update(f'visibility {obj.name};'.encode())
+
+	animated = hash_animation(h, obj)
+	if animated is None:
+		return False
+
+	hash_properties(h, obj, ('hide_render',), animated)
+	return True
+
+
+def hash_material(h, material) -> bool:
+	"""
+	Feed the node values read_material_entry reads into a hashlib object. Returns False if they can't be compared.
+	"""
+	node_tree = material.node_tree
+	h.update(f'material {material.name};'.encode())
+
+	animated = hash_animation(h, node_tree)
+	if animated is None:
+		return False
+
+	nodes = node_tree.nodes
+	paths = [f'nodes["{name}"].{sockets}[{index}].default_value' for name, sockets, index in MATERIAL_SOCKETS if name in nodes]
+	hash_properties(h, node_tree, paths, animated)
+
+	return True
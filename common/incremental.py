@@ -0,0 +1,89 @@
+import json
+import hashlib
+
+from dataclasses import asdict, dataclass
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+from br.br_anm import *
+from common.anm_patch import EntryRange, index_entries
+
+# Incremental re-export: the fingerprints of every entry are saved as _fingerprints.json next to the .anm.
+# The next export only samples and encodes the entries whose fingerprint changed and copies the others
+# out of the previous .anm (see anm_patch.py). Fingerprints are made by SceneSampler.get_fingerprints.
+
+STATE_VERSION = 2  # Bump when the fingerprints change or stop covering what the sampler reads
+
+EntryKey = Tuple[str, int, str]  # Entry kind, armature (or light) index and bone / material / light name
+
+CAMERA_KEY: EntryKey = ('camera', -1, '')
+
+
+@dataclass
+class ExportState:
+	context: str  # Key of everything all entries depend on (settings, frames, layout)
+	anm_hash: str  # Digest of the .anm the entries were written to
+	keys: List[EntryKey]  # Entries in .anm order
+	fingerprints: List[Optional[str]]  # None for entries that are always made again
+
+	def to_json(self) -> Dict:
+		return {'version': STATE_VERSION, **asdict(self)}
+
+
+def get_anm_hash(data: bytes) -> str:
+	return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def make_export_state(context: str, anm_data: bytes, fingerprints: Dict[EntryKey, Optional[str]]) -> ExportState:
+	return ExportState(context, get_anm_hash(anm_data), list(fingerprints), list(fingerprints.values()))
+
+
+def load_export_state(path: str) -> Optional[ExportState]:
+	"""
+	Return the state saved by the last export, None if there is none or it is from another version.
+	"""
+	try:
+		with open(path) as f:
+			state = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if state.pop('version', None) != STATE_VERSION:
+		return None
+
+	state['keys'] = [tuple(key) for key in state['keys']]
+	return ExportState(**state)
+
+
+def get_previous_entries(state: Optional[ExportState], anm_data: Optional[bytes], context: str) -> Optional[List[EntryRange]]:
+	"""
+	Return the entry ranges of the previous .anm, None if its entries can't be reused: the settings, frames
+	or layout changed, or the .anm isn't the one the state was saved with.
+	"""
+	if state is None or anm_data is None or state.context != context or get_anm_hash(anm_data) != state.anm_hash:
+		return None
+
+	index = index_entries(anm_data)
+	if len(index) != len(state.keys):
+		return None
+
+	return index
+
+
+def get_reused_entries(state: ExportState, anm_data: bytes, index: List[EntryRange],
+						fingerprints: Dict[EntryKey, Optional[str]]) -> Dict[EntryKey, bytes]:
+	"""
+	Return the encoded entries of the previous .anm whose fingerprint didn't change.
+	"""
+	return {key: anm_data[entry.start:entry.end] for key, fingerprint, entry in zip(state.keys, state.fingerprints, index)
+			if fingerprint is not None and fingerprints.get(key) == fingerprint}
+
+
+def splice_entries(keys: Collection[EntryKey], reused: Dict[EntryKey, bytes], made: Iterator[BrStruct]) -> Iterator[BrStruct]:
+	"""
+	Put the reused entries and the made ones (in the order of the keys that weren't reused) together in key order.
+	"""
+	for key in keys:
+		if key in reused:
+			yield EncodedEntry(reused[key])
+		else:
+			yield next(made)
@@ -1,67 +1,78 @@
 import bpy
 import math
 import os
+import numpy as np
 
 from bpy.types import Collection
 from typing import List
 
+from common.profiler import frame_set
+from common.session_cache import SCENE_OBJECTS, cached
 
-def get_lights():
-    """Get all lights in the scene and return a list of dictionaries with the light data."""
-    
-    lights = list()
-    light_objects = list()
 
-    for light in bpy.data.objects:
-        if light.type == "LIGHT":
-            lights.append(light)
+def get_light_objects():
+    """Return all light objects, without sampling their animation."""
+    names = cached(('lights',), lambda: [obj.name for obj in bpy.data.objects if obj.type == "LIGHT"], lambda: [SCENE_OBJECTS])
+    return [bpy.data.objects[name] for name in names]
 
 
-    for i, light in enumerate(lights):
-        sce = bpy.context.scene
+def make_light_samples(lights, frame_count):
+    """Return the dictionaries get_lights returns for the light objects, with room for frame_count frames."""
 
+    light_objects = list()
+
+    for light in lights:
         light_dict = dict()
 
         light_dict['type'] = light.data.type
         light_dict['name'] = light.data.name
 
         if light.data.type == 'POINT':
-            light_frame_size = []
-            light_frame_2_size = []
-
-            for f in range(sce.frame_start, sce.frame_end + 1):
-                sce.frame_set(f)
-                light_frame_size.append(light.data.shadow_soft_size)
-                light_frame_2_size.append(light.data.cutoff_distance)
-
-            light_dict['size'] = light_frame_size
-            light_dict['size_2'] = light_frame_2_size
-            
-        light_frame_energy = []
-        light_color = []
-        light_frame_pos = []
-        light_frame_rot = []
-
-        for f in range(sce.frame_start, sce.frame_end + 1):
-            sce.frame_set(f)
-            light_frame_energy.append(light.data.energy)
-            light_frame_color = []
-            light_frame_color.append(round(light.data.color.r, 2))
-            light_frame_color.append(round(light.data.color.g, 2))
-            light_frame_color.append(round(light.data.color.b, 2))
-            light_color.append(light_frame_color)
-
-            matrix = get_light_matrix(light)
-            light_frame_pos.append(matrix['matrix_world'])
-            light_frame_rot.append(matrix['matrix_world_rotation'])
-
-        light_dict['color'] = light_color
-        light_dict['strength'] = light_frame_energy
-        light_dict['matrix_world'] = light_frame_pos
-        light_dict['matrix_world_rotation'] = light_frame_rot
-        
+            light_dict['size'] = np.empty(frame_count, dtype=np.float32)
+            light_dict['size_2'] = np.empty(frame_count, dtype=np.float32)
+
+        light_dict['color'] = np.empty((frame_count, 3), dtype=np.float32)
+        light_dict['strength'] = np.empty(frame_count, dtype=np.float32)
+        light_dict['matrix_world'] = np.empty((frame_count, 3), dtype=np.float32)
+        light_dict['matrix_world_rotation'] = np.empty((frame_count, 4), dtype=np.float32)
+
         light_objects.append(light_dict)
 
+    return light_objects
+
+
+def read_lights(lights, light_objects, i):
+    """Read the light objects at the current frame into row i of their samples."""
+
+    for light, light_dict in zip(lights, light_objects):
+        if light.data.type == 'POINT':
+            light_dict['size'][i] = light.data.shadow_soft_size
+            light_dict['size_2'][i] = light.data.cutoff_distance
+
+        light_dict['strength'][i] = light.data.energy
+        light_dict['color'][i] = [round(light.data.color.r, 2), round(light.data.color.g, 2), round(light.data.color.b, 2)]
+
+        matrix = light.matrix_world
+        light_dict['matrix_world'][i] = matrix.to_translation()
+        light_dict['matrix_world_rotation'][i] = matrix.to_quaternion()
+
+
+def get_lights(frames=None):
+    """Get all lights in the scene and return a list of dictionaries with the light data.
+    frames are the frames to sample, every frame of the scene if None.
+    Sampled values are float32 arrays with a row per frame, each frame is scrubbed once for all lights."""
+    
+    lights = get_light_objects()
+    sce = bpy.context.scene
+
+    if frames is None:
+        frames = range(sce.frame_start, sce.frame_end + 1)
+
+    light_objects = make_light_samples(lights, len(frames))
+
+    for i, f in enumerate(frames):
+        frame_set(sce, f)
+        read_lights(lights, light_objects, i)
 
     return light_objects
 
@@ -0,0 +1,131 @@
+import os
+import hashlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from common.profiler import get_profiler
+
+# Writes the files of one exported animation folder. Every file is written to a temp file next to it
+# by a small thread pool and only renamed into place once all of them were written, so a failed export
+# never leaves a half-written folder behind. Files whose content didn't change are not touched at all.
+
+Content = Union[bytes, bytearray, Callable[[object], None]]  # Data or a function writing it to a binary file
+
+
+def file_digest(path: str) -> Optional[bytes]:
+	try:
+		with open(path, 'rb') as f:
+			h = hashlib.blake2b()
+			for block in iter(lambda: f.read(1024 * 1024), b''):
+				h.update(block)
+			return h.digest()
+	except FileNotFoundError:
+		return None
+
+
+def is_unchanged(path: str, data: bytes) -> bool:
+	"""
+	Return True if the file at path already contains data.
+	"""
+	try:
+		if os.path.getsize(path) != len(data):
+			return False
+	except OSError:
+		return False
+
+	return file_digest(path) == hashlib.blake2b(data).digest()
+
+
+class OutputWriter:
+	folder: str
+	threads: int
+	files: Dict[str, Content]
+	temp_suffix: str
+
+	def __init__(self, folder: str, threads: int = 4):
+		self.folder = folder
+		self.threads = threads
+		self.files = dict()
+
+		# Other processes and exports running at the same time may write the same folder
+		self.temp_suffix = f'.{os.getpid()}.{threading.get_ident()}.{id(self):x}.tmp'
+
+	def add(self, filename: str, content: Content) -> None:
+		"""
+		Queue a file. content is the file data, or a function that writes it to an open binary file.
+		"""
+		self.files[filename] = content
+
+	def __write_temp(self, filename: str, content: Content) -> Optional[str]:
+		"""
+		Write content to a temp file and return its path, or None if the file on disk is already the same.
+		"""
+		path = os.path.join(self.folder, filename)
+
+		if isinstance(content, (bytes, bytearray)) and is_unchanged(path, content):
+			return None
+
+		temp_path = path + self.temp_suffix
+		with open(temp_path, 'wb') as f:
+			if callable(content):
+				content(f)
+			else:
+				f.write(content)
+
+		if callable(content) and file_digest(temp_path) == file_digest(path):
+			os.remove(temp_path)
+			return None
+
+		return temp_path
+
+	def write(self) -> Tuple[List[str], List[str]]:
+		"""
+		Write all queued files and return the names of the written and the skipped (unchanged) ones.
+		If any file fails, the temp files are removed and nothing is replaced.
+		"""
+		created_folder = not os.path.exists(self.folder)
+		if created_folder:
+			os.makedirs(self.folder)
+
+		filenames = list(self.files)
+
+		with ThreadPoolExecutor(max_workers=max(1, min(self.threads, len(filenames)))) as pool:
+			futures = [pool.submit(self.__write_temp, filename, self.files[filename]) for filename in filenames]
+
+		temp_paths = list()
+		errors = list()
+		for future in futures:
+			try:
+				temp_paths.append(future.result())
+			except Exception as e:
+				temp_paths.append(None)
+				errors.append(e)
+
+		if errors:
+			for filename in filenames:
+				temp_path = os.path.join(self.folder, filename) + self.temp_suffix
+				if os.path.exists(temp_path):
+					os.remove(temp_path)
+
+			if created_folder and not os.listdir(self.folder):
+				os.rmdir(self.folder)
+
+			raise errors[0]
+
+		written = list()
+		skipped = list()
+		for filename, temp_path in zip(filenames, temp_paths):
+			if temp_path is None:
+				skipped.append(filename)
+			else:
+				os.replace(temp_path, os.path.join(self.folder, filename))
+				written.append(filename)
+
+		profiler = get_profiler()
+		profiler.count('files written', len(written))
+		profiler.count('files skipped', len(skipped))
+
+		self.files.clear()
+		return written, skipped
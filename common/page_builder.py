@@ -0,0 +1,172 @@
+import json
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from common.snapshot import ArmatureSnapshot
+
+# Builds the _page.json of an exported animation. Chunk maps are deduplicated through a
+# (name, type, path) index and the page is written to the file piece by piece.
+
+LIGHT_CHUNK_TYPES = {
+	"SUN": "nuccChunkLightDirc",
+	"POINT": "nuccChunkLightPoint",
+	"AREA": "nuccChunkAmbient",
+}
+
+FILE_EXTENSIONS = {
+	"nuccChunkAnm": ".anm",
+	"nuccChunkCamera": ".camera",
+	"nuccChunkLightPoint": ".lightpoint",
+	"nuccChunkLightDirc": ".lightdirc",
+	"nuccChunkAmbient": ".ambient",
+}
+
+CLONE_SUFFIX = " [C]_extra_clump"
+
+
+def make_file_chunk(chunk: Dict) -> Dict:
+	return {
+		"File Name": chunk["Name"] + FILE_EXTENSIONS[chunk["Type"]],
+		"Version": 121,
+		"Version Attribute": 0,
+		"Chunk": chunk,
+	}
+
+
+@dataclass
+class PageSkeleton:
+	"""
+	The parts of the page json that don't depend on the action: camera, light and clump chunks.
+	"""
+	chunk_maps: List[Dict] = field(default_factory=list)  # Null, camera and light chunk maps
+	clump_chunk_maps: List[Dict] = field(default_factory=list)
+	chunk_references: List[Dict] = field(default_factory=list)
+	chunks: List[Dict] = field(default_factory=list)
+
+	index: Dict[Tuple[str, str, str], Dict] = field(default_factory=dict)  # (name, type, path) -> chunk map
+
+	def chunk(self, name: str, chunk_type: str, path: str, maps: Optional[List[Dict]] = None) -> Dict:
+		"""
+		Return the chunk map for (name, type, path), reusing an existing one. A new chunk map is added to maps,
+		or only used by the reference if maps is None.
+		"""
+		key = (name, chunk_type, path)
+		chunk = self.index.get(key)
+
+		if chunk is None:
+			chunk = {"Name": name, "Type": chunk_type, "Path": path}
+
+			if maps is not None:
+				self.index[key] = chunk
+				maps.append(chunk)
+
+		return chunk
+
+	def reference(self, name: str, chunk: Dict) -> None:
+		self.chunk_references.append({"Name": name, "Chunk": chunk})
+
+
+def make_page_skeleton(armatures: List[ArmatureSnapshot], clump_names: List[str], camera: Optional[str],
+					lights: List[Tuple[str, str]], chunk_path: str) -> PageSkeleton:
+	"""
+	Make the page skeleton. clump_names are the armature data names, used by the clump references of clones.
+	lights are (chunk name, light type) pairs.
+	"""
+	skeleton = PageSkeleton()
+	skeleton.chunk("", "nuccChunkNull", "", skeleton.chunk_maps)
+
+	# Create camera chunks
+	if camera is not None:
+		skeleton.chunks.append(make_file_chunk(skeleton.chunk(camera, "nuccChunkCamera", chunk_path, skeleton.chunk_maps)))
+
+	# Create light chunks
+	for light_name, light_type in lights:
+		skeleton.chunks.append(make_file_chunk(skeleton.chunk(light_name, LIGHT_CHUNK_TYPES[light_type], chunk_path, skeleton.chunk_maps)))
+
+	armatures_by_name = {armature.name: armature for armature in armatures}
+
+	for armature, clump_name in zip(armatures, clump_names):
+		path = armature.chunk_path
+		maps = skeleton.clump_chunk_maps
+
+		if "extra_clump" not in armature.name:
+			# Add clump chunk and reference dictionary
+			clump_chunk = skeleton.chunk(armature.name, "nuccChunkClump", path, maps)
+			skeleton.reference(armature.models[0] if armature.models else armature.bones[0], clump_chunk)
+
+			# Add coord, material, model chunks and references dictionaries
+			for bone_name in armature.bones:
+				skeleton.reference(bone_name, skeleton.chunk(bone_name, "nuccChunkCoord", path, maps))
+
+			for mat_name in armature.materials:
+				skeleton.reference(mat_name, skeleton.chunk(mat_name, "nuccChunkMaterial", path, maps))
+
+			for model_name in armature.models:
+				skeleton.reference(model_name, skeleton.chunk(model_name, "nuccChunkModel", path, maps))
+		else:
+			# Clones reference the chunks of their source armature
+			source_name = armature.name[:armature.name.find(CLONE_SUFFIX)]
+			source = armatures_by_name.get(source_name)
+
+			if source is None:
+				raise Exception(f'Source armature "{source_name}" of clone "{armature.name}" is not selected')
+
+			skeleton.reference(clump_name, skeleton.chunk(source_name, "nuccChunkClump", path))
+
+			for bone_name, source_bone in zip(armature.bones, source.bones):
+				skeleton.reference(bone_name, skeleton.chunk(source_bone, "nuccChunkCoord", path))
+
+			for mat_name, source_mat in zip(armature.materials, source.materials):
+				skeleton.reference(mat_name, skeleton.chunk(source_mat, "nuccChunkMaterial", path))
+
+			for model_name, source_model in zip(armature.models, source.models):
+				skeleton.reference(model_name, skeleton.chunk(source_model, "nuccChunkModel", path))
+
+	return skeleton
+
+
+def write_list(file: TextIO, name: str, items, compact: bool, last: bool = False) -> None:
+	if compact:
+		file.write(f'"{name}":[')
+		for i, item in enumerate(items):
+			file.write((',' if i else '') + json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+		file.write(']' if last else '],')
+		return
+
+	file.write(f'    "{name}": [')
+	empty = True
+	for item in items:
+		text = json.dumps(item, ensure_ascii=False, indent=4).replace('\n', '\n        ')
+		file.write(('\n        ' if empty else ',\n        ') + text)
+		empty = False
+	file.write((']' if empty else '\n    ]') + ('\n' if last else ',\n'))
+
+
+def write_page(file: TextIO, skeleton: PageSkeleton, action_name: str, anm_chunk_path: Optional[str], compact: bool = False) -> None:
+	"""
+	Write the page json of an action. anm_chunk_path is None when there are no animated armatures.
+	compact writes the json without indentation.
+	"""
+	chunk_maps = list(skeleton.chunk_maps)
+	chunks = list(skeleton.chunks)
+
+	# Create ANM chunk
+	if anm_chunk_path is not None:
+		anm_chunk = {"Name": action_name, "Type": "nuccChunkAnm", "Path": anm_chunk_path}
+
+		if (action_name, "nuccChunkAnm", anm_chunk_path) not in skeleton.index:
+			chunk_maps.append(anm_chunk)
+		chunks.append(make_file_chunk(anm_chunk))
+
+	chunk_maps.extend(skeleton.clump_chunk_maps)
+
+	for name, chunk_type in [("Page0", "nuccChunkPage"), ("index", "nuccChunkIndex")]:
+		if (name, chunk_type, "") not in skeleton.index:
+			chunk_maps.append({"Name": name, "Type": chunk_type, "Path": ""})
+
+	file.write('{' if compact else '{\n')
+	write_list(file, "Chunk Maps", chunk_maps, compact)
+	write_list(file, "Chunk References", skeleton.chunk_references, compact)
+	write_list(file, "Chunks", chunks, compact, last=True)
+	file.write('}')
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import subprocess
+import numpy as np
+
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Generator, Iterator, List, Tuple
+
+from common.snapshot import SceneSnapshot, load_snapshot
+from common.window_encoder import fill_visibility, keep_rotations_compatible
+
+# Samples the frame windows of a scene in several background processes at once. Every worker opens the
+# same .blend, samples its windows (see sample_worker.py) and saves each of them as a snapshot file, which
+# are loaded back in frame order. Nothing in here needs bpy, the workers are started from a command
+# the caller makes, so the scheduling can be run with a stand-in worker that doesn't need Blender.
+
+POLL_INTERVAL = 0.01  # Seconds waited between two checks of the running workers
+
+
+@dataclass
+class WorkerTask:
+	index: int
+	windows: List[Tuple[int, int]]  # [start, end) frame windows, in frame order
+	output: str  # Folder the window snapshots are saved to
+
+	armatures: List[str]  # Names of the armature objects to sample
+	export_materials: bool
+	sampling: Dict  # SamplingSettings fields
+	window_size: int
+
+	@property
+	def path(self) -> str:
+		return os.path.join(self.output, f'task_{self.index}.json')
+
+	def window_path(self, window: Tuple[int, int]) -> str:
+		return os.path.join(self.output, f'window_{window[0]}_{window[1]}.npz')
+
+
+def save_task(task: WorkerTask) -> None:
+	with open(task.path, 'w') as f:
+		json.dump(asdict(task), f)
+
+
+def load_task(path: str) -> WorkerTask:
+	with open(path) as f:
+		task = WorkerTask(**json.load(f))
+
+	task.windows = [tuple(window) for window in task.windows]
+	return task
+
+
+def split_frames(start: int, end: int, count: int) -> List[Tuple[int, int]]:
+	"""
+	Split the [start, end) frames into count windows of (almost) the same size.
+	"""
+	bounds = np.linspace(start, end, max(1, min(count, end - start)) + 1).round().astype(int).tolist()
+	return list(zip(bounds[:-1], bounds[1:]))
+
+
+def make_tasks(windows: List[Tuple[int, int]], workers: int, output: str, **task_fields) -> List[WorkerTask]:
+	"""
+	Give each worker a run of consecutive windows, so every window is sampled by one process only.
+	"""
+	groups = [group for group in np.array_split(np.arange(len(windows)), min(workers, len(windows))) if len(group)]
+
+	return [WorkerTask(index, [windows[i] for i in group.tolist()], output, **task_fields) for index, group in enumerate(groups)]
+
+
+class WorkerPool:
+	"""
+	Runs one worker process per task. make_command returns the command line of a task's worker,
+	e.g. a background Blender running sample_worker.py.
+	"""
+	tasks: List[WorkerTask]
+	make_command: Callable[[WorkerTask], List[str]]
+	processes: List[subprocess.Popen]
+
+	def __init__(self, tasks: List[WorkerTask], make_command: Callable[[WorkerTask], List[str]]):
+		self.tasks = tasks
+		self.make_command = make_command
+		self.processes = list()
+
+	@property
+	def window_count(self) -> int:
+		return sum(len(task.windows) for task in self.tasks)
+
+	def log_path(self, task: WorkerTask) -> str:
+		return os.path.join(task.output, f'task_{task.index}.log')
+
+	def start(self) -> None:
+		for task in self.tasks:
+			save_task(task)
+
+			with open(self.log_path(task), 'wb') as log:
+				self.processes.append(subprocess.Popen(self.make_command(task), stdout=log, stderr=subprocess.STDOUT))
+
+	def windows_done(self) -> int:
+		return sum(os.path.exists(task.window_path(window)) for task in self.tasks for window in task.windows)
+
+	def check(self) -> bool:
+		"""
+		Return True once every worker is done. Raises if one of them failed.
+		"""
+		done = True
+
+		for task, process in zip(self.tasks, self.processes):
+			code = process.poll()
+
+			if code is None:
+				done = False
+			elif code != 0 or not all(os.path.exists(task.window_path(window)) for window in task.windows):
+				with open(self.log_path(task), 'rb') as log:
+					output = log.read()[-2000:].decode(errors='replace')
+				raise Exception(f'Sampling worker {task.index} failed with exit code {code}:\n{output}')
+
+		return done
+
+	def stop(self) -> None:
+		for process in self.processes:
+			if process.poll() is None:
+				process.kill()
+			process.wait()
+
+	def run_steps(self) -> Generator[int, None, None]:
+		"""
+		Start the workers and yield the number of sampled windows until all of them are done.
+		Closing the generator kills the workers that are still running.
+		"""
+		self.start()
+
+		try:
+			while not self.check():
+				yield self.windows_done()
+				time.sleep(POLL_INTERVAL)
+		finally:
+			self.stop()
+
+	def iter_windows(self) -> Iterator[SceneSnapshot]:
+		"""
+		Load the sampled windows of all workers in frame order.
+		"""
+		windows = fill_visibility(load_snapshot(task.window_path(window)) for task in self.tasks for window in task.windows)
+
+		# Every bone is sampled from the pose then, each worker only knows the quaternions of its own windows
+		if self.tasks and self.tasks[0].sampling.get('pose'):
+			windows = keep_rotations_compatible(windows)
+
+		return windows
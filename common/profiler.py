@@ -0,0 +1,210 @@
+import json
+import threading
+
+from time import perf_counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Generator, Optional, Tuple, TypeVar
+
+# Opt-in export profiler. Stages nest into a tree of wall times / call counts, stage tags
+# (entry kind, armature) are summed into flat breakdown tables, and hot operations are counted.
+# Code being profiled calls get_profiler(), which returns a no-op profiler unless one was activated.
+
+_counted_calls: Dict[Tuple, list] = dict()  # Wrapped (owner, attribute, name): original and number of active count_calls
+_counted_lock = threading.Lock()
+
+
+class ProfileNode:
+	name: str
+	time: float
+	calls: int
+	children: Dict[str, 'ProfileNode']
+
+	def __init__(self, name: str):
+		self.name = name
+		self.time = 0.0
+		self.calls = 0
+		self.children = dict()
+
+	def child(self, name: str) -> 'ProfileNode':
+		node = self.children.get(name)
+
+		if node is None:
+			node = self.children[name] = ProfileNode(name)
+
+		return node
+
+	def to_dict(self) -> dict:
+		d = {'time': round(self.time, 6), 'calls': self.calls}
+
+		if self.children:
+			d['stages'] = {name: child.to_dict() for name, child in self.children.items()}
+
+		return d
+
+
+class Profiler:
+	def __init__(self, name: str = 'export'):
+		self.root = ProfileNode(name)
+		self.stack = [self.root]
+		self.counters: Dict[str, int] = dict()
+		self.breakdown: Dict[str, Dict[str, Dict[str, dict]]] = dict()
+		self.meta: Dict[str, str] = dict()
+		self.paused = 0.0  # Seconds spent in pause(), left out of every stage that was open
+
+	@contextmanager
+	def stage(self, name: str, **tags):
+		"""
+		Time a stage nested in the current one. Tags like kind='bone' or armature='1sik00'
+		also add the time to the breakdown tables.
+		"""
+		node = self.stack[-1].child(name)
+		self.stack.append(node)
+		t0 = perf_counter()
+		paused = self.paused
+
+		try:
+			yield node
+		finally:
+			elapsed = perf_counter() - t0 - (self.paused - paused)
+			self.stack.pop()
+
+			node.time += elapsed
+			node.calls += 1
+
+			for tag, value in tags.items():
+				stages = self.breakdown.setdefault(tag, dict()).setdefault(str(value), dict())
+				stage = stages.setdefault(name, {'time': 0.0, 'calls': 0})
+				stage['time'] += elapsed
+				stage['calls'] += 1
+
+	@contextmanager
+	def pause(self):
+		"""
+		Leave the time spent in the context out of the open stages, e.g. while an export step is suspended.
+		"""
+		t0 = perf_counter()
+
+		try:
+			yield
+		finally:
+			self.paused += perf_counter() - t0
+
+	def count(self, name: str, n: int = 1) -> None:
+		self.counters[name] = self.counters.get(name, 0) + n
+
+	@contextmanager
+	def count_calls(self, owner, attribute: str, name: str):
+		"""
+		Count calls of owner.attribute (e.g. a BinaryReader method) while the context is active. Exports running
+		at the same time share one wrapper, which counts for the profiler of the calling export.
+		"""
+		with _counted_lock:
+			key = (owner, attribute, name)
+			if key not in _counted_calls:
+				original = getattr(owner, attribute)
+
+				def counted(*args, **kwargs):
+					get_profiler().count(name)
+					return original(*args, **kwargs)
+
+				setattr(owner, attribute, counted)
+				_counted_calls[key] = [original, 0]
+
+			_counted_calls[key][1] += 1
+
+		try:
+			yield
+		finally:
+			with _counted_lock:
+				_counted_calls[key][1] -= 1
+				if not _counted_calls[key][1]:
+					setattr(owner, attribute, _counted_calls.pop(key)[0])
+
+	def report(self) -> dict:
+		breakdown = dict()
+		for tag, values in self.breakdown.items():
+			breakdown[tag] = {value: {name: {'time': round(s['time'], 6), 'calls': s['calls']} for name, s in stages.items()}
+				for value, stages in values.items()}
+
+		return {
+			**self.meta,
+			'total': round(sum(child.time for child in self.root.children.values()), 6),
+			'stages': {name: child.to_dict() for name, child in self.root.children.items()},
+			'breakdown': breakdown,
+			'counters': dict(sorted(self.counters.items())),
+		}
+
+	def write(self, path: str) -> None:
+		with open(path, 'w', encoding='utf-8') as file:
+			json.dump(self.report(), file, indent=4)
+
+
+class NullProfiler(Profiler):
+	"""
+	Profiler used when profiling is off. Does nothing.
+	"""
+	@contextmanager
+	def stage(self, name: str, **tags):
+		yield None
+
+	def count(self, name: str, n: int = 1) -> None:
+		pass
+
+	@contextmanager
+	def pause(self):
+		yield
+
+	@contextmanager
+	def count_calls(self, owner, attribute: str, name: str):
+		yield
+
+
+_null_profiler = NullProfiler()
+_active_profiler: ContextVar[Optional[Profiler]] = ContextVar('active_profiler', default=None)
+
+
+def get_profiler() -> Profiler:
+	return _active_profiler.get() or _null_profiler
+
+
+@contextmanager
+def profiling(profiler: Optional[Profiler]):
+	"""
+	Make profiler the one returned by get_profiler() inside the context. None keeps profiling off.
+	"""
+	token = _active_profiler.set(profiler)
+	try:
+		yield profiler
+	finally:
+		_active_profiler.reset(token)
+
+
+Step = TypeVar('Step')
+Result = TypeVar('Result')
+
+
+def pause_between_steps(steps: Generator[Step, None, Result]) -> Generator[Step, None, Result]:
+	"""
+	Yield the steps of a generator and return its result, with the time until the next step is asked for (e.g. the
+	UI running between two timer ticks of a modal operator) left out of the profile. Closing it closes steps.
+	"""
+	try:
+		while True:
+			try:
+				step = next(steps)
+			except StopIteration as stop:
+				return stop.value
+
+			with get_profiler().pause():
+				yield step
+	finally:
+		steps.close()
+
+
+def frame_set(scene, frame: int) -> None:
+	"""
+	scene.frame_set that is counted by the profiler.
+	"""
+	get_profiler().count('scene.frame_set')
+	scene.frame_set(frame)
@@ -0,0 +1,1085 @@
+import bpy
+import hashlib
+import numpy as np
+
+from collections import defaultdict
+from dataclasses import dataclass, astuple, field, replace
+from typing import Callable, Collection, Dict, Generator, List, Optional, Tuple
+from bpy.types import Armature, Bone
+
+from common.armature_props import AnmArmature
+from common.array_converter import make_quats_compatible, matrices_decompose, pose_to_local
+from common.bone_props import *
+from common.camera_props import get_camera, make_camera_samples, read_camera
+from common.encoder import LIGHT_ENTRY_TYPES, make_mapping_reference
+from common.fingerprint import *
+from common.incremental import CAMERA_KEY, EntryKey
+from common.light_props import get_light_objects, get_lights, make_light_samples, read_lights
+from common.profiler import get_profiler, frame_set
+from common.sampling_settings import FrameRange, SamplingSettings
+from common.session_cache import SCENE_OBJECTS, cached, get_pointer
+from common.snapshot import *
+
+# Reads everything the encoder needs out of the Blender scene into a SceneSnapshot.
+
+
+def run_steps(steps: Generator):
+	"""
+	Run a generator to the end and return its return value.
+	"""
+	while True:
+		try:
+			next(steps)
+		except StopIteration as stop:
+			return stop.value
+
+
+@dataclass
+class WorldTrack:
+	"""
+	Transform of an armature object, sampled once and shared by all of its bones without a parent.
+	"""
+	frames: np.ndarray  # (F,) sorted frames
+	loc: np.ndarray  # (F, 3)
+	rot: np.ndarray  # (F, 4) quaternion (w, x, y, z)
+
+	def get_loc(self, frames: np.ndarray) -> np.ndarray:
+		return self.loc[np.searchsorted(self.frames, frames)].reshape(-1, 3)
+
+	def get_rot(self, frames: np.ndarray) -> np.ndarray:
+		return self.rot[np.searchsorted(self.frames, frames)].reshape(-1, 4)
+
+
+def get_world_frames(bones: List[BoneSnapshot]) -> np.ndarray:
+	"""
+	Return the frames the world track of an armature is needed at: the location and rotation keys of its bones without a parent.
+	"""
+	return np.unique(np.concatenate([np.zeros(0, dtype=np.int32)] + [frames for bone in bones if bone.is_root for frames in (bone.loc_frames, bone.rot_frames)]))
+
+
+def set_world_track(bones: List[BoneSnapshot], world: WorldTrack) -> None:
+	for bone in bones:
+		if bone.is_root:
+			bone.world_loc = world.get_loc(bone.loc_frames)
+			bone.world_rot = world.get_rot(bone.rot_frames)
+
+
+def camera_exists() -> bool:
+	""" Return True if Camera exists AND has animation data, and False otherwise."""
+	cam = bpy.context.scene.camera
+
+	if cam and cam.animation_data:
+		return True
+	else:
+		return False
+
+
+def get_channels(fcurves, data_path: str) -> list:
+	"""
+	Return the F-curves of an action group that animate the given data path, in channel order.
+	"""
+	return [fcurve for fcurve in fcurves if fcurve.data_path.rpartition('.')[2] == data_path]
+
+
+def get_keyframe_frames(fcurve) -> np.ndarray:
+	return np.array([int(keyframe.co[0]) for keyframe in fcurve.keyframe_points], dtype=np.int32)
+
+
+def get_channels_key(fcurves, rest_matrix: np.ndarray, frame_range: FrameRange) -> Optional[bytes]:
+	"""
+	Return a digest of everything the sampled channels of a bone depend on: keyframes, handles, interpolation,
+	rest matrix and frames. Bones of different armatures with the same digest (e.g. _extra_clump copies with a
+	copy of the same action) are sampled only once. None if the channels have modifiers, which aren't compared.
+	"""
+	h = hashlib.blake2b(rest_matrix.tobytes())
+	h.update(repr(astuple(frame_range)).encode())
+
+	if not hash_fcurves(h, fcurves):
+		return None
+
+	return h.digest()
+
+
+def sample_channels(channels: list, components: int, frame_range: FrameRange):
+	"""
+	Evaluate channels at the frames frame_range selects from the keyframes of the first channel.
+	Returns the frames and an (N, components) array.
+	"""
+	if not channels:
+		return np.zeros(0, dtype=np.int32), np.zeros((0, components))
+
+	frames = frame_range.select(get_keyframe_frames(channels[0]))
+
+	return frames, evaluate_channels(channels, components, frames)
+
+
+def evaluate_channels(channels: list, components: int, frames: np.ndarray) -> np.ndarray:
+	values = np.array([[fcurve.evaluate(frame) for fcurve in channels] for frame in frames.tolist()])
+	get_profiler().count('fcurve.evaluate', len(frames) * len(channels))
+
+	return values.reshape(len(frames), components)
+
+
+def get_toggle_values(armature_name: str, frames: List[int]) -> list:
+	values = list()
+	for frame in frames:
+		frame_set(bpy.context.scene, frame)
+		if bpy.data.objects[armature_name].hide_render:
+			values.append(0)
+		else:
+			values.append(1)
+	values.append(values[-1])
+	return values
+
+
+def get_mesh_bone_objects() -> Dict[str, str]:
+	"""
+	Return the name of the first scene object of each mesh bone, scanning the scene once per change.
+	"""
+	scene = bpy.context.scene
+
+	def make():
+		objects = dict()
+		for obj in scene.objects:
+			objects.setdefault(obj.xfbin_nud_data.mesh_bone, obj.name)
+		return objects
+
+	return cached(('mesh bones', get_pointer(scene)), make, lambda: [SCENE_OBJECTS, scene, *scene.objects])
+
+
+def get_rest_matrices(armature: Armature) -> Dict[str, np.ndarray]:
+	"""
+	Return the rest matrices of get_edit_matrices as arrays, entering edit mode only if they changed since the last export.
+	"""
+	def make():
+		return {name: np.array(matrix) for name, matrix in get_edit_matrices(armature).items()}
+
+	return cached(('rest matrices', get_pointer(armature.data)), make, lambda: [armature.data])
+
+
+def get_toggle_values_bone(bone_name: str, frames: List[int]) -> list:
+	values = list()
+	obj_name = get_mesh_bone_objects().get(bone_name)
+	if obj_name is not None:
+		obj = bpy.data.objects[obj_name]
+		for frame in frames:
+			frame_set(bpy.context.scene, frame)
+			if obj.hide_render:
+				values.append(0)
+			else:
+				values.append(1)
+		values.append(values[-1])
+		return values
+	values.append(1)
+	return values
+
+
+def sample_bone(armature_obj: Armature, bone: Bone, rest_matrix: np.ndarray, frame_range: FrameRange, shared: Optional[Dict] = None) -> BoneSnapshot:
+	"""
+	Sample the action group channels and visibility of a bone. Channels already sampled for another bone
+	with the same keys are taken from shared (see get_channels_key), which is filled with the new ones.
+	The world transform of a bone without a parent is set afterwards from the track of its armature, see set_world_track.
+	"""
+	profiler = get_profiler()
+	action = armature_obj.animation_data.action
+	fcurves = action.groups.get(bone.name).channels
+
+	data_paths = list(dict.fromkeys(fcurve.data_path.rpartition('.')[2] for fcurve in fcurves))
+
+	rotation_path = 'rotation_euler' if 'rotation_euler' in data_paths else 'rotation_quaternion'
+
+	key = None
+	if shared is not None:
+		with profiler.stage('sharing', kind='bone'):
+			key = get_channels_key(fcurves, rest_matrix, frame_range)
+
+	if key is not None and key in shared:
+		profiler.count('shared bone samples')
+		loc_frames, loc_values, rot_frames, rot_values, scale_frames, scale_values = shared[key]
+	else:
+		with profiler.stage('fcurve evaluation', kind='bone', armature=armature_obj.name):
+			loc_frames, loc_values = sample_channels(get_channels(fcurves, 'location'), 3, frame_range)
+			rot_frames, rot_values = sample_channels(get_channels(fcurves, rotation_path), 3 if rotation_path == 'rotation_euler' else 4, frame_range)
+			scale_frames, scale_values = sample_channels(get_channels(fcurves, 'scale'), 3, frame_range)
+
+		if key is not None:
+			shared[key] = (loc_frames, loc_values, rot_frames, rot_values, scale_frames, scale_values)
+
+	is_root = bone.parent is None
+
+	with profiler.stage('frame scrubbing', kind='bone', armature=armature_obj.name):
+		frames = frame_range.frames
+		visibility = get_toggle_values(armature_obj.name, frames) if is_root else get_toggle_values_bone(bone.name, frames)
+		visibility_frames = (frames + [frame_range.end])[:len(visibility)]  # Last value is repeated at the end frame
+
+	bone_snapshot = BoneSnapshot(
+		bone.name,
+		is_root,
+		data_paths,
+		rest_matrix,
+		loc_frames, loc_values,
+		rot_frames, rot_values,
+		scale_frames, scale_values,
+		np.array(visibility, dtype=np.int8),
+		visibility_frames=np.array(visibility_frames, dtype=np.int32))
+
+	return bone_snapshot
+
+
+def get_bone_fingerprint(armature_obj: Armature, bone: Bone, rest_matrix: np.ndarray, frame_range: FrameRange) -> Optional[str]:
+	"""
+	Return a digest of the channels and visibility of a bone, None if they can't be compared.
+	"""
+	key = get_channels_key(armature_obj.animation_data.action.groups.get(bone.name).channels, rest_matrix, frame_range)
+	if key is None:
+		return None
+
+	h = hashlib.blake2b(key)
+
+	# Bones without a parent are placed and hidden by the armature object itself
+	if bone.parent is None:
+		if not hash_object(h, armature_obj):
+			return None
+	else:
+		visibility_object = get_visibility_object(armature_obj, bone)
+		if visibility_object is not None and not hash_visibility(h, visibility_object):
+			return None
+
+	return h.hexdigest()
+
+
+POSE_DATA_PATHS = ['location', 'rotation_quaternion', 'scale']  # Channels of bones sampled from their pose
+
+
+class PoseReader:
+	"""
+	Reads the evaluated pose of an armature at the current frame, one foreach_get for all bones, and converts
+	the poses read so far to the location, rotation and scale channels of some of its bones.
+	Bones that don't inherit the rotation or scale of their parent are converted by Blender one by one.
+	"""
+	armature_obj: Armature
+	bones: np.ndarray  # Indices of the sampled bones in pose.bones
+	rest: np.ndarray  # (B, 4, 4) matrix_local of all bones
+	parents: np.ndarray  # (B,) parent index, -1 without a parent
+	converted: List[int]  # Positions in bones of the ones converted by Blender
+	poses: List[np.ndarray]  # (B, 4, 4) per read frame
+	converted_poses: List[List[np.ndarray]]
+
+	def __init__(self, armature_obj: Armature, bone_names: List[str]):
+		pose_bones = armature_obj.pose.bones
+		indices = {pose_bone.name: i for i, pose_bone in enumerate(pose_bones)}
+
+		self.armature_obj = armature_obj
+		self.bones = np.array([indices[name] for name in bone_names], dtype=np.int64)
+		self.parents = np.array([indices[pose_bone.parent.name] if pose_bone.parent else -1 for pose_bone in pose_bones], dtype=np.int64)
+
+		self.rest = np.empty((len(pose_bones), 4, 4), dtype=np.float32)
+		for i, pose_bone in enumerate(pose_bones):
+			self.rest[i] = np.array(pose_bone.bone.matrix_local)
+
+		self.converted = [i for i, index in enumerate(self.bones.tolist())
+						if not pose_bones[index].bone.use_inherit_rotation or pose_bones[index].bone.inherit_scale != 'FULL']
+		self.poses = list()
+		self.converted_poses = list()
+
+	def read(self) -> None:
+		pose_bones = self.armature_obj.pose.bones
+
+		pose = np.empty(len(pose_bones) * 16, dtype=np.float32)
+		pose_bones.foreach_get('matrix', pose)
+		self.poses.append(pose.reshape(-1, 4, 4).transpose(0, 2, 1))  # Blender's matrices are column major
+
+		if self.converted:
+			converted = list()
+			for i in self.converted:
+				pose_bone = pose_bones[int(self.bones[i])]
+				converted.append(np.array(self.armature_obj.convert_space(pose_bone=pose_bone, matrix=pose_bone.matrix, from_space='POSE', to_space='LOCAL')))
+			self.converted_poses.append(converted)
+
+	def get_channels(self, previous_rotations: Optional[np.ndarray] = None):
+		"""
+		Return the (F, N, 3) locations, (F, N, 4) quaternions and (F, N, 3) scales of the sampled bones at the read frames.
+		Quaternions are kept compatible from frame to frame, starting from the (N, 4) previous_rotations if given.
+		"""
+		local = pose_to_local(np.array(self.poses).reshape(-1, len(self.rest), 4, 4), self.rest, self.parents, self.bones)
+
+		if self.converted:
+			local[:, self.converted] = np.array(self.converted_poses)
+
+		locations, rotations, scales = matrices_decompose(local)
+
+		return locations, make_quats_compatible(rotations, previous_rotations), scales
+
+
+@dataclass
+class PoseSamples:
+	"""
+	Samples of the bones of an armature read by one scrub of the timeline.
+	"""
+	reader: PoseReader
+	frames: np.ndarray
+	visibility: Dict[str, list]  # Bone name -> values read at the visibility frames
+	visibility_frames: List[int]
+	world_loc: list  # Armature transform at frames, the world track of its bones without a parent
+	world_rot: list
+
+
+def make_pose_bones(poses: PoseSamples, bones: list, rest_matrices: Dict[str, np.ndarray]) -> List[BoneSnapshot]:
+	"""
+	Make the snapshots of bones from the samples of their armature, in the order the reader was made with.
+	"""
+	with get_profiler().stage('pose conversion', armature=poses.reader.armature_obj.name):
+		locations, rotations, scales = poses.reader.get_channels()
+
+	frames = poses.frames
+	bone_snapshots = list()
+
+	for i, bone in enumerate(bones):
+		is_root = bone.parent is None
+
+		visibility = poses.visibility.get(bone.name)
+		if visibility is None:
+			visibility, visibility_frames = [1], poses.visibility_frames[:1]  # Always visible, a single key
+		else:
+			visibility = visibility + visibility[-1:]  # Last value is repeated at the end frame
+			visibility_frames = poses.visibility_frames + [int(frames[-1])]
+
+		bone_snapshot = BoneSnapshot(
+			bone.name,
+			is_root,
+			POSE_DATA_PATHS,
+			rest_matrices[bone.name],
+			frames, locations[:, i],
+			frames, rotations[:, i],
+			frames, scales[:, i],
+			np.array(visibility, dtype=np.int8),
+			visibility_frames=np.array(visibility_frames[:len(visibility)], dtype=np.int32))
+
+		bone_snapshots.append(bone_snapshot)
+
+	set_world_track(bone_snapshots, WorldTrack(frames, np.array(poses.world_loc).reshape(-1, 3), np.array(poses.world_rot).reshape(-1, 4)))
+
+	return bone_snapshots
+
+
+@dataclass
+class MaterialEntry:
+	loc_x_1uv: float = 0
+	loc_y_1uv: float = 0
+	scale_x_1uv: float = 1
+	scale_y_1uv: float = 1
+	loc_x_2uv: float = 0
+	loc_y_2uv: float = 0
+	scale_x_2uv: float = 1
+	scale_y_2uv: float = 1
+	blend_v: float = 0
+	glare_v: float = 0.12
+	alpha_v: float = 205
+
+
+def get_material_fingerprint(material_name: str, frame_range: FrameRange) -> Optional[str]:
+	h = hashlib.blake2b(repr(astuple(frame_range)).encode())
+
+	if not hash_material(h, bpy.data.materials[material_name]):
+		return None
+
+	return h.hexdigest()
+
+
+def get_material_values(material_name: str, frames: List[int]) -> list:
+	values = list()
+	nodes = bpy.data.materials[material_name].node_tree.nodes
+
+	for frame in frames:
+		frame_set(bpy.context.scene, frame)
+		values.append(read_material_entry(nodes))
+
+	return values
+
+
+def read_material_entry(nodes) -> MaterialEntry:
+	"""
+	Read the material values at the current frame.
+	"""
+	entry = MaterialEntry()
+	if "Mapping" in nodes:
+		entry.loc_x_1uv = nodes["Mapping"].inputs[1].default_value[0]
+		entry.loc_y_1uv = nodes["Mapping"].inputs[1].default_value[1]
+		entry.scale_x_1uv = nodes["Mapping"].inputs[3].default_value[0]
+		entry.scale_y_1uv = nodes["Mapping"].inputs[3].default_value[1]
+	elif "UV_0_Mapping" in nodes:
+		entry.loc_x_1uv = nodes["UV_0_Mapping"].inputs[1].default_value[0]
+		entry.loc_y_1uv = nodes["UV_0_Mapping"].inputs[1].default_value[1]
+		entry.scale_x_1uv = nodes["UV_0_Mapping"].inputs[3].default_value[0]
+		entry.scale_y_1uv = nodes["UV_0_Mapping"].inputs[3].default_value[1]
+	if "UV_1_Mapping" in nodes:
+		entry.loc_x_2uv = nodes["UV_1_Mapping"].inputs[1].default_value[0]
+		entry.loc_y_2uv = nodes["UV_1_Mapping"].inputs[1].default_value[1]
+		entry.scale_x_2uv = nodes["UV_1_Mapping"].inputs[3].default_value[0]
+		entry.scale_y_2uv = nodes["UV_1_Mapping"].inputs[3].default_value[1]
+	if "BlendRate" in nodes:
+		entry.blend_v = nodes["BlendRate"].outputs[0].default_value
+	if "Glare" in nodes:
+		entry.glare_v = nodes["Glare"].outputs[0].default_value
+	if "Alpha" in nodes:
+		entry.alpha_v = nodes["Alpha"].outputs[0].default_value
+
+	return entry
+
+
+def sample_material(material_name: str, armature_name: str, frame_range: FrameRange) -> MaterialSnapshot:
+	frames = frame_range.frames
+
+	with get_profiler().stage('frame scrubbing', kind='material', armature=armature_name):
+		values = [astuple(frame) for frame in get_material_values(material_name, frames)]
+	return MaterialSnapshot(material_name, np.array(values, dtype=np.float64).reshape(-1, 11), np.array(frames, dtype=np.int32))
+
+
+def prepare_armature(anm_armature: AnmArmature) -> ArmatureSnapshot:
+	"""
+	Collect the data of an armature that doesn't depend on its action: names and hierarchy.
+	"""
+	armature_obj = anm_armature.armature
+
+	armature_snapshot = ArmatureSnapshot(
+		anm_armature.name,
+		armature_obj.name,
+		anm_armature.chunk_path,
+		anm_armature.action.name,
+		anm_armature.bones,
+		anm_armature.materials,
+		anm_armature.models)
+
+	for bone in armature_obj.data.bones:
+		if bone.parent:
+			armature_snapshot.parents.append((bone.parent.name, bone.name))
+
+		constraints = armature_obj.pose.bones[bone.name].constraints
+		if "Copy Transforms" in constraints:
+			constraint = constraints["Copy Transforms"]
+			armature_snapshot.copy_transforms.append((constraint.target.name, constraint.subtarget, bone.name))
+
+	return armature_snapshot
+
+
+def get_camera_fingerprint() -> Optional[str]:
+	h = hashlib.blake2b()
+
+	if not hash_object(h, bpy.context.scene.camera, ('name', 'lens', 'sensor_width')):
+		return None
+
+	return h.hexdigest()
+
+
+def get_lights_fingerprint() -> Optional[str]:
+	h = hashlib.blake2b()
+
+	for light in get_light_objects():
+		data_paths = ('name', 'type', 'color', 'energy') + (('shadow_soft_size', 'cutoff_distance') if light.data.type == 'POINT' else ())
+
+		if not hash_object(h, light, data_paths):
+			return None
+
+	return h.hexdigest()
+
+
+def sample_camera(frames: List[int], key_step: int = 1) -> CameraSnapshot:
+	with get_profiler().stage('frame scrubbing', kind='camera'):
+		camera = get_camera(frames)
+
+	return make_camera_snapshot(camera, key_step)
+
+
+def make_camera_snapshot(camera: dict, key_step: int = 1) -> CameraSnapshot:
+	return CameraSnapshot(
+		camera['name'],
+		camera['matrix_world'],
+		camera['matrix_world_rotation'],
+		camera['FOV'],
+		key_step)
+
+
+def sample_lights(frames: List[int], key_step: int = 1) -> List[LightSnapshot]:
+	with get_profiler().stage('frame scrubbing', kind='light'):
+		lights = get_lights(frames)
+
+	return make_light_snapshots(lights, key_step)
+
+
+def make_light_snapshots(lights: List[dict], key_step: int = 1) -> List[LightSnapshot]:
+	light_snapshots: List[LightSnapshot] = list()
+
+	for light in lights:
+		light_snapshots.append(LightSnapshot(
+			light['name'],
+			light['type'],
+			light['color'],
+			light['strength'],
+			light['matrix_world'],
+			light['matrix_world_rotation'],
+			light.get('size', np.zeros(0, dtype=np.float32)),
+			light.get('size_2', np.zeros(0, dtype=np.float32)),
+			key_step))
+
+	return light_snapshots
+
+
+class SceneSampler:
+	"""
+	Samples the scene into snapshots. Names, hierarchy, rest matrices and mapping references
+	are collected once, so the same sampler can be reused for every action of a batch export.
+	"""
+	anm_armatures: List[AnmArmature]
+	export_materials: bool
+	sampling: SamplingSettings
+	has_camera: bool
+	scene: SceneSnapshot  # Snapshot without any animation data
+	rest_matrices: List[Dict[str, np.ndarray]]
+
+	def __init__(self, anm_armatures: List[AnmArmature], export_materials: bool, sampling: Optional[SamplingSettings] = None):
+		scene = bpy.context.scene
+
+		self.anm_armatures = anm_armatures
+		self.export_materials = export_materials
+		self.sampling = sampling or SamplingSettings()
+
+		# Check the camera and light steps before anything is sampled
+		self.sampling.get_key_step('camera')
+		self.sampling.get_key_step('light')
+		self.has_camera = camera_exists()
+
+		self.scene = SceneSnapshot(scene.frame_start, scene.frame_end)
+		self.scene.armatures = [prepare_armature(anm_armature) for anm_armature in anm_armatures]
+		self.scene.mapping_reference = make_mapping_reference(self.scene.armatures)
+		self.scene.mapping_reference_types = make_mapping_reference(self.scene.armatures, types=True)
+
+		self.rest_matrices = list()
+		for anm_armature in anm_armatures:
+			with get_profiler().stage('rest matrices', armature=anm_armature.armature.name):
+				self.rest_matrices.append(get_rest_matrices(anm_armature.armature))
+
+	def get_frame_end(self) -> int:
+		return bpy.context.scene.frame_end if self.sampling.frame_end is None else self.sampling.frame_end
+
+	def get_anm_bones(self, index: int) -> list:
+		"""
+		Return the pose bones of an armature that get an entry: the ones its action animates, or every bone of the clump
+		when sampling poses.
+		"""
+		anm_armature = self.anm_armatures[index]
+
+		if self.sampling.pose:
+			pose_bones = anm_armature.armature.pose.bones
+			return [pose_bones[name] for name in self.scene.armatures[index].bones]
+
+		return anm_armature.anm_bones
+
+	def get_frame_range(self, *names: str) -> FrameRange:
+		"""
+		Return the frames to sample bones and materials at, using the step override of the first name that has one.
+		Without a frame range, bones are sampled at their keyframes and visibility / materials from frame 0.
+		"""
+		sampling = self.sampling
+		start = 0 if sampling.frame_start is None else sampling.frame_start
+		clip = sampling.frame_start is not None or sampling.frame_end is not None
+
+		return FrameRange(start, self.get_frame_end(), sampling.get_step(*names), clip)
+
+	def get_scene_frames(self) -> List[int]:
+		"""
+		Return the frames to sample the camera and lights at, every frame_step frames.
+		"""
+		start = bpy.context.scene.frame_start if self.sampling.frame_start is None else self.sampling.frame_start
+
+		return list(range(start, self.get_frame_end() + 1, self.sampling.frame_step))
+
+	def sample_armature_steps(self, index: int, shared: Optional[Dict] = None, skip: Collection[EntryKey] = (),
+							poses: Optional[PoseSamples] = None) -> Generator[None, None, ArmatureSnapshot]:
+		"""
+		Sample the bones and (optionally) materials of an animated armature with its current action.
+		Yields after each bone and material. Bone channels and materials in shared are reused instead of sampled again,
+		the ones in skip are left out. Bones are taken from poses when sampling poses.
+		"""
+		anm_armature = self.anm_armatures[index]
+		rest_matrices = self.rest_matrices[index]
+
+		armature_snapshot = replace(self.scene.armatures[index], action_name=anm_armature.action.name, anm_bones=list(), anm_materials=list())
+		names = (armature_snapshot.object_name, armature_snapshot.name)
+
+		if poses is not None:
+			armature_snapshot.anm_bones = make_pose_bones(poses, [bone for bone in self.get_anm_bones(index) if ('bone', index, bone.name) not in skip], rest_matrices)
+		else:
+			bone_range = self.get_frame_range(*names, 'bone')
+			for bone in anm_armature.anm_bones:
+				if ('bone', index, bone.name) in skip:
+					continue
+
+				armature_snapshot.anm_bones.append(sample_bone(anm_armature.armature, bone, rest_matrices[bone.name], bone_range, shared))
+				yield
+
+			# Bones without a parent are placed by the armature object itself, its transform is scrubbed once for all of them
+			world_frames = get_world_frames(armature_snapshot.anm_bones)
+			if len(world_frames):
+				with get_profiler().stage('frame scrubbing', kind='world', armature=anm_armature.armature.name):
+					world = WorldTrack(world_frames, *get_world_matrices(anm_armature.armature, world_frames.tolist()))
+				set_world_track(armature_snapshot.anm_bones, world)
+
+		if self.export_materials:
+			material_range = self.get_frame_range(*names, 'material')
+			for material_name in armature_snapshot.materials:
+				if ('material', index, material_name) in skip:
+					continue
+
+				key = ('material', material_name, astuple(material_range))
+
+				if shared is not None and key in shared:
+					get_profiler().count('shared material samples')
+					material = shared[key]
+				else:
+					material = sample_material(material_name, anm_armature.armature.name, material_range)
+					if shared is not None:
+						shared[key] = material
+
+				armature_snapshot.anm_materials.append(material)
+				yield
+
+		return armature_snapshot
+
+	def sample_armature(self, index: int) -> ArmatureSnapshot:
+		return run_steps(self.sample_armature_steps(index))
+
+	def get_step_count(self, skip: Collection[EntryKey] = ()) -> int:
+		"""
+		Return the number of steps sample_steps yields with the current actions.
+		"""
+		step_count = 0
+
+		if self.sampling.pose:
+			step_count += len(self.get_pose_frames(skip))
+
+		for index, (anm_armature, armature) in enumerate(zip(self.anm_armatures, self.scene.armatures)):
+			if not self.sampling.pose:
+				step_count += sum(('bone', index, bone.name) not in skip for bone in anm_armature.anm_bones)
+
+			if self.export_materials:
+				step_count += sum(('material', index, name) not in skip for name in armature.materials)
+
+		return step_count + int(self.has_camera and CAMERA_KEY not in skip) + 1
+
+	def get_light_keys(self) -> List[EntryKey]:
+		return [('light', index, light.data.name) for index, light in enumerate(get_light_objects()) if light.data.type in LIGHT_ENTRY_TYPES]
+
+	def get_entry_keys(self) -> List[EntryKey]:
+		"""
+		Return the keys of the entries made from the snapshot sample_steps returns with the current actions, in entry order.
+		"""
+		keys = list()
+
+		for index, armature in enumerate(self.scene.armatures):
+			keys.extend(('bone', index, bone.name) for bone in self.get_anm_bones(index))
+
+			if self.export_materials:
+				keys.extend(('material', index, name) for name in armature.materials)
+
+		if self.has_camera:
+			keys.append(CAMERA_KEY)
+
+		return keys + self.get_light_keys()
+
+	def get_fingerprints(self) -> Dict[EntryKey, Optional[str]]:
+		"""
+		Return a digest of everything each entry is sampled from with the current actions, in entry order.
+		None for entries that can't be compared (see common/fingerprint.py). The frames, settings and
+		layout all entries share aren't part of it.
+		"""
+		fingerprints: Dict[EntryKey, Optional[str]] = dict()
+
+		with get_profiler().stage('fingerprints'):
+			for index, (anm_armature, armature) in enumerate(zip(self.anm_armatures, self.scene.armatures)):
+				names = (armature.object_name, armature.name)
+
+				bone_range = self.get_frame_range(*names, 'bone')
+				for bone in self.get_anm_bones(index):
+					# Poses depend on constraint and IK targets anywhere in the scene
+					fingerprints[('bone', index, bone.name)] = None if self.sampling.pose else \
+						get_bone_fingerprint(anm_armature.armature, bone, self.rest_matrices[index][bone.name], bone_range)
+
+				if self.export_materials:
+					material_range = self.get_frame_range(*names, 'material')
+					for material_name in armature.materials:
+						fingerprints[('material', index, material_name)] = get_material_fingerprint(material_name, material_range)
+
+			if self.has_camera:
+				fingerprints[CAMERA_KEY] = get_camera_fingerprint()
+
+			# Lights are sampled together, so they are all made again if one of them changed
+			lights_fingerprint = get_lights_fingerprint()
+			for key in self.get_light_keys():
+				fingerprints[key] = lights_fingerprint
+
+		return fingerprints
+
+	def sample_steps(self, skip: Collection[EntryKey] = ()) -> Generator[None, None, SceneSnapshot]:
+		"""
+		Sample all animated armatures, the camera and lights of the scene.
+		Yields after each bone, material, the camera and the lights, so the sampling can be spread over time.
+		Bones and materials with the same animation as an earlier one (e.g. of _extra_clump copies) share its samples.
+		Entries in skip (see get_entry_keys) are left out of the snapshot, the lights only if all of them are.
+		"""
+		scene = bpy.context.scene
+		sampling = self.sampling
+
+		snapshot = replace(self.scene, frame_start=scene.frame_start, frame_end=self.get_frame_end(), armatures=list(),
+			frame_step=sampling.frame_step, frame_offset=0 if sampling.frame_start is None else sampling.frame_start)
+
+		shared = dict()
+
+		with get_profiler().stage('sampling'):
+			poses = [None] * len(self.anm_armatures)
+			if sampling.pose:
+				poses = yield from self.sample_pose_steps(skip)
+
+			for index in range(len(self.anm_armatures)):
+				armature_snapshot = yield from self.sample_armature_steps(index, shared, skip, poses[index])
+				snapshot.armatures.append(armature_snapshot)
+
+			scene_frames = self.get_scene_frames()
+
+			if self.has_camera and CAMERA_KEY not in skip:
+				snapshot.camera = sample_camera(scene_frames, sampling.get_key_step('camera'))
+				yield
+
+			light_keys = self.get_light_keys()
+			if not (skip and light_keys and all(key in skip for key in light_keys)):
+				snapshot.lights = sample_lights(scene_frames, sampling.get_key_step('light'))
+			yield
+
+		return snapshot
+
+	def sample(self) -> SceneSnapshot:
+		"""
+		Sample all animated armatures, the camera and lights of the scene.
+		"""
+		return run_steps(self.sample_steps())
+
+	def get_pose_frames(self, skip: Collection[EntryKey] = ()) -> List[int]:
+		"""
+		Return the frames sample_pose_steps scrubs: the pose frames of every armature with a bone that isn't skipped.
+		"""
+		frames = set()
+
+		for index, armature in enumerate(self.scene.armatures):
+			if all(('bone', index, bone.name) in skip for bone in self.get_anm_bones(index)):
+				continue
+
+			frames.update(self.get_frame_range(armature.object_name, armature.name, 'bone').sample_frames.tolist())
+
+		return sorted(frames)
+
+	def sample_pose_steps(self, skip: Collection[EntryKey] = ()) -> Generator[None, None, List[Optional[PoseSamples]]]:
+		"""
+		Scrub the timeline once and read the evaluated pose of every armature, the visibility of its bones
+		and the armature transform at each frame. Yields after each frame.
+		"""
+		reads: Dict[int, List[Callable[[], None]]] = defaultdict(list)
+		poses: List[Optional[PoseSamples]] = list()
+
+		for index, anm_armature in enumerate(self.anm_armatures):
+			armature_obj = anm_armature.armature
+			armature = self.scene.armatures[index]
+			bones = [bone for bone in self.get_anm_bones(index) if ('bone', index, bone.name) not in skip]
+
+			if not bones:
+				poses.append(None)
+				continue
+
+			frame_range = self.get_frame_range(armature.object_name, armature.name, 'bone')
+			samples = PoseSamples(PoseReader(armature_obj, [bone.name for bone in bones]), frame_range.sample_frames,
+								dict(), frame_range.frames, list(), list())
+			poses.append(samples)
+
+			for frame in samples.frames.tolist():
+				reads[frame].append(samples.reader.read)
+				reads[frame].append(lambda obj=armature_obj, samples=samples: samples.world_loc.append(obj.matrix_world.to_translation()))
+				reads[frame].append(lambda obj=armature_obj, samples=samples: samples.world_rot.append(obj.matrix_world.to_quaternion()))
+
+			for bone in bones:
+				obj = get_visibility_object(armature_obj, bone)
+				if obj is None:
+					continue
+
+				values = samples.visibility[bone.name] = list()
+				for frame in samples.visibility_frames:
+					reads[frame].append(lambda obj=obj, values=values: values.append(0 if obj.hide_render else 1))
+
+		with get_profiler().stage('frame scrubbing', kind='pose'):
+			for frame in sorted(reads):
+				frame_set(bpy.context.scene, frame)
+				for read in reads[frame]:
+					read()
+				yield
+
+		return poses
+
+
+def sample_scene(anm_armatures: List[AnmArmature], export_materials: bool, sampling: Optional[SamplingSettings] = None) -> SceneSnapshot:
+	"""
+	Sample all animated armatures, the camera and lights of the scene.
+	"""
+	return SceneSampler(anm_armatures, export_materials, sampling).sample()
+
+
+def get_visibility_object(armature_obj, bone: Bone):
+	"""
+	Return the object whose hide_render is the visibility of a bone, None if it is always visible.
+	"""
+	if bone.parent is None:
+		return bpy.data.objects[armature_obj.name]
+
+	obj_name = get_mesh_bone_objects().get(bone.name)
+
+	return bpy.data.objects[obj_name] if obj_name is not None else None
+
+
+@dataclass
+class BoneWindowPlan:
+	"""
+	Everything needed to sample a bone in windows, collected once per action.
+	"""
+	bone: Bone
+	data_paths: List[str]
+	rest_matrix: np.ndarray
+	channels: Dict[str, list]  # 'location', 'rotation', 'scale' -> F-curves
+	frames: Dict[str, np.ndarray]  # Frames each of them is sampled at
+	components: Dict[str, int]
+
+	visibility_object: Optional[object]
+	visibility_frames: np.ndarray  # Scrubbed frames, then the end frame which repeats the last value
+
+	share_key: Optional[bytes] = None  # Bones with the same key are evaluated once per window
+
+
+class WindowSampler:
+	"""
+	Samples the scene a window of frames at a time for WindowEncoder (common/window_encoder.py), so long
+	animations never have all of their samples in memory. Every frame of a window is scrubbed only once
+	for the visibility, materials and armature transforms of all bones, the camera and the lights.
+	"""
+	def __init__(self, sampler: SceneSampler, window_size: int):
+		scene = bpy.context.scene
+		sampling = sampler.sampling
+
+		self.sampler = sampler
+		self.window_size = window_size
+
+		self.snapshot = replace(sampler.scene, frame_start=scene.frame_start, frame_end=sampler.get_frame_end(), armatures=list(),
+			frame_step=sampling.frame_step, frame_offset=0 if sampling.frame_start is None else sampling.frame_start)
+
+		self.bones: List[List[BoneWindowPlan]] = list()
+		self.material_frames: List[np.ndarray] = list()
+
+		with get_profiler().stage('sampling'):
+			for index, anm_armature in enumerate(sampler.anm_armatures):
+				armature = sampler.scene.armatures[index]
+				names = (armature.object_name, armature.name)
+
+				bone_range = sampler.get_frame_range(*names, 'bone')
+				self.bones.append([self.plan_bone(anm_armature.armature, bone, sampler.rest_matrices[index][bone.name], bone_range, sampling.pose)
+								for bone in sampler.get_anm_bones(index)])
+				self.material_frames.append(np.array(sampler.get_frame_range(*names, 'material').frames, dtype=np.int32))
+
+		self.scene_frames = np.array(sampler.get_scene_frames(), dtype=np.int32)
+		self.last_visibility: Dict[Tuple[int, int], int] = dict()
+		self.last_rotations: Dict[int, np.ndarray] = dict()  # (N, 4) last quaternions of the pose sampled bones of each armature
+
+		self.windows = self.make_windows()
+
+	@staticmethod
+	def plan_bone(armature_obj, bone: Bone, rest_matrix: np.ndarray, frame_range: FrameRange, pose: bool = False) -> BoneWindowPlan:
+		visibility_object = get_visibility_object(armature_obj, bone)
+		visibility_frames = np.array(frame_range.frames + [frame_range.end], dtype=np.int32)
+		if visibility_object is None:
+			visibility_frames = visibility_frames[:1]  # Visible, a single key
+
+		# Bones sampled from their pose have no channels to evaluate, PoseReader reads them
+		if pose:
+			frames = frame_range.sample_frames
+			return BoneWindowPlan(bone, POSE_DATA_PATHS, rest_matrix, {'location': [], 'rotation': [], 'scale': []},
+								{'location': frames, 'rotation': frames, 'scale': frames}, {'location': 3, 'rotation': 4, 'scale': 3},
+								visibility_object, visibility_frames)
+
+		fcurves = armature_obj.animation_data.action.groups.get(bone.name).channels
+
+		data_paths = list(dict.fromkeys(fcurve.data_path.rpartition('.')[2] for fcurve in fcurves))
+		rotation_path = 'rotation_euler' if 'rotation_euler' in data_paths else 'rotation_quaternion'
+
+		channels = {
+			'location': get_channels(fcurves, 'location'),
+			'rotation': get_channels(fcurves, rotation_path),
+			'scale': get_channels(fcurves, 'scale'),
+		}
+		frames = {name: frame_range.select(get_keyframe_frames(c[0])) if c else np.zeros(0, dtype=np.int32) for name, c in channels.items()}
+		components = {'location': 3, 'rotation': 3 if rotation_path == 'rotation_euler' else 4, 'scale': 3}
+
+		return BoneWindowPlan(bone, data_paths, rest_matrix, channels, frames, components, visibility_object, visibility_frames,
+							get_channels_key(fcurves, rest_matrix, frame_range))
+
+	def make_windows(self) -> List[Tuple[int, int]]:
+		"""
+		Split the frames of every sampled key into [start, end) windows.
+		"""
+		frames = [self.scene_frames, *self.material_frames]
+		for plans in self.bones:
+			for plan in plans:
+				frames.extend(plan.frames.values())
+				frames.append(plan.visibility_frames)
+
+		frames = np.concatenate([np.asarray(f, dtype=np.int64) for f in frames] + [np.zeros(0, dtype=np.int64)])
+		if not len(frames):
+			return [(0, 1)]
+
+		first, last = int(frames.min()), int(frames.max())
+		return [(start, min(start + self.window_size, last + 1)) for start in range(first, last + 1, self.window_size)]
+
+	def sample_window(self, window: Tuple[int, int]) -> SceneSnapshot:
+		"""
+		Sample the keys and frames of a window into a snapshot holding only them.
+		"""
+		scene = bpy.context.scene
+		sampler = self.sampler
+		profiler = get_profiler()
+		start, end = window
+
+		def in_window(frames: np.ndarray) -> np.ndarray:
+			return frames[(frames >= start) & (frames < end)]
+
+		reads: Dict[int, List[Callable[[], None]]] = defaultdict(list)  # Values read after scrubbing to a frame
+		snapshot = replace(self.snapshot, armatures=list())
+		visibility: List[Tuple[Tuple[int, int], BoneSnapshot, BoneWindowPlan, list]] = list()
+		world: List[Tuple[List[BoneSnapshot], np.ndarray, list, list]] = list()
+		materials: List[Tuple[MaterialSnapshot, list]] = list()
+		poses: List[Tuple[int, PoseReader, List[BoneSnapshot]]] = list()
+		shared = dict()
+
+		for index, (anm_armature, plans) in enumerate(zip(sampler.anm_armatures, self.bones)):
+			armature_obj = anm_armature.armature
+			armature = replace(sampler.scene.armatures[index], action_name=anm_armature.action.name, anm_bones=list(), anm_materials=list())
+
+			with profiler.stage('fcurve evaluation', kind='bone', armature=armature_obj.name):
+				for plan in plans:
+					keys = shared.get(plan.share_key) if plan.share_key is not None else None
+
+					if keys is None:
+						keys = dict()
+						for name, channels in plan.channels.items():
+							frames = in_window(plan.frames[name])
+							keys[name] = (frames, evaluate_channels(channels, plan.components[name], frames) if channels else np.zeros((0, plan.components[name])))
+
+						if plan.share_key is not None:
+							shared[plan.share_key] = keys
+
+					is_root = plan.bone.parent is None
+					bone = BoneSnapshot(plan.bone.name, is_root, plan.data_paths, plan.rest_matrix,
+										*keys['location'], *keys['rotation'], *keys['scale'],
+										np.zeros(0, dtype=np.int8), visibility_frames=in_window(plan.visibility_frames))
+					armature.anm_bones.append(bone)
+
+					values = list()
+					obj = plan.visibility_object
+					for frame in in_window(plan.visibility_frames[:-1]).tolist():
+						reads[frame].append(lambda obj=obj, values=values: values.append(0 if obj.hide_render else 1))
+					visibility.append(((index, len(armature.anm_bones)), bone, plan, values))
+
+			# Bones without a parent are placed by the armature object itself, its transform is read once per frame for all of them
+			world_frames = get_world_frames(armature.anm_bones)
+			if len(world_frames):
+				world_loc, world_rot = list(), list()
+				for frame in world_frames.tolist():
+					reads[frame].append(lambda obj=armature_obj, loc=world_loc, rot=world_rot: (
+						loc.append(obj.matrix_world.to_translation()), rot.append(obj.matrix_world.to_quaternion())))
+				world.append((armature.anm_bones, world_frames, world_loc, world_rot))
+
+			if sampler.export_materials:
+				frames = in_window(self.material_frames[index])
+				for material_name in armature.materials:
+					key = ('material', material_name, frames.tobytes())
+					if key in shared:
+						armature.anm_materials.append(shared[key])
+						continue
+
+					nodes = bpy.data.materials[material_name].node_tree.nodes
+					material = MaterialSnapshot(material_name, None, frames)
+					armature.anm_materials.append(material)
+					shared[key] = material
+
+					values = list()
+					for frame in frames.tolist():
+						reads[frame].append(lambda nodes=nodes, values=values: values.append(astuple(read_material_entry(nodes))))
+					materials.append((material, values))
+
+			if sampler.sampling.pose and plans:
+				reader = PoseReader(armature_obj, [plan.bone.name for plan in plans])
+				for frame in in_window(plans[0].frames['location']).tolist():
+					reads[frame].append(reader.read)
+				poses.append((index, reader, armature.anm_bones))
+
+			snapshot.armatures.append(armature)
+
+		scene_frames = in_window(self.scene_frames).tolist()
+
+		camera = make_camera_samples(len(scene_frames)) if sampler.has_camera else None
+		light_objects = get_light_objects()
+		lights = make_light_samples(light_objects, len(scene_frames))
+
+		for i, frame in enumerate(scene_frames):
+			if camera:
+				reads[frame].append(lambda i=i: read_camera(camera, i))
+			if light_objects:
+				reads[frame].append(lambda i=i: read_lights(light_objects, lights, i))
+
+		with profiler.stage('frame scrubbing', kind='window'):
+			for frame in sorted(reads):
+				frame_set(scene, frame)
+				for read in reads[frame]:
+					read()
+
+		for key, bone, plan, values in visibility:
+			if plan.visibility_object is None:
+				values = [1] * len(bone.visibility_frames)
+			elif len(bone.visibility_frames) > len(values):
+				# Last value is repeated at the end frame. A worker sampling only some windows (see parallel_sampler.py)
+				# may not know it, fill_visibility puts it in once the windows are merged
+				values.append(values[-1] if values else self.last_visibility.get(key, UNKNOWN_VISIBILITY))
+
+			if values:
+				self.last_visibility[key] = values[-1]
+			bone.visibility = np.array(values, dtype=np.int8)
+
+		for bones, world_frames, world_loc, world_rot in world:
+			set_world_track(bones, WorldTrack(world_frames, np.array(world_loc).reshape(-1, 3), np.array(world_rot).reshape(-1, 4)))
+
+		for material, values in materials:
+			material.values = np.array(values, dtype=np.float64).reshape(-1, 11)
+
+		for index, reader, bones in poses:
+			if not reader.poses:
+				continue
+
+			# The first quaternions stay compatible with the last ones of the window before
+			with profiler.stage('pose conversion', armature=reader.armature_obj.name):
+				locations, rotations, scales = reader.get_channels(self.last_rotations.get(index))
+			self.last_rotations[index] = rotations[-1]
+
+			for i, bone in enumerate(bones):
+				bone.loc_values, bone.rot_values, bone.scale_values = locations[:, i], rotations[:, i], scales[:, i]
+
+		if sampler.has_camera:
+			snapshot.camera = make_camera_snapshot(camera, sampler.sampling.get_key_step('camera'))
+
+		snapshot.lights = make_light_snapshots(lights, sampler.sampling.get_key_step('light'))
+
+		return snapshot
+
+	def __iter__(self) -> Generator[SceneSnapshot, None, None]:
+		for window in self.windows:
+			yield self.sample_window(window)
@@ -0,0 +1,81 @@
+import numpy as np
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Which frames the sampler reads. Nothing in here needs bpy.
+
+
+@dataclass
+class SamplingSettings:
+	frame_start: Optional[int] = None  # First exported frame, the whole scene is exported if None
+	frame_end: Optional[int] = None  # Last exported frame, scene end if None
+	frame_step: int = 1  # Sample every Nth frame, written as the frame size of the anm header
+	step_overrides: Dict[str, int] = field(default_factory=dict)  # Step of keyed curves by entry kind ('bone', 'material', 'camera', 'light') or armature name
+	pose: bool = False  # Read every bone of the clumps from its evaluated pose every step frames, so constraints and IK are exported without baking
+
+	def get_step(self, *names: str) -> int:
+		"""
+		Return the step override of the first name that has one, or frame_step.
+		"""
+		for name in names:
+			if name in self.step_overrides:
+				return self.step_overrides[name]
+
+		return self.frame_step
+
+	def get_key_step(self, kind: str) -> int:
+		"""
+		Return how many samples of a camera / light are between two keys. Their unkeyed curves are
+		sampled every frame_step frames, so keyed curves can only use a multiple of it.
+		"""
+		step = self.get_step(kind)
+
+		if step % self.frame_step != 0:
+			raise Exception(f'Frame step of {kind} ({step}) must be a multiple of frame_step ({self.frame_step})')
+
+		return step // self.frame_step
+
+
+@dataclass
+class FrameRange:
+	"""
+	Frames to sample bones and materials at.
+	"""
+	start: int
+	end: int
+	step: int = 1
+	clip: bool = False  # Sample the keyframes inside (start, end) and the range ends instead of every keyframe
+
+	def select(self, keyframe_frames: np.ndarray) -> np.ndarray:
+		"""
+		Return the frames to sample channels at: their keyframes (clipped to the range), or every step-th frame and the last one.
+		"""
+		if self.step > 1:
+			return self.sample_frames
+
+		if self.clip:
+			# The channels are also evaluated at the range ends, so motion from keys outside the range isn't lost
+			inside = keyframe_frames[(keyframe_frames > self.start) & (keyframe_frames < self.end)]
+			return np.unique(np.concatenate(([self.start], inside, [self.end])).astype(np.int32))
+
+		return keyframe_frames
+
+	@property
+	def sample_frames(self) -> np.ndarray:
+		"""
+		Every step-th frame from start and the end frame.
+		"""
+		frames = np.arange(self.start, self.end + 1, self.step, dtype=np.int32)
+
+		if frames[-1] != self.end:
+			frames = np.append(frames, np.int32(self.end))
+
+		return frames
+
+	@property
+	def frames(self) -> List[int]:
+		"""
+		Every step-th frame from start, end excluded.
+		"""
+		return list(range(self.start, self.end, self.step))
@@ -0,0 +1,216 @@
+import bpy
+import sys
+import numpy as np
+
+from bpy.app.handlers import persistent
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, Iterable, Optional, Set, Tuple
+
+# Data derived from the scene (bone and material lists, rest matrices, mesh bones, lights) that is kept between
+# exports of one Blender session. Every value lists the datablocks it was made from and is dropped as soon as
+# depsgraph_update_post reports one of them as changed. Undo, redo and loading a file drop everything.
+
+SCENE_OBJECTS = 'scene objects'  # Dependency of values that change when objects are added, removed or re-linked
+
+
+def get_pointer(datablock) -> int:
+	return datablock.original.as_pointer()
+
+
+def get_size(value) -> int:
+	"""
+	Rough size of a cached value in bytes.
+	"""
+	if isinstance(value, np.ndarray):
+		return value.nbytes
+
+	if isinstance(value, dict):
+		return sys.getsizeof(value) + sum(get_size(k) + get_size(v) for k, v in value.items())
+
+	if isinstance(value, (list, tuple, set, frozenset)):
+		return sys.getsizeof(value) + sum(map(get_size, value))
+
+	return sys.getsizeof(value)
+
+
+class SessionCache:
+	max_size: int
+	size: int
+	values: 'OrderedDict[Tuple, Tuple[object, int]]'  # Key -> (value, size), least recently used first
+	dependents: Dict[object, Set[Tuple]]  # Datablock pointer or SCENE_OBJECTS -> keys of the values made from it
+	frozen: int
+
+	def __init__(self, max_size: int):
+		self.max_size = max_size
+		self.size = 0
+		self.values = OrderedDict()
+		self.dependents = dict()
+		self.frozen = 0
+
+	def get(self, key: Tuple, make: Callable[[], object], depends_on: Callable[[], Iterable] = tuple):
+		"""
+		Return the value of key, or make it. depends_on returns the datablocks (or SCENE_OBJECTS) the value is made from.
+		"""
+		if key in self.values:
+			self.values.move_to_end(key)
+			return self.values[key][0]
+
+		value = make()
+		size = get_size(value)
+
+		if size > self.max_size:
+			return value
+
+		self.values[key] = (value, size)
+		self.size += size
+
+		for dependency in depends_on():
+			if dependency != SCENE_OBJECTS:
+				dependency = get_pointer(dependency)
+			self.dependents.setdefault(dependency, set()).add(key)
+
+		while self.size > self.max_size:
+			self.remove(next(iter(self.values)))
+
+		return value
+
+	def remove(self, key: Tuple) -> None:
+		value, size = self.values.pop(key, (None, 0))
+		self.size -= size
+
+	def invalidate(self, dependencies: Iterable) -> None:
+		"""
+		Drop the values made from any of the dependencies.
+		"""
+		for dependency in dependencies:
+			for key in self.dependents.pop(dependency, ()):
+				self.remove(key)
+
+	def clear(self) -> None:
+		self.values.clear()
+		self.dependents.clear()
+		self.size = 0
+
+	@contextmanager
+	def freeze(self):
+		"""
+		Ignore the updates the export itself causes (frame changes, edit mode, assigned actions).
+		"""
+		self.frozen += 1
+		try:
+			yield self
+		finally:
+			bpy.context.view_layer.update()  # Run the pending updates while still frozen
+			self.frozen -= 1
+
+	@contextmanager
+	def thaw(self):
+		"""
+		Take the updates again while a frozen export waits for its next step, e.g. edits in the UI between two timer ticks.
+		"""
+		bpy.context.view_layer.update()  # Run the pending updates of the export while still frozen
+		self.frozen -= 1
+		try:
+			yield self
+		finally:
+			self.frozen += 1
+
+
+session_cache: Optional[SessionCache] = None
+
+
+def thaw_between_steps(cache: Optional[SessionCache], steps: Generator) -> Generator:
+	"""
+	Yield the steps of a generator and return its result, with the cache thawed until the next step is asked for,
+	so only the export's own updates are ignored. Closing it closes steps.
+	"""
+	try:
+		while True:
+			try:
+				step = next(steps)
+			except StopIteration as stop:
+				return stop.value
+
+			if cache is None or not cache.frozen:
+				yield step
+				continue
+
+			with cache.thaw():
+				yield step
+	finally:
+		steps.close()
+
+
+def cached(key: Tuple, make: Callable[[], object], depends_on: Callable[[], Iterable] = tuple):
+	"""
+	Return the value of key from the session cache, or make it if the cache is off.
+	"""
+	if session_cache is None:
+		return make()
+
+	return session_cache.get(key, make, depends_on)
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+	if session_cache is None or session_cache.frozen:
+		return
+
+	changed = set()
+	for update in depsgraph.updates:
+		# Nothing cached depends on object transforms, e.g. of animated objects while scrubbing the timeline
+		if update.is_updated_transform and not update.is_updated_geometry and not update.is_updated_shading:
+			continue
+
+		changed.add(get_pointer(update.id))
+		if isinstance(update.id, (bpy.types.Collection, bpy.types.Scene)):
+			changed.add(SCENE_OBJECTS)
+
+	session_cache.invalidate(changed)
+
+
+@persistent
+def on_reload(*args):
+	# Undo and loading a file replace every datablock, so their pointers mean nothing anymore
+	if session_cache is not None:
+		session_cache.clear()
+
+
+HANDLERS = [
+	(bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+	(bpy.app.handlers.undo_post, on_reload),
+	(bpy.app.handlers.redo_post, on_reload),
+	(bpy.app.handlers.load_pre, on_reload),
+]
+
+
+def set_session_cache_size(max_size: int) -> Optional[SessionCache]:
+	"""
+	Turn the session cache on with a size limit in bytes, or off if max_size is 0.
+	"""
+	global session_cache
+
+	if not max_size:
+		remove_handlers()
+		session_cache = None
+		return None
+
+	if session_cache is None:
+		session_cache = SessionCache(max_size)
+
+		for handlers, handler in HANDLERS:
+			if handler not in handlers:
+				handlers.append(handler)
+
+	session_cache.max_size = max_size
+	while session_cache.size > max_size:
+		session_cache.remove(next(iter(session_cache.values)))
+
+	return session_cache
+
+
+def remove_handlers() -> None:
+	for handlers, handler in HANDLERS:
+		if handler in handlers:
+			handlers.remove(handler)
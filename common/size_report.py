@@ -0,0 +1,194 @@
+import json
+
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from br.br_anm import *
+from common.encoder import clean_entry
+
+# Breaks the size of an .anm down by clump, entry kind, bone / material name, curve index and curve format,
+# with the bytes that collapsing constant curves (clean_entry) or quantizing rotations would save.
+
+GROUPS = ['clump', 'kind', 'name', 'curve_index', 'curve_format']
+
+SHORT4_SIZE = 8  # Bytes of a SHORT4 rotation per frame
+
+
+@dataclass
+class CurveSize:
+	clump: str  # Clump name, "" for camera and light entries
+	kind: str  # Entry format, e.g. "BONE"
+	name: str  # Bone, material, camera or light name
+	curve_index: int
+	curve_format: str
+
+	keys: int
+	size: int  # Bytes of the curve header and data
+
+	clean_keys: int  # Keys after collapsing the curve like clean_entry, the same if it isn't constant
+	constant_saving: int  # Bytes collapsing a constant curve would save
+	quantize_saving: int  # Bytes writing a keyed quaternion as SHORT4 for every frame would save
+
+	raw_keys: Optional[int] = None  # Keys and bytes without clean_entry and key reduction, if known
+	raw_size: Optional[int] = None
+
+
+@dataclass
+class SizeReport:
+	total: int  # File size
+	header: int  # Anm header, clumps and coord parents
+	entry_headers: int
+	curves: List[CurveSize] = field(default_factory=list)
+
+	def group(self, by: str) -> List[Dict]:
+		"""
+		Sum the curves by one of GROUPS, largest first.
+		"""
+		groups: Dict[str, Dict] = dict()
+		known_raw = all(curve.raw_size is not None for curve in self.curves)
+
+		for curve in self.curves:
+			key = getattr(curve, by)
+			row = groups.setdefault(key, {by: key, 'curves': 0, 'keys': 0, 'size': 0, 'clean_keys': 0,
+				'constant_saving': 0, 'quantize_saving': 0, **({'raw_keys': 0, 'raw_size': 0} if known_raw else {})})
+
+			row['curves'] += 1
+			for name in ('keys', 'size', 'clean_keys', 'constant_saving', 'quantize_saving') + (('raw_keys', 'raw_size') if known_raw else ()):
+				row[name] += getattr(curve, name)
+
+		return sorted(groups.values(), key=lambda row: row['size'], reverse=True)
+
+	def to_json(self) -> Dict:
+		return {
+			'total': self.total,
+			'header': self.header,
+			'entry_headers': self.entry_headers,
+			'groups': {by: self.group(by) for by in GROUPS},
+			'curves': [asdict(curve) for curve in self.curves],
+		}
+
+
+def padded(size: int) -> int:
+	return (size + 3) & ~3
+
+
+def get_curve_size(curve: Curve) -> int:
+	return CURVE_HEADER.size + padded(len(curve.to_bytes()))
+
+
+def copy_entry(entry: Entry) -> Entry:
+	return replace(entry, curve_headers=[replace(header) for header in entry.curve_headers],
+				curves=[replace(curve) for curve in entry.curves])
+
+
+def get_quantize_saving(curve: Curve, frame_count: int) -> int:
+	if curve.curve_format != AnmCurveFormat.INT1_FLOAT4:
+		return 0
+
+	return max(0, len(curve.to_bytes()) - padded(SHORT4_SIZE * frame_count))
+
+
+def get_entry_names(anm: Anm, entry: Entry, reference_names: Optional[List[str]], other_names: List[str]) -> Tuple[str, str]:
+	"""
+	Return the clump and item name of an entry, its indices if the names aren't known.
+	"""
+	if entry.clump_index < 0:
+		return '', other_names.pop(0) if other_names else f'{EntryFormat(entry.entry_format).name.lower()} {entry.coord_index}'
+
+	clump = anm.clumps[entry.clump_index]
+	reference_index = clump.bone_material_indices[entry.coord_index]
+
+	if reference_names is None:
+		return f'clump {entry.clump_index}', f'clump {entry.clump_index} coord {entry.coord_index}'
+
+	return reference_names[clump.clump_index], reference_names[reference_index]
+
+
+def read_anm(data: bytes) -> Anm:
+	return BinaryReader(data, Endian.BIG).read_struct(Anm)
+
+
+def analyze_anm(data: bytes, reference_names: Optional[List[str]] = None, other_names: Optional[List[str]] = None,
+				raw_data: Optional[bytes] = None) -> SizeReport:
+	"""
+	Make the size report of an .anm. reference_names are the chunk reference names of the page the clumps index into,
+	other_names the camera and light names in entry order. raw_data is the same animation written without
+	optimization, which gives the keys before clean_entry and key reduction.
+	"""
+	anm = read_anm(data)
+	other_names = list(other_names or [])
+	frame_count = anm.anm_length // max(anm.frame_size, 1) + 1
+
+	raw_curves: Dict[Tuple[int, int, int, int], Curve] = dict()
+	if raw_data is not None:
+		for entry in read_anm(raw_data).entries:
+			for header, curve in zip(entry.curve_headers, entry.curves):
+				raw_curves[(entry.clump_index, entry.coord_index, entry.entry_format, header.curve_index)] = curve
+
+	entry_headers = ENTRY_HEADER.size * len(anm.entries)
+	report = SizeReport(len(data), len(data) - entry_headers, entry_headers)
+
+	for entry in anm.entries:
+		clump_name, name = get_entry_names(anm, entry, reference_names, other_names)
+		kind = EntryFormat(entry.entry_format).name
+
+		cleaned = copy_entry(entry)
+		clean_entry(cleaned)
+
+		for header, curve, clean_curve in zip(entry.curve_headers, entry.curves, cleaned.curves):
+			size = get_curve_size(curve)
+			raw_curve = raw_curves.get((entry.clump_index, entry.coord_index, entry.entry_format, header.curve_index))
+
+			report.curves.append(CurveSize(
+				clump_name, kind, name, header.curve_index, AnmCurveFormat(header.curve_format).name,
+				curve.key_count, size, clean_curve.key_count, size - get_curve_size(clean_curve),
+				get_quantize_saving(clean_curve, frame_count),
+				raw_curve.key_count if raw_curve is not None else None,
+				get_curve_size(raw_curve) if raw_curve is not None else None))
+
+			report.header -= size
+
+	return report
+
+
+def format_size(size: int) -> str:
+	return f'{size / 1024:.1f}'
+
+
+def format_table(report: SizeReport, by: str = 'name', top: int = 20) -> str:
+	"""
+	Format the largest groups of the report as a text table.
+	"""
+	rows = report.group(by)
+	has_raw = bool(rows) and 'raw_keys' in rows[0]
+
+	columns = [by, 'curves', 'keys'] + (['raw keys'] if has_raw else []) + ['clean keys', 'KB', '%', 'const KB', 'quant KB']
+	lines = [columns]
+
+	for row in rows[:top]:
+		lines.append([str(row[by]), str(row['curves']), str(row['keys'])] + ([str(row['raw_keys'])] if has_raw else []) + [
+			str(row['clean_keys']), format_size(row['size']), f'{100 * row["size"] / max(report.total, 1):.1f}',
+			format_size(row['constant_saving']), format_size(row['quantize_saving'])])
+
+	widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+	text = ['  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(line, widths))) for line in lines]
+
+	text.append(f'{len(rows) - min(top, len(rows))} more, total {format_size(report.total)} KB '
+				f'(header {format_size(report.header)} KB, entry headers {format_size(report.entry_headers)} KB)')
+
+	return '\n'.join(text)
+
+
+def get_page_names(page: Dict) -> Tuple[List[str], List[str]]:
+	"""
+	Return the chunk reference names and the camera / light chunk names of a _page.json.
+	"""
+	reference_names = [reference['Name'] for reference in page['Chunk References']]
+	other_names = [chunk['Chunk']['Name'] for chunk in page['Chunks'] if chunk['Chunk']['Type'] != 'nuccChunkAnm']
+
+	return reference_names, other_names
+
+
+def write_report(report: SizeReport, path: str, compact: bool = False) -> None:
+	with open(path, 'w') as f:
+		json.dump(report.to_json(), f, indent=None if compact else '\t')
@@ -0,0 +1,187 @@
+import json
+import numpy as np
+
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Tuple
+
+# Plain data captured by the sampling step. Nothing in here needs bpy, so a snapshot
+# saved from Blender can be encoded again by common/encoder.py anywhere numpy is available.
+
+SNAPSHOT_VERSION = 1
+
+UNKNOWN_VISIBILITY = -1  # Visibility repeated from a window that wasn't sampled by the same process
+
+
+@dataclass
+class BoneSnapshot:
+	name: str
+	is_root: bool
+	data_paths: List[str]  # Channel data paths in the order they appear in the action group
+
+	rest_matrix: np.ndarray  # (4, 4) rest matrix relative to the parent bone
+
+	loc_frames: np.ndarray  # (N,) keyframe frames of the location channels
+	loc_values: np.ndarray  # (N, 3)
+	rot_frames: np.ndarray
+	rot_values: np.ndarray  # (N, 4) quaternion (w, x, y, z) or (N, 3) euler
+	scale_frames: np.ndarray
+	scale_values: np.ndarray  # (N, 3)
+
+	visibility: np.ndarray  # (V,) 0 / 1 per frame, last frame repeated
+
+	# Armature world transform at loc_frames / rot_frames, only sampled for root bones
+	world_loc: Optional[np.ndarray] = None
+	world_rot: Optional[np.ndarray] = None
+
+	visibility_frames: Optional[np.ndarray] = None  # (V,) frames of the visibility values, 0 .. V - 1 if None
+
+
+@dataclass
+class MaterialSnapshot:
+	name: str
+	values: np.ndarray  # (F, 11) in MaterialEntry field order
+	frames: Optional[np.ndarray] = None  # (F,) frames of the values, 0 .. F - 1 if None
+
+
+@dataclass
+class ArmatureSnapshot:
+	name: str
+	object_name: str
+	chunk_path: str
+	action_name: str
+
+	bones: List[str]
+	materials: List[str]
+	models: List[str]
+
+	parents: List[Tuple[str, str]] = field(default_factory=list)  # (parent bone, child bone)
+	copy_transforms: List[Tuple[str, str, str]] = field(default_factory=list)  # (target object, target bone, bone)
+
+	anm_bones: List[BoneSnapshot] = field(default_factory=list)
+	anm_materials: List[MaterialSnapshot] = field(default_factory=list)
+
+
+def as_samples(values) -> np.ndarray:
+	"""
+	Store camera and light samples as contiguous float32 arrays, the precision Blender keeps them in.
+	"""
+	return np.ascontiguousarray(values, dtype=np.float32)
+
+
+@dataclass
+class CameraSnapshot:
+	name: str
+	position: np.ndarray  # (F, 3) float32
+	rotation: np.ndarray  # (F, 4) float32
+	fov: np.ndarray  # (F,) float32
+	key_step: int = 1  # Position and fov are keyed every key_step-th sample
+
+	def __post_init__(self):
+		self.position = as_samples(self.position)
+		self.rotation = as_samples(self.rotation)
+		self.fov = as_samples(self.fov)
+
+
+@dataclass
+class LightSnapshot:
+	name: str
+	type: str
+	color: np.ndarray  # (F, 3) float32, rounded to 2 decimals
+	strength: np.ndarray  # (F,) float32
+	position: np.ndarray  # (F, 3) float32
+	rotation: np.ndarray  # (F, 4) float32
+	size: np.ndarray  # (F,) float32, only filled for POINT lights
+	size_2: np.ndarray
+	key_step: int = 1  # Position is keyed every key_step-th sample
+
+	def __post_init__(self):
+		for name in ('color', 'strength', 'position', 'rotation', 'size', 'size_2'):
+			setattr(self, name, as_samples(getattr(self, name)))
+
+
+@dataclass
+class SceneSnapshot:
+	frame_start: int
+	frame_end: int
+
+	armatures: List[ArmatureSnapshot] = field(default_factory=list)
+	camera: Optional[CameraSnapshot] = None
+	lights: List[LightSnapshot] = field(default_factory=list)
+
+	# ExtraMapping Reference list of clump, coord, material, model names
+	mapping_reference: List[str] = field(default_factory=list)
+	mapping_reference_types: List[str] = field(default_factory=list)
+
+	frame_step: int = 1  # Frames between two samples of unkeyed curves, the frame size of the anm header
+	frame_offset: int = 0  # Frame that is written as frame 0 of bone and material keys
+
+
+SNAPSHOT_TYPES = {cls.__name__: cls for cls in (
+	BoneSnapshot, MaterialSnapshot, ArmatureSnapshot, CameraSnapshot, LightSnapshot, SceneSnapshot)}
+
+
+def _pack(value, key: str, arrays: dict):
+	"""
+	Turn a snapshot value into json-friendly data, moving numpy arrays into the arrays dict.
+	"""
+	if isinstance(value, np.ndarray):
+		arrays[key] = value
+		return {"__array__": key}
+
+	if type(value).__name__ in SNAPSHOT_TYPES:
+		packed = {"__type__": type(value).__name__}
+		for f in fields(value):
+			packed[f.name] = _pack(getattr(value, f.name), f'{key}/{f.name}', arrays)
+		return packed
+
+	if isinstance(value, (list, tuple)):
+		return [_pack(item, f'{key}/{i}', arrays) for i, item in enumerate(value)]
+
+	return value
+
+
+def _unpack(value, arrays):
+	if isinstance(value, dict):
+		if "__array__" in value:
+			return arrays[value["__array__"]]
+
+		cls = SNAPSHOT_TYPES[value["__type__"]]
+		kwargs = {name: _unpack(item, arrays) for name, item in value.items() if name != "__type__"}
+		return cls(**kwargs)
+
+	if isinstance(value, list):
+		return [_unpack(item, arrays) for item in value]
+
+	return value
+
+
+def save_snapshot(snapshot: SceneSnapshot, path: str) -> None:
+	"""
+	Save a scene snapshot to a compressed .npz file.
+	"""
+	arrays = dict()
+	meta = {"version": SNAPSHOT_VERSION, "scene": _pack(snapshot, 'scene', arrays)}
+
+	np.savez_compressed(path, __meta__=np.array(json.dumps(meta)), **arrays)
+
+
+def load_snapshot(path: str) -> SceneSnapshot:
+	"""
+	Load a scene snapshot written by save_snapshot.
+	"""
+	with np.load(path, allow_pickle=False) as data:
+		meta = json.loads(str(data["__meta__"]))
+
+		if meta["version"] != SNAPSHOT_VERSION:
+			raise Exception(f'Snapshot version {meta["version"]} is not supported.')
+
+		arrays = {key: data[key] for key in data.files if key != "__meta__"}
+
+	snapshot = _unpack(meta["scene"], arrays)
+
+	# json turns tuples into lists
+	for armature in snapshot.armatures:
+		armature.parents = [tuple(p) for p in armature.parents]
+		armature.copy_transforms = [tuple(c) for c in armature.copy_transforms]
+
+	return snapshot
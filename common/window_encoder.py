@@ -0,0 +1,720 @@
+import hashlib
+import struct
+import numpy as np
+
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from br.br_anm import *
+from common.array_converter import *
+from common.encoder import AnmLayout, EncoderSettings, LIGHT_ENTRY_TYPES, MATERIAL_CURVE_INDICES, make_layout, write_anm
+from common.profiler import get_profiler
+from common.snapshot import *
+
+# Encoder for long animations. The scene is sampled in windows of frames (see WindowSampler in sampler.py)
+# and every window is converted, reduced and written to bytes right away, so only one window of samples
+# and the encoded curve fragments are kept in memory. The result is the same as make_anm on the whole snapshot.
+
+
+def key_dtype(components: int) -> np.dtype:
+	return np.dtype([('frame', '>i4'), ('value', '>f4', (components,))])
+
+
+class CurveStream:
+	"""
+	Curve whose values are added a window at a time. Only the encoded fragments, the first and last values
+	and whether all values are equal are kept.
+	"""
+	def __init__(self, curve_format: AnmCurveFormat, curve_index: int, curve_flags: int, components: int = 1):
+		self.curve_format = curve_format
+		self.curve_index = curve_index
+		self.curve_flags = curve_flags
+		self.components = components
+
+		self.fragments: List[bytes] = list()
+		self.count = 0
+
+		self.first_frame: Optional[int] = None
+		self.first: Optional[np.ndarray] = None
+		self.last: Optional[np.ndarray] = None
+		self.constant = True
+
+	def __track(self, values: np.ndarray) -> None:
+		if self.first is None:
+			self.first = values[0].copy()
+
+		if self.constant and not (values == self.first).all():
+			self.constant = False
+
+		self.last = values[-1].copy()
+		self.count += len(values)
+
+	def add_keys(self, frames: np.ndarray, values: np.ndarray) -> None:
+		"""
+		Add keys of an INT1_FLOAT* curve, frames are written * 100.
+		"""
+		if not len(frames):
+			return
+
+		values = np.asarray(values, dtype=np.float32).reshape(len(frames), self.components)  # Compared as written
+
+		if self.first_frame is None:
+			self.first_frame = int(frames[0]) * 100
+
+		self.__track(values)
+
+		keys = np.empty(len(frames), key_dtype(self.components))
+		keys['frame'] = np.asarray(frames, dtype=np.int64) * 100
+		keys['value'] = values
+		self.fragments.append(keys.tobytes())
+
+	def add_values(self, values: np.ndarray, dtype: str) -> None:
+		"""
+		Add values of an unkeyed curve, written as dtype (e.g. '>i2' for SHORT4).
+		"""
+		if not len(values):
+			return
+
+		values = np.asarray(values).reshape(len(values), self.components)
+
+		self.__track(values)
+		self.fragments.append(values.astype(dtype).tobytes())
+
+	def finish_keys(self, clean: bool) -> Tuple[CurveHeader, bytes]:
+		"""
+		Return the header and data of the keyed curve with the null key, collapsed like clean_entry if clean.
+		"""
+		null_key = np.empty(1, key_dtype(self.components))
+		null_key['frame'] = -1
+		null_key['value'] = self.last
+
+		if clean and self.constant:
+			if self.curve_format == AnmCurveFormat.INT1_FLOAT3:
+				return self.header(AnmCurveFormat.FLOAT3, 1), self.first.astype('>f4').tobytes()
+
+			if self.curve_format == AnmCurveFormat.INT1_FLOAT4:
+				first_key = np.empty(1, key_dtype(self.components))
+				first_key['frame'] = self.first_frame
+				first_key['value'] = self.first
+				return self.header(self.curve_format, 2), first_key.tobytes() + null_key.tobytes()
+
+			if self.curve_format == AnmCurveFormat.INT1_FLOAT1:
+				return self.header(AnmCurveFormat.FLOAT1, 1), self.first.astype('>f4').tobytes()
+
+		return self.header(self.curve_format, self.count + 1), b''.join(self.fragments) + null_key.tobytes()
+
+	def finish_values(self, frame_count: Optional[int] = None, padding: bytes = b'') -> Tuple[CurveHeader, bytes]:
+		return self.header(self.curve_format, self.count if frame_count is None else frame_count), b''.join(self.fragments) + padding
+
+	def header(self, curve_format: AnmCurveFormat, frame_count: int) -> CurveHeader:
+		return CurveHeader(self.curve_index, curve_format.value, frame_count, self.curve_flags)
+
+
+def encode_entry_data(clump_index: int, coord_index: int, entry_format: EntryFormat, curves: List[Tuple[CurveHeader, bytes]]) -> bytes:
+	"""
+	Write an entry from finished curves, the same bytes as writing the Entry struct.
+	"""
+	data = [ENTRY_HEADER.pack(clump_index, coord_index, entry_format.value, len(curves))]
+	data.extend(header.pack() for header, _ in curves)
+	data.extend(curve for _, curve in curves)
+
+	return b''.join(data)
+
+
+def get_coord_index(clump: Clump, mapping_reference_types: List[str], name: str) -> int:
+	return clump.bone_material_indices.index(mapping_reference_types.index(name))
+
+
+class BoneStream:
+	"""
+	Bone entry encoded a window at a time. With do_optimize, the last key of every window is held back
+	until the next window shows whether it can be dropped.
+	"""
+	def __init__(self, bone: BoneSnapshot, clump_index: int, coord_index: int, do_optimize: bool, frame_offset: int):
+		self.clump_index = clump_index
+		self.coord_index = coord_index
+		self.do_optimize = do_optimize
+		self.frame_offset = frame_offset
+
+		self.rest = matrix_decompose(bone.rest_matrix)
+
+		self.curves: List[Tuple[str, CurveStream]] = list()
+		for curve_index, data_path in enumerate(bone.data_paths):
+			if data_path == 'location':
+				self.curves.append(('location', CurveStream(AnmCurveFormat.INT1_FLOAT3, curve_index, 12, 3)))
+
+			if data_path == 'rotation_euler' or data_path == 'rotation_quaternion':
+				self.curves.append(('rotation', CurveStream(AnmCurveFormat.INT1_FLOAT4, curve_index, 12, 4)))
+
+			if data_path == 'scale':
+				self.curves.append(('scale', CurveStream(AnmCurveFormat.INT1_FLOAT3, curve_index, 12, 3)))
+
+		self.visibility = CurveStream(AnmCurveFormat.INT1_FLOAT1, 3, 12)
+		self.has_scale = any(data_path == 'scale' for data_path, _ in self.curves)
+		self.optimize_keys = do_optimize
+
+		self.pending: Optional[Dict] = None  # Last keys of the previous windows, not decided yet
+		self.previous: Optional[Tuple[float, float]] = None  # First location and rotation channel of the key before them
+
+	def convert(self, bone: BoneSnapshot) -> Dict:
+		"""
+		Convert the keys of a window to anm values, same as make_entry_bone.
+		"""
+		loc, rot, sca = self.rest
+
+		if not bone.is_root:
+			location = (quat_rotate(rot, bone.loc_values) + loc) * 100
+		else:
+			location = (bone.loc_values + bone.world_loc) * 100
+
+		values = euler_to_quat(bone.rot_values) if bone.rot_values.shape[-1] == 3 else bone.rot_values
+
+		if not bone.is_root:
+			rotation = np.roll(quat_invert(quat_mul(rot, values)), -1, axis=-1)  # (x, y, z, w)
+		else:
+			rotation = to_anm_short_rotation(quat_mul(bone.world_rot, values))
+
+		return {
+			'location': (bone.loc_frames, location),
+			'rotation': (bone.rot_frames, rotation),
+			'scale': (bone.scale_frames, np.abs(bone.scale_values) * sca),
+			'still': (bone.loc_values[:, 0], bone.rot_values[:, 0]),  # Compared by the optimization
+		}
+
+	def emit(self, keys: Dict, mask=slice(None)) -> None:
+		for data_path, curve in self.curves:
+			frames, values = keys[data_path]
+			if len(frames):
+				curve.add_keys(frames[mask] - self.frame_offset, values[mask])
+
+	def flush(self) -> None:
+		if self.pending is not None:
+			self.emit(self.pending)
+			self.pending = None
+
+	def add(self, bone: BoneSnapshot) -> None:
+		keys = self.convert(bone)
+
+		frames = bone.loc_frames
+		aligned = (np.array_equal(frames, bone.rot_frames) and (not self.has_scale or np.array_equal(frames, bone.scale_frames)))
+
+		if self.optimize_keys and not aligned:
+			# Keys are only dropped where the location, rotation and scale keys line up
+			self.flush()
+			self.optimize_keys = False
+
+		if not self.optimize_keys:
+			self.emit(keys)
+		elif len(frames):
+			self.add_optimized(keys)
+
+		if bone.visibility_frames is None:
+			visibility_frames = np.arange(self.visibility.count, self.visibility.count + len(bone.visibility))
+		else:
+			visibility_frames = bone.visibility_frames - self.frame_offset
+
+		self.visibility.add_keys(visibility_frames, bone.visibility)
+
+	def add_optimized(self, keys: Dict) -> None:
+		if self.pending is not None:
+			keys = {name: tuple(np.concatenate((p, k)) for p, k in zip(self.pending[name], keys[name])) for name in keys}
+
+		loc0, rot0 = keys['still']
+		count = len(loc0)
+
+		if self.previous is not None:
+			loc0 = np.concatenate(([self.previous[0]], loc0))
+			rot0 = np.concatenate(([self.previous[1]], rot0))
+
+		# Same test as get_optimize_frames, for every key that has a previous and a next key
+		still = ((loc0[:-2] == loc0[1:-1]) & (loc0[1:-1] == loc0[2:]) &
+				(rot0[:-2] == rot0[1:-1]) & (rot0[1:-1] == rot0[2:]))
+
+		keep = np.ones(count - 1, dtype=bool)
+		first = int(self.previous is None)  # The very first key is always kept
+		keep[first:] = ~still[:count - 1 - first]
+
+		self.emit(keys, np.flatnonzero(keep))
+
+		if count > 1:
+			self.previous = (keys['still'][0][-2], keys['still'][1][-2])
+
+		self.pending = {name: tuple(array[-1:] for array in arrays) for name, arrays in keys.items()}
+
+	def finish(self) -> bytes:
+		self.flush()
+
+		curves = [curve.finish_keys(self.do_optimize) for _, curve in self.curves]
+		curves.append(self.visibility.finish_keys(self.do_optimize))
+
+		return encode_entry_data(self.clump_index, self.coord_index, EntryFormat.BONE, curves)
+
+
+class MaterialStream:
+	def __init__(self, clump_index: int, coord_index: int, frame_offset: int):
+		self.clump_index = clump_index
+		self.coord_index = coord_index
+		self.frame_offset = frame_offset
+		self.sample_count = 0
+
+		self.curves = [CurveStream(AnmCurveFormat.INT1_FLOAT1, curve_index, 24) for curve_index in MATERIAL_CURVE_INDICES]
+
+	def add(self, material: MaterialSnapshot) -> None:
+		values = np.array(material.values, dtype=np.float64)
+
+		# Flip the V coordinate of both UV locations
+		values[:, 1] = (-1 * values[:, 3]) + 1 - values[:, 1]
+		values[:, 5] = (-1 * values[:, 7]) + 1 - values[:, 5]
+
+		if material.frames is None:
+			frames = np.arange(self.sample_count, self.sample_count + len(values))
+		else:
+			frames = material.frames - self.frame_offset
+		self.sample_count += len(values)
+
+		for column, curve in enumerate(self.curves):
+			curve.add_keys(frames, values[:, column])
+
+	def finish(self) -> bytes:
+		curves = [curve.finish_keys(False) for curve in self.curves]
+		curves.append((CurveHeader(4, AnmCurveFormat.FLOAT1.value, 1, 12), struct.pack('>f', 0)))  # celshade param setting
+
+		return encode_entry_data(self.clump_index, self.coord_index, EntryFormat.MATERIAL, curves)
+
+
+class KeyedSamples:
+	"""
+	Keys every key_step-th sample of a curve and the last one, counting samples across windows.
+	"""
+	def __init__(self, curve: CurveStream, key_step: int, frame_step: int, scale: float):
+		self.curve = curve
+		self.key_step = key_step
+		self.frame_step = frame_step
+		self.scale = scale
+
+		self.sample_count = 0
+		self.last: Optional[np.ndarray] = None
+
+	def add(self, values: np.ndarray) -> None:
+		if not len(values):
+			return
+
+		indices = np.arange(self.sample_count, self.sample_count + len(values))
+		keyed = indices % self.key_step == 0
+
+		self.curve.add_keys(indices[keyed] * self.frame_step, np.asarray(values[keyed], dtype=np.float64) * self.scale)
+
+		self.sample_count += len(values)
+		self.last = values[-1]
+
+	def finish(self) -> Tuple[CurveHeader, bytes]:
+		last_index = self.sample_count - 1
+		if last_index % self.key_step != 0:
+			self.curve.add_keys(np.array([last_index * self.frame_step]), np.asarray(self.last[None], dtype=np.float64) * self.scale)
+
+		return self.curve.finish_keys(False)
+
+
+class RotationSamples:
+	"""
+	SHORT4 rotation samples, or a FLOAT3ALT euler when there is only a single one.
+	"""
+	def __init__(self, curve_index: int):
+		self.curve = CurveStream(AnmCurveFormat.SHORT4, curve_index, 24, 4)
+		self.first: Optional[np.ndarray] = None
+
+	def add(self, rotation: np.ndarray) -> None:
+		if len(rotation) and self.first is None:
+			self.first = rotation[:1]
+
+		self.curve.add_values(to_anm_short_rotation(rotation), '>i2')
+
+	def finish(self) -> Tuple[CurveHeader, bytes]:
+		if self.curve.count < 2:
+			euler = to_anm_euler(self.first) if self.first is not None else np.zeros((0, 3))
+			return (CurveHeader(self.curve.curve_index, AnmCurveFormat.FLOAT3ALT.value, self.curve.count, 24),
+					euler.astype('>f4').tobytes())
+
+		return self.curve.finish_values()
+
+
+class CameraStream:
+	def __init__(self, camera: CameraSnapshot, frame_step: int):
+		self.position = KeyedSamples(CurveStream(AnmCurveFormat.INT1_FLOAT3, 0, 24, 3), camera.key_step, frame_step, 100)
+		self.rotation = RotationSamples(1)
+		self.fov = KeyedSamples(CurveStream(AnmCurveFormat.INT1_FLOAT1, 2, 24), camera.key_step, frame_step, 1)
+
+	def add(self, camera: CameraSnapshot) -> None:
+		self.position.add(camera.position)
+		self.rotation.add(camera.rotation)
+		self.fov.add(camera.fov)
+
+	def finish(self) -> bytes:
+		if self.position.sample_count > 1:
+			curves = [self.position.finish(), self.rotation.finish(), self.fov.finish()]
+		else:
+			curves = [self.rotation.finish()]
+
+		return encode_entry_data(-1, 0, EntryFormat.CAMERA, curves)
+
+
+class LightStream:
+	def __init__(self, light: LightSnapshot, light_index: int, frame_step: int):
+		self.light_index = light_index
+		self.type = light.type
+
+		self.color = CurveStream(AnmCurveFormat.BYTE3, 0, 24, 3)
+		self.strength = CurveStream(AnmCurveFormat.FLOAT1ALT, 1, 4 if light.type == "POINT" else 24)
+
+		self.position = KeyedSamples(CurveStream(AnmCurveFormat.INT1_FLOAT3, 2, 24, 3), light.key_step, frame_step, 100)
+		self.size = CurveStream(AnmCurveFormat.FLOAT1ALT, 3, 24)
+		self.size_2 = CurveStream(AnmCurveFormat.FLOAT1ALT, 4, 24)
+		self.rotation = RotationSamples(2)
+
+	def add(self, light: LightSnapshot) -> None:
+		self.color.add_values(quantize(light.color, 255), '>u1')
+		self.strength.add_values(light.strength, '>f4')
+
+		if self.type == "POINT":
+			self.position.add(light.position)
+			self.size.add_values(to_cm(light.size), '>f4')
+			self.size_2.add_values(to_cm(light.size_2), '>f4')
+
+		if self.type == "SUN":
+			self.rotation.add(light.rotation)
+
+	def finish(self) -> bytes:
+		# Pad the colors with the last one so the frame count is a multiple of 4
+		frame_count = self.color.count
+		padding = b''
+		if frame_count % 4 != 0:
+			padding = self.color.last.astype('>u1').tobytes() * (4 - frame_count % 4)
+			frame_count += 4 - frame_count % 4
+
+		curves = [self.color.finish_values(frame_count, padding), self.strength.finish_values()]
+
+		if self.type == "POINT":
+			if self.position.sample_count > 1:
+				curves.append(self.position.finish())
+
+			curves.extend([self.size.finish_values(), self.size_2.finish_values()])
+			entry_format = EntryFormat.LIGHTPOINT
+
+		if self.type == "SUN":
+			curves.append(self.rotation.finish())
+			entry_format = EntryFormat.LIGHTDIRECTION
+
+		if self.type == "AREA":
+			entry_format = EntryFormat.AMBIENT
+
+		return encode_entry_data(-1, self.light_index, entry_format, curves)
+
+
+class WindowEncoder:
+	"""
+	Encodes the windows of a scene into an anm buffer. Every window is a SceneSnapshot with the same
+	armatures, bones, materials, camera and lights, holding only the samples of its frames.
+	"""
+	def __init__(self, settings: EncoderSettings, layout: Optional[AnmLayout] = None):
+		self.settings = settings
+		self.layout = layout
+
+		self.streams: Optional[List] = None
+		self.snapshot: Optional[SceneSnapshot] = None
+
+	def make_streams(self, snapshot: SceneSnapshot) -> List:
+		"""
+		Make the entry streams in the same order as iter_entries.
+		"""
+		settings = self.settings
+		mapping_reference_types = snapshot.mapping_reference_types
+		streams = list()
+
+		for armature_index, (armature, clump) in enumerate(zip(snapshot.armatures, self.layout.clumps)):
+			for bone in armature.anm_bones:
+				coord_index = get_coord_index(clump, mapping_reference_types, bone.name + 'nuccChunkCoord')
+				streams.append(BoneStream(bone, armature_index, coord_index, settings.do_optimize, snapshot.frame_offset))
+
+			if settings.export_materials:
+				for material in armature.anm_materials:
+					coord_index = get_coord_index(clump, mapping_reference_types, material.name + 'nuccChunkMaterial')
+					streams.append(MaterialStream(armature_index, coord_index, snapshot.frame_offset))
+
+		if snapshot.camera is not None:
+			streams.append(CameraStream(snapshot.camera, snapshot.frame_step))
+
+		for light_index, light in enumerate(snapshot.lights):
+			if light.type in LIGHT_ENTRY_TYPES:
+				streams.append(LightStream(light, light_index, snapshot.frame_step))
+
+		return streams
+
+	def iter_items(self, snapshot: SceneSnapshot) -> Iterator:
+		"""
+		Yield the bones, materials, camera and lights of a window in stream order.
+		"""
+		for armature in snapshot.armatures:
+			yield from armature.anm_bones
+
+			if self.settings.export_materials:
+				yield from armature.anm_materials
+
+		if snapshot.camera is not None:
+			yield snapshot.camera
+
+		yield from (light for light in snapshot.lights if light.type in LIGHT_ENTRY_TYPES)
+
+	def add(self, window: SceneSnapshot) -> None:
+		"""
+		Convert and encode the samples of a window.
+		"""
+		with get_profiler().stage('conversion', kind='window'):
+			if self.layout is None:
+				self.layout = make_layout(window)
+
+			if self.streams is None:
+				self.streams = self.make_streams(window)
+
+			for stream, item in zip(self.streams, self.iter_items(window)):
+				stream.add(item)
+
+		self.snapshot = window
+
+	def finish(self) -> bytearray:
+		"""
+		Finish every entry and return the anm buffer.
+		"""
+		with get_profiler().stage('conversion', kind='window'):
+			entries = [EncodedEntry(stream.finish()) for stream in self.streams]
+
+		return write_anm(self.snapshot, self.settings, self.layout, entries)
+
+
+def slice_keys(frames: np.ndarray, values: np.ndarray, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+	mask = (frames >= start) & (frames < end)
+	return frames[mask], values[mask]
+
+
+def get_frames(frames: Optional[np.ndarray], values: np.ndarray) -> np.ndarray:
+	return np.arange(len(values)) if frames is None else frames
+
+
+def get_scene_frames(snapshot: SceneSnapshot) -> np.ndarray:
+	"""
+	Return the frames the camera and light samples of a snapshot were taken at, see SceneSampler.get_scene_frames.
+	"""
+	counts = [len(light.strength) for light in snapshot.lights]
+	if snapshot.camera is not None:
+		counts.append(len(snapshot.camera.fov))
+
+	start = snapshot.frame_offset or snapshot.frame_start  # frame_offset is the sampled frame_start if there was one
+	return start + np.arange(max(counts, default=0), dtype=np.int64) * snapshot.frame_step
+
+
+def split_snapshot(snapshot: SceneSnapshot, window_size: int) -> Iterator[SceneSnapshot]:
+	"""
+	Split a whole snapshot into windows of window_size frames, e.g. to encode a saved snapshot with WindowEncoder.
+	"""
+	def all_frames() -> Iterator[np.ndarray]:
+		yield get_scene_frames(snapshot)
+
+		for armature in snapshot.armatures:
+			for bone in armature.anm_bones:
+				yield from (bone.loc_frames, bone.rot_frames, bone.scale_frames, get_frames(bone.visibility_frames, bone.visibility))
+
+			for material in armature.anm_materials:
+				yield get_frames(material.frames, material.values)
+
+	frames = np.concatenate([np.asarray(f, dtype=np.int64) for f in all_frames()] + [np.zeros(1, dtype=np.int64)])
+	first, last = int(frames.min()), int(frames.max())
+
+	return slice_snapshot(snapshot, [(start, start + window_size) for start in range(first, last + 1, window_size)])
+
+
+def slice_snapshot(snapshot: SceneSnapshot, windows: List[Tuple[int, int]]) -> Iterator[SceneSnapshot]:
+	"""
+	Cut the [start, end) frame windows out of a whole snapshot.
+	"""
+	scene_frames = get_scene_frames(snapshot)
+
+	for start, end in windows:
+		armatures = list()
+		for armature in snapshot.armatures:
+			window = ArmatureSnapshot(armature.name, armature.object_name, armature.chunk_path, armature.action_name,
+									armature.bones, armature.materials, armature.models, armature.parents, armature.copy_transforms)
+
+			for bone in armature.anm_bones:
+				loc_mask = (bone.loc_frames >= start) & (bone.loc_frames < end)
+				rot_mask = (bone.rot_frames >= start) & (bone.rot_frames < end)
+				visibility_frames, visibility = slice_keys(get_frames(bone.visibility_frames, bone.visibility), bone.visibility, start, end)
+
+				window.anm_bones.append(BoneSnapshot(
+					bone.name, bone.is_root, bone.data_paths, bone.rest_matrix,
+					bone.loc_frames[loc_mask], bone.loc_values[loc_mask],
+					bone.rot_frames[rot_mask], bone.rot_values[rot_mask],
+					*slice_keys(bone.scale_frames, bone.scale_values, start, end),
+					visibility,
+					bone.world_loc[loc_mask] if bone.world_loc is not None else None,
+					bone.world_rot[rot_mask] if bone.world_rot is not None else None,
+					visibility_frames if bone.visibility_frames is not None else None))
+
+			for material in armature.anm_materials:
+				material_frames, values = slice_keys(get_frames(material.frames, material.values), material.values, start, end)
+				window.anm_materials.append(MaterialSnapshot(material.name, values, material_frames if material.frames is not None else None))
+
+			armatures.append(window)
+
+		# Camera and light samples are cut at the same frames
+		samples = slice(*np.searchsorted(scene_frames, [start, end]))
+
+		camera = None
+		if snapshot.camera is not None:
+			c = snapshot.camera
+			camera = CameraSnapshot(c.name, c.position[samples], c.rotation[samples], c.fov[samples], c.key_step)
+
+		lights = list()
+		for light in snapshot.lights:
+			lights.append(LightSnapshot(light.name, light.type, light.color[samples], light.strength[samples], light.position[samples],
+				light.rotation[samples], light.size[samples] if len(light.size) else light.size,
+				light.size_2[samples] if len(light.size_2) else light.size_2, light.key_step))
+
+		yield SceneSnapshot(snapshot.frame_start, snapshot.frame_end, armatures, camera, lights,
+							snapshot.mapping_reference, snapshot.mapping_reference_types,
+							snapshot.frame_step, snapshot.frame_offset)
+
+
+def fill_visibility(windows: Iterable[SceneSnapshot]) -> Iterator[SceneSnapshot]:
+	"""
+	Replace the UNKNOWN_VISIBILITY values of windows sampled by different processes with the last visibility
+	of the window before.
+	"""
+	last_visibility: Dict[Tuple[int, int], int] = dict()
+
+	for window in windows:
+		for armature_index, armature in enumerate(window.armatures):
+			for bone_index, bone in enumerate(armature.anm_bones):
+				key = (armature_index, bone_index)
+
+				if (bone.visibility == UNKNOWN_VISIBILITY).any():
+					bone.visibility = np.where(bone.visibility == UNKNOWN_VISIBILITY, last_visibility[key], bone.visibility).astype(np.int8)
+
+				if len(bone.visibility):
+					last_visibility[key] = int(bone.visibility[-1])
+
+		yield window
+
+
+def keep_rotations_compatible(windows: Iterable[SceneSnapshot]) -> Iterator[SceneSnapshot]:
+	"""
+	Negate the bone quaternions of windows sampled from the pose by different processes where they start in the
+	other hemisphere than the last ones of the window before, so they stay compatible across windows.
+	"""
+	last_rotations: Dict[Tuple[int, int], np.ndarray] = dict()
+
+	for window in windows:
+		for armature_index, armature in enumerate(window.armatures):
+			for bone_index, bone in enumerate(armature.anm_bones):
+				if not len(bone.rot_values):
+					continue
+
+				key = (armature_index, bone_index)
+				if key in last_rotations and np.dot(bone.rot_values[0], last_rotations[key]) < 0:
+					bone.rot_values = -bone.rot_values
+
+				last_rotations[key] = bone.rot_values[-1]
+
+		yield window
+
+
+class Concatenator:
+	"""
+	Joins the arrays of windows. Arrays with the same content (e.g. samples of clones) are joined
+	only once and share the result, so the encoder can still share their entries.
+	"""
+	def __init__(self):
+		self.joined: Dict[bytes, np.ndarray] = dict()
+
+	def __call__(self, arrays: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+		if arrays[0] is None:
+			return None
+
+		h = hashlib.blake2b()
+		for array in arrays:
+			h.update(repr((array.dtype.str, array.shape)).encode())
+			h.update(np.ascontiguousarray(array).data)
+
+		key = h.digest()
+		if key not in self.joined:
+			self.joined[key] = np.concatenate(arrays)
+
+		return self.joined[key]
+
+
+def merge_windows(windows: Iterable[SceneSnapshot]) -> SceneSnapshot:
+	"""
+	Join the windows of a scene, in frame order, back into one snapshot. The opposite of slice_snapshot.
+	"""
+	windows = list(fill_visibility(windows))
+	first = windows[0]
+	join = Concatenator()
+
+	armatures = list()
+	for armature_index, armature in enumerate(first.armatures):
+		parts = [window.armatures[armature_index] for window in windows]
+		merged = replace(armature, anm_bones=list(), anm_materials=list())
+
+		for bone_index, bone in enumerate(armature.anm_bones):
+			bones = [part.anm_bones[bone_index] for part in parts]
+
+			def join_bones(name: str) -> Optional[np.ndarray]:
+				return join([getattr(b, name) for b in bones])
+
+			merged.anm_bones.append(BoneSnapshot(
+				bone.name, bone.is_root, bone.data_paths, bone.rest_matrix,
+				join_bones('loc_frames'), join_bones('loc_values'),
+				join_bones('rot_frames'), join_bones('rot_values'),
+				join_bones('scale_frames'), join_bones('scale_values'),
+				join_bones('visibility'), join_bones('world_loc'), join_bones('world_rot'), join_bones('visibility_frames')))
+
+		materials: Dict[bytes, MaterialSnapshot] = dict()
+		for material_index, material in enumerate(armature.anm_materials):
+			values = join([part.anm_materials[material_index].values for part in parts])
+			frames = join([part.anm_materials[material_index].frames for part in parts])
+
+			# Materials with the same samples are the same object, like in sample_armature_steps
+			key = (material.name, id(values), id(frames))
+			if key not in materials:
+				materials[key] = MaterialSnapshot(material.name, values, frames)
+			merged.anm_materials.append(materials[key])
+
+		armatures.append(merged)
+
+	camera = None
+	if first.camera is not None:
+		cameras = [window.camera for window in windows]
+		camera = CameraSnapshot(first.camera.name, join([c.position for c in cameras]), join([c.rotation for c in cameras]),
+								join([c.fov for c in cameras]), first.camera.key_step)
+
+	lights = list()
+	for light_index, light in enumerate(first.lights):
+		parts = [window.lights[light_index] for window in windows]
+
+		def join_lights(name: str) -> np.ndarray:
+			return join([getattr(part, name) for part in parts])
+
+		lights.append(LightSnapshot(light.name, light.type, join_lights('color'), join_lights('strength'), join_lights('position'),
+									join_lights('rotation'), join_lights('size'), join_lights('size_2'), light.key_step))
+
+	return replace(first, armatures=armatures, camera=camera, lights=lights)
+
+
+def encode_windows(windows: Iterable[SceneSnapshot], settings: EncoderSettings, layout: Optional[AnmLayout] = None) -> bytearray:
+	"""
+	Encode the windows of a scene and return the anm buffer.
+	"""
+	encoder = WindowEncoder(settings, layout)
+
+	for window in windows:
+		encoder.add(window)
+
+	return encoder.finish()
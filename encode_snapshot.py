@@ -0,0 +1,37 @@
+import os
+import sys
+import argparse
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(directory)
+
+from common.encoder import EncoderSettings, make_anm
+from common.snapshot import load_snapshot
+from common.window_encoder import encode_windows, split_snapshot
+
+# Encode a scene snapshot saved by exporter.py (write_snapshot = True) without Blender.
+# Usage: python encode_snapshot.py "Snapshots/my_action.npz" "my_action.anm" --no-optimize
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Encode a scene snapshot into an .anm file.')
+	parser.add_argument('snapshot', help='.npz snapshot written by exporter.py')
+	parser.add_argument('output', help='path of the .anm file to write')
+	parser.add_argument('--loop', action='store_true', help='mark the animation as looped')
+	parser.add_argument('--materials', action='store_true', help='export material animations')
+	parser.add_argument('--no-optimize', action='store_true', help="don't optimize the animation data")
+	parser.add_argument('--window', type=int, default=0, help='encode in windows of this many frames')
+	args = parser.parse_args()
+
+	settings = EncoderSettings(args.loop, args.materials, not args.no_optimize)
+	snapshot = load_snapshot(args.snapshot)
+
+	with open(args.output, 'wb+') as anm:
+		if args.window:
+			anm.write(encode_windows(split_snapshot(snapshot, args.window), settings))
+		else:
+			anm.write(make_anm(snapshot, settings))
+
+
+if __name__ == '__main__':
+	main()
@@ -1,14 +1,21 @@
+import io
 import os
+import json
 import sys
 import bpy
-import json
+import shutil
+import tempfile
 from time import time
-from typing import List, Dict
-from bpy.types import Armature, Bone
+from fnmatch import fnmatch
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Collection, Generator, List, Dict, Optional
+from bpy.types import Armature, Bone, Action
 from mathutils import Quaternion, Euler, Vector
 
-directory, filename = os.path.split(os.path.abspath(bpy.context.space_data.text.filepath))
-sys.path.append(directory)
+if __name__ == '__main__':
+	# Run from the Text Editor: make the br / common modules next to this script importable
+	sys.path.append(os.path.dirname(os.path.abspath(bpy.context.space_data.text.filepath)))
 
 from br.br_anm import *
 from br.br_camera import Camera
@@ -21,1014 +28,349 @@ from common.coordinate_converter import *
 from common.helpers import *
 from common.light_props import *
 from common.camera_props import *
+from common.encoder import EncoderSettings, encode_entry, get_entry_count, iter_entries, make_anm, write_anm
+from common.entry_cache import EntryCache, make_key
+from common.export_plan import ExportPlan, make_export_plan
+from common.export_settings import ExportSettings
+from common.anm_patch import get_entry_id, patch_anm
+from common.incremental import EntryKey, get_previous_entries, get_reused_entries, load_export_state, make_export_state, splice_entries
+from common.output_writer import OutputWriter
+from common.parallel_sampler import WorkerPool, WorkerTask, make_tasks, split_frames
+from common.page_builder import PageSkeleton, make_page_skeleton, write_page
+from common.profiler import Profiler, get_profiler, pause_between_steps, profiling
+from common.session_cache import set_session_cache_size, thaw_between_steps
+from common.size_report import analyze_anm
+from common.sampler import WindowSampler
+from common.snapshot import SceneSnapshot, save_snapshot
+from common.window_encoder import WindowEncoder, merge_windows
 
 
 
 is_looped = False # Set to True if your animation should be looped
 export_materials = False # Set to True if you want to export material animations
 do_optimize = True # Set to False if you don't want to optimize the animation data
+write_snapshot = False # Set to True to save sampled scene data, which encode_snapshot.py can encode again without Blender
+use_entry_cache = True # Set to False if you don't want to reuse entries that didn't change since the last export
+entry_cache_size = 512 # Size limit of the entry cache in MB
+session_cache_size = 64 # Size limit in MB of the scene data (bone / material lists, rest matrices) kept between exports until it changes, 0 turns it off
+profile_export = False # Set to True to write a _profile.json with the time spent in each export stage
+output_threads = 4 # Number of threads writing the exported files
+compact_page_json = False # Set to True to write _page.json without indentation
+write_size_report = False # Set to True to write a _size.json with the bytes of every entry, curve and format of the .anm (see analyze_anm.py)
 
 anm_chunk_path = "" # Path of anm chunk file
 
+frame_range = None # (start, end) frames to export, e.g. (0, 120). Every frame of the scene if None
+frame_step = 1 # Sample every Nth frame
+frame_step_overrides = {} # Frame step of keyed curves by entry kind or armature, e.g. {"camera": 1, "1bgm01 [C]": 2}
+sample_pose = False # Set to True to sample bones from their evaluated pose every frame_step frames, so constraints and IK are exported without baking
+window_size = 0 # Sample and encode long animations in windows of this many frames to limit memory use, 0 samples everything at once (no entry cache or snapshot then)
+sampling_workers = 0 # Sample the frames in this many background Blender processes at once, 0 samples in this one
+incremental_export = False # Set to True to only sample and encode the bones, materials, camera and lights that changed since the last export of an action
 
-def camera_exists() -> bool:
-	""" Return True if Camera exists AND has animation data, and False otherwise."""
-	cam = bpy.context.scene.camera
+batch_actions = [] # Names of actions to export one after another, e.g. ["1sik_idle", "1sik_run"]
+batch_action_pattern = "" # Export every action matching this pattern too, e.g. "1sik*"
 
-	if cam and cam.animation_data: 
-		return True
-	else: 
-		return False
 
-def light_exists() -> bool:
-	"""Returns True if a lightDirc or lightPoint object exists, and False otherwise."""
-	lights = get_lights()
+__version__ = "9.7.1"
 
-	for light in lights:
-		if light['type'] == "SUN" or light['type'] == "POINT" or light['type'] == "AREA":
-			return True
-	return False
 
-def get_anm_armatures() -> List[Armature]:
+@dataclass
+class ExportProgress:
 	"""
-	Return list of armatures that contain animation data.
+	Progress of an export, yielded by export_steps.
 	"""
-	anm_armatures: List[Armature] = list()
-
-	for obj in bpy.context.selected_objects:
-		if obj.type == "ARMATURE":
-			armature_obj = bpy.data.objects[obj.name]
+	action: str
+	action_index: int
+	action_count: int
+	frame_count: int
 
-			if armature_obj.animation_data:
-				anm_armatures.append(armature_obj)
+	sample_count: int  # Bones, materials, camera and lights to sample, or windows
+	entry_count: int  # Entries to make, estimated until the scene is sampled, or windows
+	samples_done: int = 0
+	entries_done: int = 0
 
-	return anm_armatures
-
-# Animated armature objects which are special objects with .anm properties
-animated_armatures = list(map(lambda x: AnmArmature(x), get_anm_armatures()))
-
-
-def make_mapping_reference(types=False) -> List[str]:
-	"""
-	Create ExtraMapping Reference list of clump, coord, material, model names for all animated armatures.
-	"""
-	extra_mapping_reference: List[str] = list()
-	extra_mapping_reference_types: List[str] = list()
-	
-	if types:
-		for armature_obj in animated_armatures:
-			bones = list(map(lambda x: x + 'nuccChunkCoord', armature_obj.bones))
-			materials = list(map(lambda x: x + 'nuccChunkMaterial', armature_obj.materials))
-			models = list(map(lambda x: x + 'nuccChunkModel', armature_obj.models))
-
-			 # Check if models is empty, if so use armature_obj.bones[0] instead
-			if not armature_obj.models:
-				extra_mapping_reference_types.extend([armature_obj.bones[0] + 'nuccChunkClump', *bones, *materials])
-			else:
-				extra_mapping_reference_types.extend([armature_obj.models[0] + 'nuccChunkClump', *bones, *materials, *models])
-		
-		return extra_mapping_reference_types
-		
-	else:
-		for armature_obj in animated_armatures:
-			if not armature_obj.models:
-				extra_mapping_reference.extend([armature_obj.bones[0], *armature_obj.bones, *armature_obj.materials])
-			else:
-				extra_mapping_reference.extend([armature_obj.models[0], *armature_obj.bones, *armature_obj.materials])
-		return extra_mapping_reference
-		
+	@property
+	def fraction(self) -> float:
+		"""
+		Done part of the whole export, sampling and encoding of each action count the same.
+		"""
+		action_fraction = 0.5 * self.samples_done / max(self.sample_count, 1) + 0.5 * self.entries_done / max(self.entry_count, 1)
 
-# Create ExtraMapping Reference list of clump, coord, material, model names for all animated armatures. 
-extra_mapping_reference: List[str] = make_mapping_reference()
-extra_mapping_reference_types: List[str] = make_mapping_reference(types=True) # With types
+		return (self.action_index + action_fraction) / self.action_count
 
 
-def make_clump(armature: AnmArmature, clump_index: int) -> Clump:
+def make_anm_steps(plan: ExportPlan, settings: ExportSettings, action_name: str, progress: ExportProgress,
+					writer: OutputWriter) -> Generator[ExportProgress, None, bytearray]:
 	"""
-	Create clump struct based on armatures index and bone / model indices.
+	Sample the scene, make anm buffer and return it. Yields the progress after each sampled bone and made entry.
 	"""
+	if settings.sampling_workers:
+		return (yield from make_anm_parallel_steps(plan, settings, action_name, progress, writer))
 
-	# Get bone material indices from extra mapping reference
-	bone_material_indices: List[int]
-	model_indices: List[int]
-
-	bones = list(map(lambda x: x + 'nuccChunkCoord', armature.bones))
-	materials = list(map(lambda x: x + 'nuccChunkMaterial', armature.materials))
-	
-	bone_material_map = [*bones, *materials]
-
-	models = list()
-	for model in armature.models:
-		#if not bpy.data.objects[model].hide_render:
-		models.append(model)
+	if settings.window_size:
+		return (yield from make_anm_window_steps(plan, settings, progress, writer))
 
-	model_map = list(map(lambda x: x + 'nuccChunkModel', models))
+	if settings.incremental_export:
+		return (yield from make_anm_incremental_steps(plan, settings, action_name, progress, writer))
 
-	bone_material_indices = [extra_mapping_reference_types.index(bone_material) for bone_material in bone_material_map]
-	model_indices = [extra_mapping_reference_types.index(model) for model in model_map]
+	snapshot = yield from sample_snapshot_steps(plan, progress)
 
-	clump = Clump(
-				clump_index, 
-				len(bone_material_indices), 
-				len(model_indices), 
-				bone_material_indices, 
-				model_indices)
+	return (yield from encode_anm_steps(plan, settings, action_name, snapshot, progress, writer))
 
-	return clump
 
-
-def make_clumps() -> List[Clump]:
-	"""
-	Create multiple clump structs based on the animated armatures present.
-	"""
-	clumps: List[Clump] = list()
-
-	for armature_obj in animated_armatures:
-		# Create clump struct and add to list
-		if not len(armature_obj.models):
-			clump_index = extra_mapping_reference_types.index(armature_obj.bones[0] + 'nuccChunkClump')
-		else:
-			clump_index = extra_mapping_reference_types.index(armature_obj.models[0] + 'nuccChunkClump')
-		clump = make_clump(armature_obj, clump_index)
-		clumps.append(clump)
-	return clumps
-
-
-def make_coord_parent() -> CoordParent:
+def sample_snapshot_steps(plan: ExportPlan, progress: ExportProgress, skip: Collection[EntryKey] = ()) -> Generator[ExportProgress, None, SceneSnapshot]:
 	"""
-	Create coord parent structs for all animated armatures.
+	Sample the scene, leaving out the entries in skip, and return the snapshot. Yields the progress after each sampled bone.
 	"""
-	anm_coords: List[AnmCoord] = list()
-	obj_arm_name_list = list()
-	obj_arm_list = get_anm_armatures()
-	for arm in obj_arm_list:
-		obj_arm_name_list.append(arm.name)
-	for index, armature_obj in enumerate(animated_armatures):
-		children: List[Bone] = [bone for bone in armature_obj.armature.data.bones if bone.parent] # List of child bones
-
-		for bone in children:
-			parent = AnmCoord(index, armature_obj.bones.index(bone.parent.name))
-			child = AnmCoord(index, armature_obj.bones.index(bone.name))
-			anm_coords.extend([parent, child])
-		all_bones: List[Bone] = armature_obj.armature.data.bones
+	sampling = plan.sampler.sample_steps(skip)
 
-		for bone in all_bones:
-			if ("Copy Transforms" in obj_arm_list[index].pose.bones[bone.name].constraints):
-				parent_clump_index = obj_arm_name_list.index(obj_arm_list[index].pose.bones[bone.name].constraints["Copy Transforms"].target.name)
+	while True:
+		try:
+			next(sampling)
+		except StopIteration as stop:
+			return stop.value
 
-				parent = AnmCoord(parent_clump_index,animated_armatures[parent_clump_index].bones.index(obj_arm_list[index].pose.bones[bone.name].constraints["Copy Transforms"].subtarget))
-				child = AnmCoord(index, armature_obj.bones.index(bone.name))
-				anm_coords.extend([parent, child])
+		progress.samples_done += 1
+		yield progress
 
-	return CoordParent(anm_coords)
 
-
-def add_curve(curve_format: AnmCurveFormat, curve_index: int, curve_size: int, frame_count: int, values: List, curve_headers: List[CurveHeader], curves: List[Curve]):
-	"""
-	Add curve to curve_headers and curves list.
-	"""
-	curve = Curve(curve_format, values)
-	curves.append(curve)
-	curve_header = CurveHeader(curve_index, curve_format.value, frame_count, curve_size)
-	curve_headers.append(curve_header)
-
-def make_entry_light(light_index: int) -> Entry:
+def encode_anm_steps(plan: ExportPlan, settings: ExportSettings, action_name: str, snapshot: SceneSnapshot, progress: ExportProgress,
+					writer: OutputWriter) -> Generator[ExportProgress, None, bytearray]:
 	"""
-	Make .anm Entry struct for lightPoint and LightDirc object.. 
+	Make the anm buffer of a sampled scene and return it. Yields the progress after each made entry.
 	"""
-	curve_headers: List[CurveHeader] = list()
-	curves: List[Curve] = list()
-
-	light = get_lights()[light_index]
-
-	light_type = light['type']
-	light_color_values = light['color']
-	light_strength_values = light['strength']
-	light_pos_values = light['matrix_world']
-	light_rot_values = light['matrix_world_rotation']
-	
-
-	if (light_type == "POINT"):
-		light_radius_1_values = light['size']
-		light_radius_2_values = light['size_2']
-
-		# Combine the color, strength, and rotation values into one list so we can use an index to create the curves
-		light_values = {
-			'color': light_color_values,
-			'strength': light_strength_values,
-			'position': light_pos_values,
-			'radius_1': light_radius_1_values,
-			'radius_2': light_radius_2_values
-		}
-
+	if settings.write_snapshot:
+		snapshot_path = f'{plan.export_path}\\Snapshots'
 
+		if not os.path.exists(snapshot_path):
+			os.makedirs(snapshot_path)
 
-		# Create curves for each value
-		for index, (key, values) in enumerate(light_values.items()):
-			if key == 'color':
-				converted_values = [[value * 255 for value in sublist] for sublist in light_values[key]]
-				chained_values = chain_list(converted_values)
-				frame_count = len(converted_values)
-
-				if len(converted_values) % 4 != 0:
-					# Pad the list with the last value so the length is a multiple of 4
-					chained_values += converted_values[-1] * (4 - len(converted_values) % 4)
-					frame_count = len(converted_values) + (4 - len(converted_values) % 4)
-				add_curve(AnmCurveFormat.BYTE3, index, 24, frame_count, chained_values, curve_headers, curves)
-			
-			if key == 'strength':
-				converted_values = convert_light_values('light_strength', light_values[key])
-				add_curve(AnmCurveFormat.FLOAT1ALT, index, 4, len(converted_values), converted_values, curve_headers, curves)
-			
-			if key == 'position':
-				keyframe_vec3 = dict()
-				converted_values = convert_light_values('light_pos', light_pos_values)
-
-				if len(light_pos_values) > 1:
-					for frame, value in enumerate(converted_values):
-						keyframe_vec3[frame * 100] = value
-
-					keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-
-					frame_count = len(light_pos_values) + 1
-					add_curve(AnmCurveFormat.INT1_FLOAT3, index, 24, frame_count, keyframe_vec3, curve_headers, curves)
-			
-			if key == 'radius_1':
-				converted_values = convert_light_values('light_radius', light_radius_1_values)
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.FLOAT1ALT, index, 24, frame_count, converted_values, curve_headers, curves)
-
-			if key == 'radius_2':
-				converted_values = convert_light_values('light_radius', light_radius_2_values)
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.FLOAT1ALT, index, 24, frame_count, converted_values, curve_headers, curves)
-
-		# Create the entry
-		clump_index = -1
-		coord_index = light_index
-		entry_format = EntryFormat.LIGHTPOINT # LightPoint
-		curve_count = len(curve_headers)
-
-		entry = Entry(clump_index, coord_index, entry_format, curve_count, curve_headers, curves)
+		with get_profiler().stage('file io'):
+			save_snapshot(snapshot, f'{snapshot_path}\\{action_name}.npz')
 
-		
-	if (light_type == "SUN"):
-		# Combine the color, strength, and rotation values into one list so we can use an index to create the curves
-		light_values = {
-			'color': light_color_values,
-			'strength': light_strength_values,
-			'rotation': light_rot_values
-		}
+	cache = get_entry_cache(plan, settings)
 
-		# Create the curves
-		for index, (key, values) in enumerate(light_values.items()):
-			if key == 'color':
-				converted_values = [[value * 255 for value in sublist] for sublist in light_values[key]]
-				chained_values = chain_list(converted_values)
-				frame_count = len(converted_values)
-
-				if len(converted_values) % 4 != 0:
-					# Pad the list with the last value so the length is a multiple of 4
-					chained_values += converted_values[-1] * (4 - len(converted_values) % 4)
-					frame_count = len(converted_values) + (4 - len(converted_values) % 4)
-				add_curve(AnmCurveFormat.BYTE3, index, 24, frame_count, chained_values, curve_headers, curves)
-
-			if key == 'strength':
-				converted_values = convert_light_values('light_strength', light_values[key])
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.FLOAT1ALT, index, 24, frame_count, converted_values, curve_headers, curves)
-			
-			if key == 'rotation':
-				if len(light_values[key]) < 2:
-					converted_values = convert_light_values('light_rot_euler', light_values[key])
-					frame_count = len(converted_values)
-					add_curve(AnmCurveFormat.FLOAT3ALT, index, 24, frame_count, converted_values, curve_headers, curves)
-				else:
-					converted_values = convert_light_values('light_rot', light_values[key])
-					frame_count = len(converted_values)
-					add_curve(AnmCurveFormat.SHORT4, index, 24, frame_count, converted_values, curve_headers, curves)
-
-		# Create the entry
-		clump_index = -1
-		coord_index = light_index
-		entry_format = EntryFormat.LIGHTDIRECTION
-		curve_count = len(curve_headers)
-
-		entry = Entry(clump_index, coord_index, entry_format.value, curve_count, curve_headers, curves)
-
-	if (light_type == "AREA"):
-		# Combine the color, strength, and rotation values into one list so we can use an index to create the curves
-		light_values = {
-			'color': light_color_values,
-			'strength': light_strength_values
-		}
+	encoder_settings = settings.encoder
+	progress.entry_count = get_entry_count(snapshot, encoder_settings)
 
-		# Create the curves
-		for index, (key, values) in enumerate(light_values.items()):
-			if key == 'color':
-				converted_values = [[value * 255 for value in sublist] for sublist in light_values[key]]
-				chained_values = chain_list(converted_values)
-				frame_count = len(converted_values)
+	profiler = get_profiler()
+	with profiler.stage('encoding'), profiler.count_calls(BinaryReader, '_BinaryReader__write_type', 'BinaryReader writes'):
+		entries = list()
 
-				if len(converted_values) % 4 != 0:
-					# Pad the list with the last value so the length is a multiple of 4
-					chained_values += converted_values[-1] * (4 - len(converted_values) % 4)
-					frame_count = len(converted_values) + (4 - len(converted_values) % 4)
-				add_curve(AnmCurveFormat.BYTE3, index, 24, frame_count, chained_values, curve_headers, curves)
+		for entry in iter_entries(snapshot, plan.layout.clumps, encoder_settings, cache):
+			entries.append(entry)
 
-			if key == 'strength':
-				converted_values = convert_light_values('light_strength', light_values[key])
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.FLOAT1ALT, index, 24, frame_count, converted_values, curve_headers, curves)
+			progress.entries_done += 1
+			yield progress
 
-		# Create the entry
-		clump_index = -1
-		coord_index = light_index
-		entry_format = EntryFormat.AMBIENT
-		curve_count = len(curve_headers)
+		anm_buffer = write_anm(snapshot, encoder_settings, plan.layout, entries)
 
-		entry = Entry(clump_index, coord_index, entry_format.value, curve_count, curve_headers, curves)
+	if settings.write_size_report:
+		with profiler.stage('size report'):
+			raw_buffer = make_anm(snapshot, replace(encoder_settings, do_optimize=False), layout=plan.layout) if settings.do_optimize else None
+			add_size_report(plan, settings, writer, anm_buffer, raw_buffer)
 
-	return entry
+	return anm_buffer
 
 
-def make_entry_camera() -> Entry:
+def get_entry_cache(plan: ExportPlan, settings: ExportSettings) -> Optional[EntryCache]:
 	"""
-	Make .anm Entry struct for camera object. An entry is equivalent to an Action Group in Blender. 
+	Return the entry cache of the export. Opening it scans the whole cache folder, so it's only done once.
 	"""
-	curve_headers: List[CurveHeader] = list()
-	curves: List[Curve] = list()
-
-	camera = get_camera()
-
-	camera_FOV = camera['FOV']
-	camera_pos_values = camera['matrix_world']
-	camera_rot_values = camera['matrix_world_rotation']
-	
-	# Combine the color, strength, and rotation values into one list so we can use an index to create the curves
-	camera_values = {
-		'position': camera_pos_values,
-		'rotation': camera_rot_values,
-		'FOV': camera_FOV
-	}
+	if not settings.use_entry_cache:
+		return None
 
+	if plan.entry_cache is None:
+		with get_profiler().stage('file io'):
+			plan.entry_cache = EntryCache(plan.cache_path, settings.entry_cache_size * 1024 * 1024)
 
-	# Create curves for each value
-	for index, (key, values) in enumerate(camera_values.items()):
-		
-		
-		if key == 'position':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_pos', camera_values[key])
+	return plan.entry_cache
 
-			if len(camera_pos_values) > 1:
-				for frame, value in enumerate(converted_values):
-					keyframe_vec3[frame * 100] = value
 
-				keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-
-				frame_count = len(camera_pos_values) + 1
-				add_curve(AnmCurveFormat.INT1_FLOAT3, index, 24, frame_count, keyframe_vec3, curve_headers, curves)
-		
-		if key == 'rotation':
-			if len(camera_values[key]) < 2:
-				converted_values = convert_camera_values('camera_rot_euler', camera_values[key])
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.FLOAT3ALT, index, 24, frame_count, converted_values, curve_headers, curves)
-			else:
-				converted_values = convert_camera_values('camera_rot', camera_values[key])
-				frame_count = len(converted_values)
-				add_curve(AnmCurveFormat.SHORT4, index, 24, frame_count, converted_values, curve_headers, curves)
-
-		if key == 'FOV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', camera_values[key])
-
-			if len(camera_pos_values) > 1:
-				for frame, value in enumerate(converted_values):
-					keyframe_vec3[frame * 100] = value
-
-				keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-
-				frame_count = len(camera_FOV) + 1
-				add_curve(AnmCurveFormat.INT1_FLOAT1, index, 24, frame_count, keyframe_vec3, curve_headers, curves)
-
-	# Create the entry
-	clump_index = -1
-	coord_index = 0
-	entry_format = EntryFormat.CAMERA # Camera
-	curve_count = len(curve_headers)
-
-	entry = Entry(clump_index, coord_index, entry_format, curve_count, curve_headers, curves)
-
-	return entry
-
-def get_bone_action_frames(action_name: str, bone_name: str, channel_id: int):
-    fcurves = bpy.data.actions[action_name].groups.get(bone_name)
-    keyframes = list()
-    
-    
-    for keyframe in fcurves.channels[channel_id].keyframe_points:
-        keyframes.append(int(keyframe.co[0]))
-    return keyframes
-
-def delete_bone_frame_for_optimize(action_name: str, bone_name: str):
-	fcurves = bpy.data.actions[action_name].groups.get(bone_name).channels
-	keyframes = list()
-	count = len(fcurves[0].keyframe_points)
-    
-	if (count > 2):
-		i = 1
-		while (i < count-1):
-			location_1 = Vector((fcurves[0].keyframe_points[i-1].co[1],
-			fcurves[1].keyframe_points[i].co[1],
-			fcurves[2].keyframe_points[i].co[1]))
-			rotation_1 = Quaternion((fcurves[3].keyframe_points[i-1].co[1],
-			fcurves[4].keyframe_points[i].co[1],
-			fcurves[5].keyframe_points[i].co[1],
-			fcurves[6].keyframe_points[i].co[1]))
-			
-			location_2 = Vector((fcurves[0].keyframe_points[i].co[1],
-			fcurves[1].keyframe_points[i].co[1],
-			fcurves[2].keyframe_points[i].co[1]))
-			rotation_2 = Quaternion((fcurves[3].keyframe_points[i].co[1],
-			fcurves[4].keyframe_points[i].co[1],
-			fcurves[5].keyframe_points[i].co[1],
-			fcurves[6].keyframe_points[i].co[1]))
-
-			location_3 = Vector((fcurves[0].keyframe_points[i+1].co[1],
-			fcurves[1].keyframe_points[i].co[1],
-			fcurves[2].keyframe_points[i].co[1]))
-			rotation_3 = Quaternion((fcurves[3].keyframe_points[i+1].co[1],
-			fcurves[4].keyframe_points[i].co[1],
-			fcurves[5].keyframe_points[i].co[1],
-			fcurves[6].keyframe_points[i].co[1]))
-			
-			if (location_1 == location_2 == location_3) and (rotation_1 == rotation_2 == rotation_3):
-				keyframes.append(int(fcurves[0].keyframe_points[i].co[0]))
-
-			i = i + 1
-
-	return keyframes
-
-def make_entry_bone(armature_obj: Armature, bone_name: str, clump_index: int, clump: Clump, parent_exist: bool = True) -> Entry:
+def get_export_context(plan: ExportPlan, settings: EncoderSettings) -> str:
 	"""
-	Make .anm Entry struct. An entry is equivalent to an Action Group in Blender. 
+	Return a key of everything all entries depend on: encoder and sampling settings, frames and layout.
 	"""
-	action = armature_obj.animation_data.action
-	curve_headers: List[CurveHeader] = list()
-	curves: List[Curve] = list()
+	sampler = plan.sampler
 
-	# Make animated armature object and clump
-	bone_material_indices: List[int] = clump.bone_material_indices
+	return make_key(settings, sampler.sampling, sampler.get_scene_frames(), sampler.get_frame_end(), plan.layout,
+		sampler.scene.mapping_reference_types)
 
-	mat = get_edit_matrix(armature_obj, bone_name)
-	loc, rot, sca = mat.decompose()
-	group = action.groups.get(bone_name)
-	fcurves = group.channels
-	
-	data_paths = dict()
-	
-	channel_count = len(fcurves)
-	loc_channel_values = list()
-	rot_channel_values = list()
-	scale_channel_values = list()
 
-	loc_updated_frames = get_bone_action_frames(action.name,bone_name,0)
-	rot_updated_frames = get_bone_action_frames(action.name,bone_name,3)
-	scale_updated_frames = get_bone_action_frames(action.name,bone_name,7)
-
-	
-	optimize_frames = list()
-	if (do_optimize):
-		optimize_frames = delete_bone_frame_for_optimize(action.name, bone_name)
-
-    #location
-	for i in range(channel_count):
-		path = fcurves[i].data_path.rpartition('.')[2]
-		keyframes = [int(k) for k in range(len(fcurves[i].keyframe_points))]
-		data_paths[path] = len(keyframes) # Add keyframe count
-
-		loc_channel_values.append(list(map(lambda key: fcurves[i].evaluate(key), loc_updated_frames)))
-
-	#rotation
-	for i in range(channel_count):
-		path = fcurves[i].data_path.rpartition('.')[2]
-		keyframes = [int(k) for k in range(len(fcurves[i].keyframe_points))]
-		data_paths[path] = len(keyframes) # Add keyframe count
-
-		rot_channel_values.append(list(map(lambda key: fcurves[i].evaluate(key), rot_updated_frames)))
-	#scale
-	for i in range(channel_count):
-		path = fcurves[i].data_path.rpartition('.')[2]
-		keyframes = [int(k) for k in range(len(fcurves[i].keyframe_points))]
-		data_paths[path] = len(keyframes) # Add keyframe count
-		scale_channel_values.append(list(map(lambda key: fcurves[i].evaluate(key), scale_updated_frames)))
-
-	scale_adjust = 0
-	for data_path, keyframe_count in data_paths.items():
-		if data_path == 'location':
-			keyframe_vec3 = dict()
-			if (parent_exist):
-				values = list(
-					map(lambda x, y, z,: Vector((x, y, z)), 
-					loc_channel_values[0], 
-					loc_channel_values[1], 
-					loc_channel_values[2]))
-				converted_values = convert_to_anm_values(data_path, values, loc, rot, sca)
-			else:
-				adjust_loc_values = get_current_matrix_loc(armature_obj,loc_updated_frames)
-				values = list(
-					map(lambda x, y, z, adjust: Vector((x+adjust[0], y+adjust[1], z+adjust[2])), 
-					loc_channel_values[0], 
-					loc_channel_values[1], 
-					loc_channel_values[2], adjust_loc_values))
-				converted_values = convert_to_anm_values("location_camera", values, loc, rot, sca)
-			
-			for frame, value in enumerate(converted_values):
-					if loc_updated_frames[frame] not in optimize_frames:
-						keyframe_vec3[loc_updated_frames[frame] * 100] = value
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT3, list(data_paths).index(data_path), 12, keyframe_count + 1-len(optimize_frames), keyframe_vec3, curve_headers, curves)
-		if data_path == 'rotation_euler' or data_path == 'rotation_quaternion':
-			keyframe_vec3 = dict()
-			if (parent_exist):
-				if (data_path == 'rotation_euler'):
-					scale_adjust = 1
-					values = list(map(lambda x, y, z: Euler(Vector((x, y, z))).to_quaternion(), rot_channel_values[3], rot_channel_values[4], rot_channel_values[5]))
-				elif (data_path == 'rotation_quaternion'):
-					values = list(map(lambda w, x, y, z: Quaternion((w, x, y, z)), rot_channel_values[3], rot_channel_values[4], rot_channel_values[5], rot_channel_values[6])) 
-				converted_values = convert_to_anm_values('rotation_quaternion_keyframe', values, loc, rot, sca)
-			else:
-				adjust_rot_values = get_current_matrix_rot(armature_obj,rot_updated_frames)
-				if (data_path == 'rotation_euler'):
-					scale_adjust = 1
-					values = list(map(lambda x, y, z, adjust: adjust @ Euler(Vector((x, y, z))).to_quaternion(), rot_channel_values[3], rot_channel_values[4], rot_channel_values[5], adjust_rot_values))
-				elif (data_path == 'rotation_quaternion'):
-					values = list(map(lambda w, x, y, z, adjust: adjust @ Quaternion((w, x, y, z)), rot_channel_values[3], rot_channel_values[4], rot_channel_values[5], rot_channel_values[6], adjust_rot_values)) 
-				converted_values = convert_camera_values('camera_rot', values)
-			
-			for frame, value in enumerate(converted_values):
-					if rot_updated_frames[frame] not in optimize_frames:
-						keyframe_vec3[rot_updated_frames[frame] * 100] = value
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT4, list(data_paths).index(data_path), 12, keyframe_count + 1-len(optimize_frames), keyframe_vec3, curve_headers, curves)
-
-		if data_path == 'scale':
-			keyframe_vec3 = dict()
-			values = list(
-					map(lambda x, y, z: Vector((x, y, z)), 
-					scale_channel_values[7-scale_adjust], 
-					scale_channel_values[8-scale_adjust], 
-					scale_channel_values[9-scale_adjust]))
-			converted_values = convert_to_anm_values('scale_keyframe', values, loc, rot, sca)
-			for frame, value in enumerate(converted_values):
-					if scale_updated_frames[frame] not in optimize_frames:
-						keyframe_vec3[scale_updated_frames[frame] * 100] = value
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT3, list(data_paths).index(data_path), 12, keyframe_count + 1-len(optimize_frames), keyframe_vec3, curve_headers, curves)
-	
-	# Add toggled visibility curve
-	if parent_exist:
-		'''add_curve(AnmCurveFormat.FLOAT1, 3, 12, 1, [1], curve_headers, curves)'''
-		keyframe_vec3 = dict()
-		values = list()
-		values = get_toggle_values_bone(bone_name)
-		for frame, value in enumerate(values):
-				keyframe_vec3[frame * 100] = value
-		keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-		add_curve(AnmCurveFormat.INT1_FLOAT1, 3, 12, len(keyframe_vec3), keyframe_vec3, curve_headers, curves)
-
-	else:
-		'''add_curve(AnmCurveFormat.SHORT1, 3, len(values) * 2, len(values), values, curve_headers, curves)'''
-		keyframe_vec3 = dict()
-		values = list()
-		values = get_toggle_values(armature_obj.name)
-		for frame, value in enumerate(values):
-				keyframe_vec3[frame * 100] = value
-		keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-		add_curve(AnmCurveFormat.INT1_FLOAT1, 3, 12, len(keyframe_vec3), keyframe_vec3, curve_headers, curves)
-
-
-	coord_index = bone_material_indices.index(extra_mapping_reference_types.index(group.name + 'nuccChunkCoord'))
-	entry_format = EntryFormat.BONE
-	curve_count = len(curve_headers)
-
-	entry = Entry(clump_index, coord_index, entry_format.value, curve_count, curve_headers, curves)
-
-	return entry
-
-def get_toggle_values(armature_name: str) -> list():
-	values = list()
-	for frame in range(bpy.context.scene.frame_end):
-		bpy.context.scene.frame_set(frame)
-		if bpy.data.objects[armature_name].hide_render:
-			values.append(0)
-		else:
-			values.append(1)
-	values.append(values[-1])
-	return values
-
-def get_toggle_values_bone(bone_name: str) -> list():
-	values = list()
-	for obj in bpy.context.scene.objects:
-		if obj.xfbin_nud_data.mesh_bone == bone_name:
-			for frame in range(bpy.context.scene.frame_end):
-				bpy.context.scene.frame_set(frame)
-				if obj.hide_render:
-					values.append(0)
-				else:
-					values.append(1)
-			values.append(values[-1])
-			return values
-	values.append(1)
-	return values
+def read_file(path: str) -> Optional[bytes]:
+	try:
+		with open(path, 'rb') as f:
+			return f.read()
+	except FileNotFoundError:
+		return None
 
-@dataclass
-class MaterialEntry:
-	loc_x_1uv: float = 0
-	loc_y_1uv: float = 0
-	scale_x_1uv: float = 1
-	scale_y_1uv: float = 1
-	loc_x_2uv: float = 0
-	loc_y_2uv: float = 0
-	scale_x_2uv: float = 1
-	scale_y_2uv: float = 1
-	blend_v: float = 0
-	glare_v: float = 0.12
-	alpha_v: float = 205
-
-
-def get_material_values(material_name: str) -> list():
-	values = list()
-	for frame in range(bpy.context.scene.frame_end):
-		bpy.context.scene.frame_set(frame)
-		frame = MaterialEntry()
-		if "Mapping" in bpy.data.materials[material_name].node_tree.nodes:
-			frame.loc_x_1uv = bpy.data.materials[material_name].node_tree.nodes["Mapping"].inputs[1].default_value[0]
-			frame.loc_y_1uv = bpy.data.materials[material_name].node_tree.nodes["Mapping"].inputs[1].default_value[1]
-			frame.scale_x_1uv = bpy.data.materials[material_name].node_tree.nodes["Mapping"].inputs[3].default_value[0]
-			frame.scale_y_1uv = bpy.data.materials[material_name].node_tree.nodes["Mapping"].inputs[3].default_value[1]
-		elif "UV_0_Mapping" in bpy.data.materials[material_name].node_tree.nodes:
-			frame.loc_x_1uv = bpy.data.materials[material_name].node_tree.nodes["UV_0_Mapping"].inputs[1].default_value[0]
-			frame.loc_y_1uv = bpy.data.materials[material_name].node_tree.nodes["UV_0_Mapping"].inputs[1].default_value[1]
-			frame.scale_x_1uv = bpy.data.materials[material_name].node_tree.nodes["UV_0_Mapping"].inputs[3].default_value[0]
-			frame.scale_y_1uv = bpy.data.materials[material_name].node_tree.nodes["UV_0_Mapping"].inputs[3].default_value[1]
-		if "UV_1_Mapping" in bpy.data.materials[material_name].node_tree.nodes:
-			frame.loc_x_2uv = bpy.data.materials[material_name].node_tree.nodes["UV_1_Mapping"].inputs[1].default_value[0]
-			frame.loc_y_2uv = bpy.data.materials[material_name].node_tree.nodes["UV_1_Mapping"].inputs[1].default_value[1]
-			frame.scale_x_2uv = bpy.data.materials[material_name].node_tree.nodes["UV_1_Mapping"].inputs[3].default_value[0]
-			frame.scale_y_2uv = bpy.data.materials[material_name].node_tree.nodes["UV_1_Mapping"].inputs[3].default_value[1]
-		if "UV_0_Mapping" and "UV_1_Mapping" and "BlendRate"  in bpy.data.materials[material_name].node_tree.nodes:
-			frame.blend_v = bpy.data.materials[material_name].node_tree.nodes["BlendRate"].outputs[0].default_value
-		if "Glare"  in bpy.data.materials[material_name].node_tree.nodes:
-			frame.glare_v = bpy.data.materials[material_name].node_tree.nodes["Glare"].outputs[0].default_value
-		if "Alpha"  in bpy.data.materials[material_name].node_tree.nodes:
-			frame.alpha_v = bpy.data.materials[material_name].node_tree.nodes["Alpha"].outputs[0].default_value
-		values.append(frame)
-	
-	return values
 
-def make_entry_material(material_name: str, clump_index: int, clump: Clump) -> Entry:
+def make_anm_incremental_steps(plan: ExportPlan, settings: ExportSettings, action_name: str, progress: ExportProgress,
+								writer: OutputWriter) -> Generator[ExportProgress, None, bytearray]:
 	"""
-	Make .anm Entry struct for material. An entry is equivalent to an Action Group in Blender. 
+	Sample and encode only the entries whose fingerprint changed since the last export of the action and return
+	the anm buffer. When the entries are the same as last time, the changed ones are patched into the previous .anm,
+	otherwise the others are copied out of it. The fingerprints are written as _fingerprints.json.
+	Yields the progress after each sampled bone and made entry.
 	"""
-	curve_headers: List[CurveHeader] = list()
-	curves: List[Curve] = list()
-
-	bone_material_indices: List[int] = clump.bone_material_indices
-
-
-	values = get_material_values(material_name)
-
-
-	loc_values_x_1UV = list()
-	loc_values_y_1UV = list()
-	scale_values_x_1UV = list()
-	scale_values_y_1UV = list()
-	loc_values_x_2UV = list()
-	loc_values_y_2UV = list()
-	scale_values_x_2UV = list()
-	scale_values_y_2UV = list()
-	blend_value = list()
-	glare_value = list()
-	alpha_value = list()
-
-	for frame in values:
-		loc_values_x_1UV.append(frame.loc_x_1uv)
-		loc_values_y_1UV.append((-1*frame.scale_y_1uv)+1-frame.loc_y_1uv)
-		scale_values_x_1UV.append(frame.scale_x_1uv)
-		scale_values_y_1UV.append(frame.scale_y_1uv)
-		loc_values_x_2UV.append(frame.loc_x_2uv)
-		loc_values_y_2UV.append((-1*frame.scale_y_2uv)+1-frame.loc_y_2uv)
-		scale_values_x_2UV.append(frame.scale_x_2uv)
-		scale_values_y_2UV.append(frame.scale_y_2uv)
-		blend_value.append(frame.blend_v)
-		glare_value.append(frame.glare_v)
-		alpha_value.append(frame.alpha_v)
-	
-	material_values = {
-		'location_X_1UV': loc_values_x_1UV,
-		'location_Y_1UV': loc_values_y_1UV,
-		'scale_X_1UV': scale_values_x_1UV,
-		'scale_Y_1UV': scale_values_y_1UV,
-		'location_X_2UV': loc_values_x_2UV,
-		'location_Y_2UV': loc_values_y_2UV,
-		'scale_X_2UV': scale_values_x_2UV,
-		'scale_Y_2UV': scale_values_y_2UV,
-		'blend': blend_value,
-		'glare': glare_value,
-		'alpha': alpha_value
-	}
-
-
-	# Create curves for each value
-	for index, (key, values) in enumerate(material_values.items()):
-		
-		
-		if key == 'location_X_1UV': 
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 0, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #X location 1UV
-		
-		if key == 'location_Y_1UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 1, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #Y location 1UV
-		
-		if key == 'location_X_2UV': 
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 2, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #X location 2UV
-		
-		if key == 'location_Y_2UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 3, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #Y location 2UV
-		
-		if key == 'scale_X_1UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 8, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #X scale 1UV
-		
-		if key == 'scale_Y_1UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 9, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #Y scale 1UV
-		if key == 'scale_X_2UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 10, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #X scale 2UV
-		
-		if key == 'scale_Y_2UV':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 11, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #Y scale 2UV
-		
-		if key == 'blend':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 12, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #blend value
-		
-		if key == 'glare':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
-
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 15, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #glare value
-		
-		if key == 'alpha':
-			keyframe_vec3 = dict()
-			converted_values = convert_camera_values('camera_FOV', material_values[key])
-			for frame, value in enumerate(converted_values):
-				keyframe_vec3[frame * 100] = value
+	sampler = plan.sampler
+	encoder_settings = settings.encoder
+	context = get_export_context(plan, encoder_settings)
+	folder = plan.anm_folder(action_name)
+	profiler = get_profiler()
 
-			keyframe_vec3.update({-1: [*keyframe_vec3.values()][-1]}) # Add null key
-			add_curve(AnmCurveFormat.INT1_FLOAT1, 16, 24, len(keyframe_vec3), keyframe_vec3, curve_headers, curves) #alpha value
+	fingerprints = sampler.get_fingerprints()
+	keys = list(fingerprints)
 
-	add_curve(AnmCurveFormat.FLOAT1, 4, 12, 1, [0], curve_headers, curves) #celshade param setting !NEVER DELETE THAT!
+	with profiler.stage('file io'):
+		state = load_export_state(f'{folder}\\_fingerprints.json')
+		previous_anm = read_file(f'{folder}\\{action_name}.anm') if state is not None else None
 
-	
-	'''
-	add_curve(AnmCurveFormat.FLOAT1, 5, 12, 1, [0], curve_headers, curves)
-	add_curve(AnmCurveFormat.FLOAT1, 6, 12, 1, [0], curve_headers, curves)
-	add_curve(AnmCurveFormat.FLOAT1, 7, 12, 1, [0], curve_headers, curves)
-	'''
-	'''
-	add_curve(AnmCurveFormat.FLOAT1, 13, 12, 1, [0], curve_headers, curves)
-	add_curve(AnmCurveFormat.FLOAT1, 14, 12, 1, [0], curve_headers, curves)'''
-	'''add_curve(AnmCurveFormat.FLOAT1, 15, 12, 1, [0.13], curve_headers, curves)''' #Glare
-	'''add_curve(AnmCurveFormat.FLOAT1, 16, 12, 1, [205], curve_headers, curves)''' #Field02
-	'''add_curve(AnmCurveFormat.FLOAT1, 17, 12, 1, [1], curve_headers, curves)'''
-
-	# Create the entry
-	coord_index = bone_material_indices.index(extra_mapping_reference_types.index(material_name + 'nuccChunkMaterial'))
-	entry_format = EntryFormat.MATERIAL
-	curve_count = len(curve_headers)
-
-	entry = Entry(clump_index, coord_index, entry_format.value, curve_count, curve_headers, curves)
-
-	return entry
+	with profiler.stage('splicing'):
+		index = get_previous_entries(state, previous_anm, context)
+		reused = get_reused_entries(state, previous_anm, index, fingerprints) if index is not None else dict()
+	profiler.count('reused entries', len(reused))
 
+	progress.sample_count = sampler.get_step_count(reused)
+	snapshot = yield from sample_snapshot_steps(plan, progress, reused)
 
-def make_entries() -> list[Entry]:
-	"""
-	Make entries for all bones and armatures.
-	"""
-	entries: List[Entry] = list()
+	cache = get_entry_cache(plan, settings)
 
-	for armature_obj in animated_armatures:
-		anm_bones: List[Bone] = armature_obj.anm_bones
-		anm_materials: list() = armature_obj.materials
+	made = iter_entries(snapshot, plan.layout.clumps, encoder_settings, cache)
 
-		clump: Clump = make_clump(AnmArmature(armature_obj.armature), animated_armatures.index(armature_obj))
+	with profiler.stage('encoding'), profiler.count_calls(BinaryReader, '_BinaryReader__write_type', 'BinaryReader writes'):
+		if reused and keys == state.keys:
+			# Same entries in the same order: replace the changed ones in the previous .anm, copy the rest as it is
+			progress.entry_count = len(keys) - len(reused)
+			changed = dict()
 
-		for bone in anm_bones:
-			parent_exist = False
+			for entry in made:
+				data = entry.data if isinstance(entry, EncodedEntry) else encode_entry(entry)
+				changed[get_entry_id(data)] = data
 
-			if bone.parent:
-				parent_exist = True
+				progress.entries_done += 1
+				yield progress
 
-			e: Entry = make_entry_bone(armature_obj.armature, bone.name, animated_armatures.index(armature_obj), clump, parent_exist)
-
-			if do_optimize:
-				clean_entry(e) # Remove duplicate keyframes from entry
-		
-			entries.append(e)
-			
-		if export_materials:
-			for material in anm_materials:
-				if "UV_1_Location" or "UV_2_Location" or "UV_1_Scale" or "UV_2_Scale" in bpy.data.materials[material].node_tree.nodes:
-
-					e: Entry = make_entry_material(material, animated_armatures.index(armature_obj), clump)
-					entries.append(e)
-
-	# If there is a camera in the scene, create an entry for it
-	if camera_exists():
-		entries.append(make_entry_camera())
-
-	# If there are light objects in the scene, create entries for each of them
-	if light_exists():
-		lights = get_lights()
-
-		for light in lights:
-			if light['type'] in ["SUN", "POINT", "AREA"]:
-				entries.append(make_entry_light(lights.index(light)))
-	
-	return entries
+			with profiler.stage('patching'):
+				anm_buffer = patch_anm(previous_anm, changed, index)
+		else:
+			progress.entry_count = len(keys)
+			entries = list()
 
-def clean_entry(entry: Entry) -> None:
-	"""
-	Remove duplicate keyframes from entry.
-	"""
-	header: CurveHeader
-	curve: Curve
+			for entry in splice_entries(keys, reused, made):
+				entries.append(entry)
 
-	for (header, curve) in zip(entry.curve_headers, entry.curves):
-		if curve.curve_format == AnmCurveFormat.INT1_FLOAT3:
-			values = curve.keyframes.values()
-			unique_values = list(set(values))
+				progress.entries_done += 1
+				yield progress
 
-			if len(unique_values) == 1:
-				first_value = list(curve.keyframes.values())[0]
+			other_entry_count = sum(kind in ('camera', 'light') for kind, _, _ in keys)
+			anm_buffer = write_anm(snapshot, encoder_settings, plan.layout, entries, other_entry_count)
 
-	
-				curve.keyframes.clear()
-				curve.keyframes: Tuple[float] = first_value # Convert to tuple
-				curve.curve_format = AnmCurveFormat.FLOAT3
+	state = make_export_state(context, bytes(anm_buffer), fingerprints)
+	writer.add('_fingerprints.json', json.dumps(state.to_json(), indent=None if settings.compact_page_json else '\t').encode())
 
-				header.frame_count = 1
-				header.curve_format = AnmCurveFormat.FLOAT3
-		
-		if curve.curve_format == AnmCurveFormat.INT1_FLOAT4:
-			values = curve.keyframes.values()
-			unique_values = list(set(values))
+	if settings.write_size_report:
+		with profiler.stage('size report'):
+			add_size_report(plan, settings, writer, anm_buffer)
 
-			if len(unique_values) == 1:
-				first_value = {list(curve.keyframes.items())[0][0]: list(curve.keyframes.items())[0][1]}
+	return anm_buffer
 
-				curve.keyframes.clear()
 
-				curve.keyframes = first_value
-				curve.keyframes.update({-1: [*curve.keyframes.values()][-1]}) # Add null key
+def make_anm_window_steps(plan: ExportPlan, settings: ExportSettings, progress: ExportProgress, writer: OutputWriter) -> Generator[ExportProgress, None, bytearray]:
+	"""
+	Sample and encode the scene window_size frames at a time and return the anm buffer. Yields the progress after each window.
+	"""
+	windows = WindowSampler(plan.sampler, settings.window_size)
+	encoder = WindowEncoder(settings.encoder, plan.layout)
 
-				header.frame_count = len(curve.keyframes)
+	progress.sample_count = progress.entry_count = len(windows.windows)
 
+	profiler = get_profiler()
+	for window in windows.windows:
+		with profiler.stage('sampling'):
+			snapshot = windows.sample_window(window)
+		progress.samples_done += 1
 
-		if curve.curve_format == AnmCurveFormat.INT1_FLOAT1:
-			values = curve.keyframes.values()
-			unique_values = list(set(values))
+		with profiler.stage('encoding'):
+			encoder.add(snapshot)
+		progress.entries_done += 1
+		yield progress
 
-			if len(unique_values) == 1:
-				first_value = list(curve.keyframes.values())[0]
+	with profiler.stage('encoding'):
+		anm_buffer = encoder.finish()
 
-	
-				curve.keyframes.clear()
+	if settings.write_size_report:
+		with profiler.stage('size report'):
+			add_size_report(plan, settings, writer, anm_buffer)
 
-				# TODO: Toggled curves are a list of a tuple, we don't need it to be a list, fix it in the future
-				curve.keyframes: List[Tuple[float]] = [first_value] # Convert to tuple
-				curve.curve_format = AnmCurveFormat.FLOAT1
+	return anm_buffer
 
-				header.frame_count = 1
-				header.curve_format = AnmCurveFormat.FLOAT1
 
-# For debug purposes
-def timed(func):
-	def inner(*args, **kwargs):
-		t0 = time()
+def make_anm_parallel_steps(plan: ExportPlan, settings: ExportSettings, action_name: str, progress: ExportProgress,
+							writer: OutputWriter) -> Generator[ExportProgress, None, bytearray]:
+	"""
+	Sample the frames in sampling_workers background Blender processes, each opening a copy of the current .blend,
+	and return the anm buffer. The windows of window_size frames are encoded one at a time, otherwise they're merged
+	into one snapshot first. Yields the progress while the workers run and after each made entry.
+	"""
+	sampler = plan.sampler
+	window_size = settings.window_size
+	profiler = get_profiler()
 
-		result = func(*args, **kwargs)
-		elapsed = time() - t0
-		print(f'Animation exported in {elapsed} seconds')
+	with profiler.stage('sampling'):
+		windows = WindowSampler(sampler, window_size or sys.maxsize).windows
+		if not window_size:
+			windows = split_frames(windows[0][0], windows[-1][1], settings.sampling_workers)
 
-		return result
+	output = tempfile.mkdtemp(prefix='anm_sampling_')
 
-	return inner
+	try:
+		blend_path = os.path.join(output, 'scene.blend')
+		with profiler.stage('file io'):
+			bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
 
+		tasks = make_tasks(windows, settings.sampling_workers, output, armatures=[a.armature.name for a in sampler.anm_armatures],
+			export_materials=sampler.export_materials, sampling=asdict(sampler.sampling), window_size=window_size or sys.maxsize)
+		worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_worker.py')
 
-@timed
-def make_anm() -> bytearray:
-	"""
-	Make anm buffer and return it.
-	"""
-	clumps = make_clumps()
-	entries = make_entries()
-	coord_parent = make_coord_parent()
-	
-	entry_count = len(entries)
-	clump_count = len(clumps)
-	coord_count = len(coord_parent.anm_coords) // 2
+		def make_command(task: WorkerTask) -> List[str]:
+			return [bpy.app.binary_path, '--background', blend_path, '--python-exit-code', '1', '--python', worker_script, '--', task.path]
 
-	other_entry_count = 0
+		pool = WorkerPool(tasks, make_command)
+		progress.sample_count = pool.window_count
 
-	if camera_exists():
-		other_entry_count += 1
+		with profiler.stage('sampling'):
+			for windows_done in pool.run_steps():
+				progress.samples_done = windows_done
+				yield progress
+		progress.samples_done = pool.window_count
 
-	if light_exists():
-		lights = get_lights()
+		if not window_size:
+			with profiler.stage('file io'):
+				snapshot = merge_windows(pool.iter_windows())
 
-		for light in lights:
-			if light['type'] == "SUN":
-				other_entry_count += 1
-			if light['type'] == "POINT":
-				other_entry_count += 1
-			if light['type'] == "AREA":
-				other_entry_count += 1
-	
-	# TODO: Get the frame length from the Action itself
-	# action = obj.animation_data.action
-	# start_frame, end_frame = action.frame_range
-	# frame_length = end_frame - start_frame + 1
+			return (yield from encode_anm_steps(plan, settings, action_name, snapshot, progress, writer))
 
-	frame_length = bpy.context.scene.frame_end
+		encoder = WindowEncoder(settings.encoder, plan.layout)
+		progress.entry_count = pool.window_count
 
+		for window in pool.iter_windows():
+			with profiler.stage('encoding'):
+				encoder.add(window)
+			progress.entries_done += 1
+			yield progress
 
-	anm = Anm(frame_length, 1, entry_count, is_looped, 
-					clump_count, other_entry_count, coord_count,
-					clumps, coord_parent, entries)
+		with profiler.stage('encoding'):
+			anm_buffer = encoder.finish()
 
-	with BinaryReader(endianness=Endian.BIG) as anm_writer:
-		anm_writer.write_struct(anm)
+		if settings.write_size_report:
+			with profiler.stage('size report'):
+				add_size_report(plan, settings, writer, anm_buffer)
 
-		return anm_writer.buffer()
+		return anm_buffer
+	finally:
+		shutil.rmtree(output, ignore_errors=True)
 
 
 def make_camera() -> bytearray:
@@ -1118,181 +460,155 @@ def make_ambient() -> bytearray:
 
 		return ambient_writer.buffer()
 
-def write_buffers():
-	""" Write buffers to file. """
-	export_path = f'{directory}\\Exported Animations'
+LIGHT_FILES = {
+	"SUN": (".lightdirc", make_lightdirc),
+	"POINT": (".lightpoint", make_lightpoint),
+	"AREA": (".ambient", make_ambient),
+}
 
-	action_name = animated_armatures[0].action.name
-	
-	anm_path = f'{export_path}\\[000] {action_name} (nuccChunkAnm)'
-	anm_filename = f'{action_name}.anm'
 
-	if not os.path.exists(anm_path):
-		os.makedirs(anm_path)
+def add_files(plan: ExportPlan, writer: OutputWriter, anm_filename: str, anm_buffer: bytearray):
+	""" Add the anm, camera and light files. """
+	# Add the ANM file
+	writer.add(anm_filename, anm_buffer)
 	
-	# Write the ANM file
-	with open(f'{anm_path}\\{anm_filename}', 'wb+') as anm:
-		anm.write(make_anm())
-	
-	# Write the CAM file, if a camera exists
-	if camera_exists():
-		cam_filename = 'camera01.camera'
-		with open(f'{anm_path}\\{cam_filename}', 'wb+') as cam:
-			cam.write(make_camera())
-
-	# Write the LIGHT files
-	if light_exists():
-		light_types = {
-			"SUN": (".lightdirc", make_lightdirc),
-			"POINT": (".lightpoint", make_lightpoint),
-			"AREA": (".ambient", make_ambient),
-		}
+	# Add the CAM file, if a camera exists
+	if plan.camera is not None:
+		writer.add(f'{plan.camera}.camera', make_camera())
+
+	# Add the LIGHT files
+	for light in plan.lights:
+		extension, make_light = LIGHT_FILES[light.type]
+		writer.add(light.chunk_name + extension, make_light())
+		
 
-		for i, light in enumerate(get_lights()):
-			name = light['name'] + str(i + 1).zfill(2)
-			light_type = light['type']
-			light_filename = name + light_types[light_type][0]
+def add_size_report(plan: ExportPlan, settings: ExportSettings, writer: OutputWriter, anm_buffer: bytearray, raw_buffer: Optional[bytearray] = None):
+	""" Add the size report of the anm buffer as _size.json, see analyze_anm.py. """
+	reference_names = [name[:name.rfind('nuccChunk')] for name in plan.sampler.scene.mapping_reference_types]
+	other_names = ([plan.camera] if plan.camera is not None else []) + [light.chunk_name for light in plan.lights]
 
-			with open(f'{anm_path}\\{light_filename}', 'wb+') as light:
-				light.write(light_types[light_type][1]())
-		
+	report = analyze_anm(bytes(anm_buffer), reference_names, other_names, bytes(raw_buffer) if raw_buffer is not None else None)
+	writer.add('_size.json', json.dumps(report.to_json(), indent=None if settings.compact_page_json else '\t').encode())
 
-def write_json():
-	""" Write page json to file. """
-	chunk_maps: List[Dict] = [{"Name": "", "Type": "nuccChunkNull", "Path": ""}]
-	chunk_references: List[Dict] = list()
-	chunks: List[Dict] = list()
-
-	# Create camera chunks
-	if camera_exists():
-		cam_path = animated_armatures[0].chunk_path
-		cam_name = 'camera01'
-
-		cam_chunk: Dict = make_chunk_dict(cam_path, cam_name, "nuccChunkCamera", reference=False, file=False)
-		chunk_maps.append(cam_chunk)
-
-		cam_file_chunk: Dict = make_chunk_dict(cam_path, cam_name, "nuccChunkCamera", reference=False, file=True)
-		chunks.append(cam_file_chunk)
-
-	# Create light chunks
-	if light_exists():
-		for i, light in enumerate(get_lights()):
-			if light['type'] == "POINT":
-				lightpoint_path = animated_armatures[0].chunk_path
-				lightpoint_name = light['name'] + str(i + 1).zfill(2)
-
-				lightpoint_chunk: Dict = make_chunk_dict(lightpoint_path, lightpoint_name, "nuccChunkLightPoint", reference=False, file=False)
-				chunk_maps.append(lightpoint_chunk)
-
-				lightpoint_file_chunk: Dict = make_chunk_dict(lightpoint_path, lightpoint_name, "nuccChunkLightPoint", reference=False, file=True)
-				chunks.append(lightpoint_file_chunk)
-			
-			if light['type'] == "SUN":
-				lightdirc_path = animated_armatures[0].chunk_path
-				lightdirc_name = light['name'] + str(i + 1).zfill(2)
-
-				lightdirc_chunk: Dict = make_chunk_dict(lightdirc_path, lightdirc_name, "nuccChunkLightDirc", reference=False, file=False)
-				chunk_maps.append(lightdirc_chunk)
-
-				lightdirc_file_chunk: Dict = make_chunk_dict(lightdirc_path, lightdirc_name, "nuccChunkLightDirc", reference=False, file=True)
-				chunks.append(lightdirc_file_chunk)
-			if light['type'] == "AREA":
-				ambient_path = animated_armatures[0].chunk_path
-				ambient_name = light['name'] + str(i + 1).zfill(2)
-
-				ambient_chunk: Dict = make_chunk_dict(ambient_path, ambient_name, "nuccChunkAmbient", reference=False, file=False)
-				chunk_maps.append(ambient_chunk)
-
-				ambient_file_chunk: Dict = make_chunk_dict(ambient_path, ambient_name, "nuccChunkAmbient", reference=False, file=True)
-				chunks.append(ambient_file_chunk)
-
-	# Create ANM chunk
-	if animated_armatures:
-		if anm_chunk_path == "":
-			anm_path = animated_armatures[0].chunk_path
-		else:
-			anm_path = anm_chunk_path
 
-		anm_name = animated_armatures[0].action.name
+def write_json(plan: ExportPlan, settings: ExportSettings, skeleton: PageSkeleton, writer: OutputWriter, action_name: str):
+	""" Add page json to the output writer. """
+	anm_path = plan.anm_chunk_path if plan.armatures else None
 
-		anm_chunk: Dict = make_chunk_dict(anm_path, anm_name, "nuccChunkAnm", reference=False, file=False)
-		chunk_maps.append(anm_chunk)
+	def write_page_json(file):
+		text = io.TextIOWrapper(file, encoding='cp932')
+		write_page(text, skeleton, action_name, anm_path, settings.compact_page_json)
+		text.detach()
 
-		anm_file_chunk: Dict = make_chunk_dict(anm_path, anm_name, "nuccChunkAnm", reference=False, file=True)
-		chunks.append(anm_file_chunk)
-	
-	for armature_obj in animated_armatures:
-		path = armature_obj.chunk_path
-
-		if ("extra_clump" not in armature_obj.name):
-			# Add clump chunk and reference dictionary
-			clump_chunk, clump_ref = make_chunk_dict(path, armature_obj.name, "nuccChunkClump", clump=armature_obj)
-			chunk_maps.append(clump_chunk)
-			chunk_references.append(clump_ref)
-			
-			# Add coord, material, model chunks and references dictionaries
-			for bone_name in armature_obj.bones:
-				coord_chunk, coord_ref = make_chunk_dict(path, bone_name, "nuccChunkCoord")
-				chunk_maps.append(coord_chunk)
-				chunk_references.append(coord_ref)
-
-			for mat_name in armature_obj.materials:
-				mat_chunk, mat_ref = make_chunk_dict(path, mat_name, "nuccChunkMaterial")
-				chunk_maps.append(mat_chunk)
-				chunk_references.append(mat_ref)
-			
-			for model_name in armature_obj.models:
-				model_chunk, model_ref = make_chunk_dict(path, model_name, "nuccChunkModel")
-				chunk_maps.append(model_chunk)
-				chunk_references.append(model_ref)
-		else:
-			ref_armature_index = -1
-			ref_armature_name = ""
-			for ex_armature in animated_armatures:
-				if (armature_obj.name in ex_armature.name):
-					ref_armature_name = ex_armature.name[:ex_armature.name.find(" [C]_extra_clump")]
-			for idx,ex_armature in enumerate(animated_armatures):
-				if (ref_armature_name == ex_armature.name):
-					ref_armature_index = idx
-
-			# Add clump chunk and reference dictionary
-			clump_ref = make_chunk_dict_ref(path, bpy.data.objects[armature_obj.name].data.name, ref_armature_name, "nuccChunkClump")
-			chunk_references.append(clump_ref)
-			
-			# Add coord, material, model chunks and references dictionaries
-			for idx, bone_name in enumerate(armature_obj.bones):
-				coord_ref = make_chunk_dict_ref(path, bone_name, animated_armatures[ref_armature_index].bones[idx], "nuccChunkCoord")
-				chunk_references.append(coord_ref)
-
-			for idx, mat_name in enumerate(armature_obj.materials):
-				mat_ref = make_chunk_dict_ref(path, mat_name,animated_armatures[ref_armature_index].materials[idx], "nuccChunkMaterial")
-				chunk_references.append(mat_ref)
-			
-			for idx, model_name in enumerate(armature_obj.models):
-				model_ref = make_chunk_dict_ref(path, model_name,animated_armatures[ref_armature_index].models[idx], "nuccChunkModel")
-				chunk_references.append(model_ref)
-		
-	page_chunk = make_chunk_dict("", "Page0", "nuccChunkPage", reference=False, file=False)
-	chunk_maps.append(page_chunk)
+	writer.add('_page.json', write_page_json)
 
-	index_chunk = make_chunk_dict("", "index", "nuccChunkIndex", reference=False, file=False)
-	chunk_maps.append(index_chunk)
 
+def get_batch_actions(plan: ExportPlan, settings: ExportSettings) -> List[Action]:
+	"""
+	Return the actions to export: the batch list / pattern, or the action of the first armature.
+	"""
+	actions = [bpy.data.actions[name] for name in settings.batch_actions]
+
+	if settings.batch_action_pattern:
+		actions.extend(action for action in bpy.data.actions if fnmatch(action.name, settings.batch_action_pattern) and action not in actions)
+
+	if not actions:
+		actions.append(plan.sampler.anm_armatures[0].action)
+
+	return actions
+
+
+@contextmanager
+def assign_action(plan: ExportPlan, action: Action):
+	"""
+	Temporarily assign the action to every animated armature it has bone groups for.
+	"""
+	anm_armatures = plan.sampler.anm_armatures
+	previous_actions = [armature_obj.action for armature_obj in anm_armatures]
+	group_names = set(group.name for group in action.groups)
+
+	try:
+		for armature_obj, armature in zip(anm_armatures, plan.armatures):
+			if not group_names.isdisjoint(armature.bones):
+				armature_obj.armature.animation_data.action = action
+		yield
+	finally:
+		for armature_obj, previous_action in zip(anm_armatures, previous_actions):
+			armature_obj.armature.animation_data.action = previous_action
+
+
+def get_export_settings(**overrides) -> ExportSettings:
+	"""
+	Return the settings at the top of this file, with the given ones replaced.
+	"""
+	settings = {settings_field.name: globals()[settings_field.name] for settings_field in fields(ExportSettings)}
 
-	page_json = dict()
-	page_json['Chunk Maps'] = list(map(lambda x: x, chunk_maps))
-	page_json['Chunk References'] = list(map(lambda x: x, chunk_references))
-	page_json['Chunks'] = list(map(lambda x: x, chunks))
+	return ExportSettings(**{**settings, **overrides})
 
-	export_path = f'{directory}\\Exported Animations'
-	page_path = export_path + '\\[000] ' + animated_armatures[0].action.name +' (nuccChunkAnm)'
 
-	if not os.path.exists(page_path):
-		os.makedirs(page_path)
+def export_steps(directory: str, settings: Optional[ExportSettings] = None) -> Generator[ExportProgress, None, None]:
+	"""
+	Export every action of the batch into directory, with the settings at the top of this file if settings is None.
+	The export plan (names, rest matrices, mapping references, clumps, camera and lights) and the page json skeleton
+	are made once and shared by all of them. Yields the progress after each sampled bone and made entry. Closing the
+	generator cancels the export, the files of an action are only written once all of them are made.
+	"""
+	if settings is None:
+		settings = get_export_settings()
 
-	with open(os.path.join(page_path, '_page.json'), 'w', encoding='cp932') as file:
-		json.dump(page_json, file, ensure_ascii=False, indent=4)
+	for warning in settings.get_ignored_settings():
+		print(f'Warning: {warning}')
+
+	t0 = time()
+	profiler = Profiler() if settings.profile_export else None
+	session_cache = set_session_cache_size(settings.session_cache_size * 1024 * 1024)
+
+	# The frame changes and edit mode of the export itself don't change what the session cache holds,
+	# edits made in the UI between the steps still drop what they change
+	with profiling(profiler), (session_cache.freeze() if session_cache is not None else nullcontext()):
+		with get_profiler().stage('preparation'):
+			plan = make_export_plan(directory, settings.export_materials, settings.anm_chunk_path, settings.sampling)
+			skeleton = make_page_skeleton(plan.armatures, plan.clump_names, plan.camera,
+				[(light.chunk_name, light.type) for light in plan.lights], plan.chunk_path)
+
+		actions = get_batch_actions(plan, settings)
+		scene = bpy.context.scene
+
+		for action_index, action in enumerate(actions):
+			with assign_action(plan, action), get_profiler().stage('action', action=action.name):
+				sample_count = plan.sampler.get_step_count()
+				progress = ExportProgress(action.name, action_index, len(actions), len(plan.sampler.get_scene_frames()), sample_count, sample_count)
+
+				writer = OutputWriter(plan.anm_folder(action.name), settings.output_threads)
+
+				anm_buffer = yield from thaw_between_steps(session_cache, pause_between_steps(make_anm_steps(plan, settings, action.name, progress, writer)))
+
+				add_files(plan, writer, f'{action.name}.anm', anm_buffer)
+				write_json(plan, settings, skeleton, writer, action.name)
+
+				with get_profiler().stage('file io'):
+					writer.write()
+
+	print(f'Animation exported in {time() - t0} seconds')
+
+	if profiler is not None:
+		profiler.meta = {
+			'version': __version__,
+			'blender': bpy.app.version_string,
+			'scene': scene.name,
+			'frames': scene.frame_end - scene.frame_start + 1,
+			'armatures': len(plan.armatures),
+		}
+		profiler.write(f'{plan.export_path}\\_profile.json')
+
+
+def export_animations(directory: str, settings: Optional[ExportSettings] = None):
+	"""
+	Export every action of the batch into directory in one go.
+	"""
+	for _ in export_steps(directory, settings):
+		pass
 
 
-write_buffers()
-write_json()
\ No newline at end of file
+if __name__ == '__main__':
+	export_animations(os.path.dirname(os.path.abspath(bpy.context.space_data.text.filepath)))
@@ -0,0 +1,58 @@
+import os
+import sys
+import argparse
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(directory)
+
+from common.parallel_sampler import WorkerTask, load_task
+from common.snapshot import load_snapshot, save_snapshot
+
+# Samples the frame windows of a worker task, started by exporter.py when sampling_workers is set.
+# Usage: blender -b scene.blend --python-exit-code 1 --python sample_worker.py -- task_0.json
+# Stand-in without Blender: python sample_worker.py task_0.json --snapshot "Snapshots/my_action.npz"
+# cuts the windows out of a saved snapshot instead, to run the worker scheduling anywhere.
+
+
+def sample_task(task: WorkerTask) -> None:
+	import bpy
+
+	from common.armature_props import AnmArmature
+	from common.sampler import SamplingSettings, SceneSampler, WindowSampler
+
+	anm_armatures = [AnmArmature(bpy.data.objects[name]) for name in task.armatures]
+
+	sampler = SceneSampler(anm_armatures, task.export_materials, SamplingSettings(**task.sampling))
+	windows = WindowSampler(sampler, task.window_size)
+
+	for window in task.windows:
+		save_snapshot(windows.sample_window(window), task.window_path(window))
+
+
+def slice_task(task: WorkerTask, snapshot_path: str) -> None:
+	from common.window_encoder import slice_snapshot
+
+	snapshot = load_snapshot(snapshot_path)
+
+	for window, window_snapshot in zip(task.windows, slice_snapshot(snapshot, task.windows)):
+		save_snapshot(window_snapshot, task.window_path(window))
+
+
+def main():
+	argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+
+	parser = argparse.ArgumentParser(description='Sample the frame windows of a worker task.')
+	parser.add_argument('task', help='task .json written by the exporter')
+	parser.add_argument('--snapshot', help='cut the windows out of this saved snapshot instead of sampling Blender')
+	args = parser.parse_args(argv)
+
+	task = load_task(args.task)
+
+	if args.snapshot:
+		slice_task(task, args.snapshot)
+	else:
+		sample_task(task)
+
+
+if __name__ == '__main__':
+	main()